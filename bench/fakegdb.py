@@ -0,0 +1,631 @@
+"""Stand-in for gdb's python module, simulating a program at configurable scale.
+
+Install() registers the module as 'gdb', so vimgdb.gdbinterface and
+vimgdb.gdbcommands can be imported and driven outside of gdb."""
+
+from __future__ import print_function
+import contextlib
+import sys
+
+COMMAND_NONE = 0
+COMMAND_SUPPORT = 1
+COMMAND_DATA = 2
+COMMAND_STACK = 3
+COMMAND_BREAKPOINTS = 4
+COMPLETE_NONE = 0
+COMPLETE_FILENAME = 1
+COMPLETE_LOCATION = 2
+COMPLETE_SYMBOL = 4
+PARAM_STRING = 0
+BP_BREAKPOINT = 1
+BP_WATCHPOINT = 6
+NORMAL_FRAME = 0
+TYPE_CODE_PTR = 1
+TYPE_CODE_ARRAY = 2
+TYPE_CODE_STRUCT = 3
+TYPE_CODE_UNION = 4
+TYPE_CODE_INT = 8
+
+# pc = file index * PC_STRIDE + line
+PC_STRIDE = 1 << 20
+
+# functions are FUNCTION_SIZE instructions of one byte, one per line
+FUNCTION_SIZE = 64
+
+# memory is readable below MEMORY_SIZE; every stop changes the first
+# MEMORY_DIRTY bytes of each MEMORY_STRIDE bytes
+MEMORY_SIZE = 1 << 32
+MEMORY_STRIDE = 1 << 16
+MEMORY_DIRTY = 64
+
+
+class error(RuntimeError):
+    pass
+
+
+class GdbError(Exception):
+    pass
+
+
+class MemoryError(error):
+    pass
+
+
+class Field:
+
+    def __init__(self,name,type):
+        self.name = name
+        self.type = type
+        self.is_base_class = False
+
+
+class Type:
+
+    def __init__(self,code,name,fields=(),length=0):
+        self.code = code
+        self.name = name
+        self._fields = list(fields)
+        self.length = length
+
+    def strip_typedefs(self):
+        return self
+
+    def fields(self):
+        return self._fields
+
+    def range(self):
+        return 0,self.length - 1
+
+
+INT = Type(TYPE_CODE_INT,"int")
+
+
+class Value:
+    """Value of a simulated variable: an int, a struct (dict) or an array (list)."""
+
+    def __init__(self,data):
+        self.data = data
+        if isinstance(data,dict):
+            self.type = Type(TYPE_CODE_STRUCT,"struct",[ Field(name,INT) for name in sorted(data) ])
+        elif isinstance(data,list):
+            self.type = Type(TYPE_CODE_ARRAY,"int[]",length=len(data))
+        else:
+            self.type = INT
+
+    def __getitem__(self,key):
+        return Value(self.data[key])
+
+    def __str__(self):
+        return str(self.data)
+
+    def __int__(self):
+        return int(self.data)
+
+
+class Symbol:
+
+    def __init__(self,name,is_argument=False):
+        self.name = name
+        self.print_name = name
+        self.is_argument = is_argument
+        self.is_variable = not is_argument
+
+
+class Block:
+
+    def __init__(self,symbols,start=0,end=0,function="function"):
+        self.symbols = symbols
+        self.function = function
+        self.superblock = None
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+
+class Objfile:
+
+    def __init__(self,filename):
+        self.filename = filename
+
+    @property
+    def build_id(self):
+        return "".join("{0:02x}".format(ord(character)) for character in self.filename)
+
+    def is_valid(self):
+        return True
+
+
+class Symtab:
+
+    def __init__(self,program,index):
+        self.program = program
+        self.index = index
+        self.filename = program.files[index]
+        self.objfile = program.objfile
+
+    def fullname(self):
+        self.program.counters["fullname"] += 1
+        return "/src/" + self.filename
+
+    def is_valid(self):
+        return True
+
+
+class Symtab_and_line:
+
+    def __init__(self,symtab,line,pc=0):
+        self.symtab = symtab
+        self.line = line
+        self.pc = pc
+
+
+class Frame:
+
+    def __init__(self,program,level,pc,thread=1):
+        self.program = program
+        self._level = level
+        self._pc = pc
+        self._thread = thread
+
+    def level(self):
+        return self._level
+
+    def Depth(self):
+        return len(self.program.stacks[self._thread]) - self._level
+
+    def __eq__(self,other):
+        # like a frame id: the same thread and depth from the outermost frame
+        return (isinstance(other,Frame) and self._thread == other._thread and
+            self.Depth() == other.Depth())
+
+    def __ne__(self,other):
+        return not self == other
+
+    def pc(self):
+        return self._pc
+
+    def older(self):
+        if self._level + 1 >= len(self.program.stacks[self._thread]):
+            return None
+        return self.program.Frame(self._level + 1,self._thread)
+
+    def newer(self):
+        if self._level == 0:
+            return None
+        return self.program.Frame(self._level - 1,self._thread)
+
+    def find_sal(self):
+        return self.program.FindPcLine(self._pc)
+
+    def architecture(self):
+        return Architecture(self.program)
+
+    def block(self):
+        return Block([ Symbol(name,name == "argc") for name in sorted(self.program.Variables(self._pc)) ])
+
+    def read_var(self,symbol):
+        return Value(self.program.Variables(self._pc)[symbol.name])
+
+    def name(self):
+        return "function{0}".format(self._pc // FUNCTION_SIZE)
+
+    def type(self):
+        return NORMAL_FRAME
+
+    def select(self):
+        self.program.thread = self._thread
+        self.program.selected = self._level
+
+    def is_valid(self):
+        return self._thread in self.program.stacks
+
+
+class Architecture:
+
+    def __init__(self,program):
+        self.program = program
+
+    def name(self):
+        return "i386:x86-64"
+
+    def disassemble(self,start_pc,end_pc=None,count=None):
+        self.program.counters["disassemble"] += 1
+        if end_pc == None:
+            end_pc = start_pc + (count or 1) - 1
+        return [ { "addr": pc, "asm": "mov    ${0},%eax".format(pc % FUNCTION_SIZE), "length": 1 }
+            for pc in range(start_pc,end_pc + 1) ]
+
+
+class BreakpointLocation:
+
+    def __init__(self,owner,filename,line):
+        self.owner = owner
+        self.source = (filename,line)
+        self.fullname = filename if filename.startswith("/") else "/src/" + filename
+        self.enabled = True
+        self.address = 0
+
+
+class Breakpoint:
+
+    def __init__(self,spec=None,type=BP_BREAKPOINT,internal=False,temporary=False,**kwargs):
+        program = CURRENT
+        program.last_number += 1
+        self.number = program.last_number
+        self.location = spec
+        self.expression = None
+        self.type = type
+        self.enabled = True
+        self.silent = False
+        self.condition = None
+        self.thread = None
+        self.ignore_count = 0
+        self.hit_count = 0
+        self.temporary = temporary
+        self.commands = None
+        self.pending = False
+        self.visible = not internal
+        self._valid = True
+        self.program = program
+        self._locations = []
+        if spec:
+            filename,_,line = spec.rpartition(":")
+            self._locations.append(BreakpointLocation(self,filename,int(line)))
+        program.breakpoints.append(self)
+        program.Fire("breakpoint_created",self)
+
+    @property
+    def locations(self):
+        if self.program.legacy:
+            raise AttributeError("locations")
+        return self._locations
+
+    def is_valid(self):
+        return self._valid
+
+    def delete(self):
+        self.program.Fire("breakpoint_deleted",self)
+        self.program.breakpoints.remove(self)
+        self._valid = False
+
+
+class StopEvent:
+
+    def __init__(self,inferior_thread=None):
+        self.inferior_thread = inferior_thread
+
+
+class BreakpointEvent(StopEvent):
+
+    def __init__(self,breakpoints,inferior_thread=None):
+        StopEvent.__init__(self,inferior_thread)
+        self.breakpoints = breakpoints
+        self.breakpoint = breakpoints[0]
+
+
+class InferiorThread:
+
+    def __init__(self,num):
+        self.num = num
+
+    def is_valid(self):
+        return self.num in CURRENT.stacks
+
+    def is_stopped(self):
+        return True
+
+    def switch(self):
+        CURRENT.counters["switch"] += 1
+        CURRENT.thread = self.num
+        CURRENT.selected = 0
+
+
+class Inferior:
+
+    pid = 1
+
+    def threads(self):
+        return tuple( InferiorThread(num) for num in sorted(CURRENT.stacks) )
+
+    def read_memory(self,address,length):
+        CURRENT.counters["read_memory"] += 1
+        if address < 0 or address + length > MEMORY_SIZE:
+            raise MemoryError("Cannot access memory at address 0x{0:x}".format(address))
+        data = bytearray((address + offset) & 0xff for offset in range(length))
+        for start in range(address - address % MEMORY_STRIDE,address + length,MEMORY_STRIDE):
+            for offset in range(max(start,address),min(start + MEMORY_DIRTY,address + length)):
+                data[offset - address] = CURRENT.stops & 0xff
+        return memoryview(data)
+
+
+class Command:
+
+    def __init__(self,name,command_class,completer_class=COMPLETE_NONE,prefix=False):
+        CURRENT.commands[name] = self
+
+
+class Parameter:
+
+    def __init__(self,name,command_class,parameter_class):
+        self.value = None
+
+
+class EventRegistry:
+
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self,handler):
+        self.handlers.append(handler)
+
+    def disconnect(self,handler):
+        self.handlers.remove(handler)
+
+
+class Events:
+
+    def __getattr__(self,name):
+        registry = EventRegistry()
+        setattr(self,name,registry)
+        return registry
+
+
+class Program:
+    """Simulated debuggee: source files, breakpoints and a call stack."""
+
+    def __init__(self,files=100,lines=2000,legacy=False):
+        self.files = [ "dir{0}/file{1}.cc".format(index % 10,index) for index in range(files) ]
+        self.lines = lines
+        self.legacy = legacy
+        self.objfile = Objfile("/bin/program")
+        self.breakpoints = []
+        self.last_number = 0
+        self.stacks = { 1: [ self.Pc(0,1) ] }   # thread number -> pcs, innermost first
+        self.thread = 1
+        self.selected = 0
+        self.running = True
+        self.posted = []
+        self.commands = dict()
+        self.events = Events()
+        self.counters = { "find_pc_line": 0, "decode_line": 0, "fullname": 0, "execute": 0, "switch": 0,
+            "disassemble": 0, "read_memory": 0 }
+        self.stops = 0
+
+    def Pc(self,file_index,line):
+        return file_index * PC_STRIDE + line
+
+    @property
+    def stack(self):
+        return self.stacks[self.thread]
+
+    @stack.setter
+    def stack(self,stack):
+        self.stacks[self.thread] = stack
+
+    def Frame(self,level,thread=None):
+        thread = thread or self.thread
+        return Frame(self,level,self.stacks[thread][level],thread)
+
+    def Variables(self,pc):
+        """Return values of the variables in scope at pc."""
+        index,line = divmod(pc,PC_STRIDE)
+        return {
+            "argc": 2,
+            "index": index,
+            "line": line,
+            "total": line * (line + 1) // 2,
+            "point": { "x": line % 10, "y": index },
+            "values": [ line + value for value in range(200) ],
+        }
+
+    def FindPcLine(self,pc):
+        self.counters["find_pc_line"] += 1
+        index,line = divmod(pc,PC_STRIDE)
+        return Symtab_and_line(Symtab(self,index),line,pc)
+
+    def Stop(self,stack,thread=None):
+        """Stop at stack of (file index, line), innermost first. With
+        'thread', only that thread stops, as in non-stop mode."""
+        pcs = [ self.Pc(index,line) for index,line in stack ]
+        self.running = True
+        self.stops += 1
+        if thread == None:
+            self.stack = pcs
+            self.selected = 0
+            self.Fire("stop",StopEvent())
+        else:
+            self.stacks[thread] = pcs
+            self.Fire("stop",StopEvent(InferiorThread(thread)))
+
+    def Hit(self,breakpoint,stack):
+        """Run into breakpoint at stack of (file index, line): stop, unless
+        its stop() method says not to."""
+        self.running = True
+        self.stack = [ self.Pc(index,line) for index,line in stack ]
+        self.selected = 0
+        if hasattr(breakpoint,"stop") and not breakpoint.stop():
+            return
+        breakpoint.hit_count += 1
+        self.Fire("breakpoint_modified",breakpoint)
+        self.stops += 1
+        self.Fire("stop",BreakpointEvent([breakpoint]))
+
+    def AddThreads(self,stacks):
+        """Add threads stopped at stacks, {thread number: [(file index, line)]}."""
+        for thread,stack in stacks.items():
+            self.stacks[thread] = [ self.Pc(index,line) for index,line in stack ]
+
+    def Fire(self,event,*args):
+        for handler in list(getattr(self.events,event).handlers):
+            handler(*args)
+
+    def RunEventLoop(self):
+        """Run events posted with post_event, as gdb does when idle."""
+        while self.posted:
+            posted,self.posted = self.posted,[]
+            for event in posted:
+                event()
+
+    def InfoBreak(self,number=None):
+        rows = [ "Num     Type           Disp Enb Address            What" ]
+        for breakpoint in self.breakpoints:
+            if number != None and breakpoint.number != number:
+                continue
+            for location in breakpoint._locations:
+                rows.append("{0:<7} breakpoint     keep {1}   0x{2:016x} in f at {3}:{4}".format(
+                    breakpoint.number,"y" if breakpoint.enabled else "n",0,
+                    location.source[0],location.source[1]))
+        return "\n".join(rows) + "\n"
+
+    def InfoSources(self):
+        return "{0}:\n\n{1}\n".format(self.objfile.filename,
+            ", ".join("/src/" + filename for filename in self.files))
+
+    def InfoFunctions(self):
+        rows = [ "All defined functions:" ]
+        for index,filename in enumerate(self.files):
+            rows.append("")
+            rows.append("File {0}:".format(filename))
+            for line in range(1,self.lines + 1,FUNCTION_SIZE):
+                rows.append("{0}:\tint function{1}(int, char **);".format(
+                    line,self.Pc(index,line) // FUNCTION_SIZE))
+        rows.extend([ "", "Non-debugging symbols:", "0x0000000000001000  _init" ])
+        return "\n".join(rows) + "\n"
+
+
+CURRENT = None
+
+
+def Install(program):
+    """Register a fake gdb module simulating 'program' as 'gdb'."""
+    global CURRENT
+    CURRENT = program
+    module = sys.modules[__name__]
+    sys.modules["gdb"] = module
+    return module
+
+
+def selected_frame():
+    if not CURRENT.running:
+        raise error("No frame is currently selected.")
+    return CURRENT.Frame(CURRENT.selected)
+
+
+def newest_frame():
+    if not CURRENT.running:
+        raise error("No frame is currently executing.")
+    return CURRENT.Frame(0)
+
+
+def selected_thread():
+    if not CURRENT.running:
+        return None
+    return InferiorThread(CURRENT.thread)
+
+
+def selected_inferior():
+    return Inferior()
+
+
+def find_pc_line(pc):
+    return CURRENT.FindPcLine(pc)
+
+
+def block_for_pc(pc):
+    start = pc - pc % FUNCTION_SIZE
+    return Block([],start,start + FUNCTION_SIZE,Symbol("function{0}".format(pc // FUNCTION_SIZE)))
+
+
+def decode_line(location=None):
+    CURRENT.counters["decode_line"] += 1
+    if location == None:
+        return None,(CURRENT.FindPcLine(CURRENT.stack[CURRENT.selected]),)
+    if location == "main":
+        return None,(Symtab_and_line(Symtab(CURRENT,0),1),)
+    if location.startswith("function") and location[len("function"):].isdigit():
+        # first line of the body, after the declaration 'info functions' shows
+        return None,(CURRENT.FindPcLine(int(location[len("function"):]) * FUNCTION_SIZE + 2),)
+    filename,_,line = location.rpartition(":")
+    if filename.startswith("/src/"):
+        filename = filename[len("/src/"):]
+    if filename in CURRENT.files:
+        return None,(Symtab_and_line(Symtab(CURRENT,CURRENT.files.index(filename)),int(line)),)
+    raise error("Function \"{0}\" not defined.".format(location))
+
+
+def parse_and_eval(expression):
+    try:
+        return Value(int(expression,0))
+    except ValueError:
+        pass
+    variables = CURRENT.Variables(CURRENT.stack[CURRENT.selected])
+    if expression not in variables:
+        raise error("No symbol \"{0}\" in current context.".format(expression))
+    return Value(variables[expression])
+
+
+def string_to_argv(argument):
+    return argument.split()
+
+
+def default_visualizer(value):
+    return None
+
+
+def breakpoints():
+    return tuple(CURRENT.breakpoints)
+
+
+def execute(command,from_tty=False,to_string=False):
+    CURRENT.counters["execute"] += 1
+    if command == "info break":
+        return CURRENT.InfoBreak()
+    if command.startswith("info break "):
+        return CURRENT.InfoBreak(int(command.split()[-1]))
+    if command == "info sources":
+        return CURRENT.InfoSources()
+    if command == "info functions":
+        return CURRENT.InfoFunctions()
+    return ""
+
+
+def post_event(event):
+    CURRENT.posted.append(event)
+
+
+@contextlib.contextmanager
+def block_signals():
+    yield
+
+
+def parameter(name):
+    return None
+
+
+def lookup_global_symbol(name):
+    return None
+
+
+def objfiles():
+    return (CURRENT.objfile,)
+
+
+class Progspace:
+
+    def __init__(self,filename):
+        self.filename = filename
+
+
+def current_progspace():
+    return Progspace(CURRENT.objfile.filename)
+
+
+class _Events:
+
+    def __getattr__(self,name):
+        return getattr(CURRENT.events,name)
+
+
+events = _Events()
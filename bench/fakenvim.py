@@ -0,0 +1,96 @@
+"""Fake neovim server recording the api calls vimgdb sends over msgpack-rpc.
+
+The server runs in a thread of the benchmark process and listens on the
+socket on which vimgdb expects 'nvim --listen'. Every nvim_call_atomic
+request counts as a batch of commands."""
+
+from __future__ import print_function
+import os
+import socket
+import threading
+import time
+
+from vimgdb.rpc import Pack, Unpacker
+
+
+class FakeNeovimServer:
+
+    def __init__(self,path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.Reset()
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.server = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(16)
+        self.channel = None
+        self.channels = 0
+        self.placed = None      # answer to vimgdb.placed(), see Placed()
+        thread = threading.Thread(target=self.Serve)
+        thread.daemon = True
+        thread.start()
+
+    def Reset(self):
+        with self.lock:
+            self.batches = []       # (time received, [calls])
+            self.subprocesses = 0
+            self.bytes = 0
+
+    def Record(self,calls,size):
+        with self.lock:
+            self.batches.append((time.time(),calls))
+            self.bytes += size
+
+    def Executable(self):
+        return "nvim"
+
+    def Serve(self):
+        while True:
+            connection,_ = self.server.accept()
+            self.channels += 1
+            self.channel = connection
+            thread = threading.Thread(target=self.Channel,args=(connection,self.channels))
+            thread.daemon = True
+            thread.start()
+
+    def Channel(self,connection,channel):
+        """Answer msgpack-rpc requests like neovim does."""
+        unpacker = Unpacker()
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                return
+            unpacker.Feed(data)
+            for message in unpacker:
+                kind,request,method,args = message
+                result = None
+                if method == "nvim_get_api_info":
+                    result = [channel,{}]
+                elif method == "nvim_call_atomic":
+                    self.Record(args[0],len(Pack(message)))
+                    result = [[None] * len(args[0]),None]
+                elif method == "nvim_eval":
+                    result = ""
+                elif method == "nvim_exec_lua" and args[0].startswith("return vimgdb.placed"):
+                    result = self.placed
+                connection.sendall(Pack([1,request,None,result]))
+
+    def Placed(self,current,signs):
+        """Make vimgdb.placed() report 'current' file and marks {file: {id: (line,type)}}."""
+        self.placed = { "current": current, "signs": { filename: [ [sign_id,line,name]
+            for sign_id,(line,name) in placed.items() ] for filename,placed in signs.items() } }
+
+    def Notify(self,method,*args):
+        """Send notification to vimgdb, like rpcnotify()."""
+        self.channel.sendall(Pack([2,method,list(args)]))
+
+    def Wait(self,batches,timeout=5.0):
+        """Wait until at least 'batches' batches were received."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if len(self.batches) >= batches:
+                    return True
+            time.sleep(0.0005)
+        return False
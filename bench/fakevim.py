@@ -0,0 +1,154 @@
+"""Fake vim server recording the commands vimgdb sends, and their timing.
+
+The server runs in a thread of the benchmark process. Executable() writes a
+'vim' wrapper script that forwards clientserver calls (--serverlist,
+--remote-send and --remote-expr) to the server, so every call really costs a
+subprocess, and VimgdbConnect() makes the server connect to vimgdb's channel
+like vim does."""
+
+from __future__ import print_function
+import json
+import os
+import re
+import socket
+import stat
+import sys
+import threading
+import time
+
+CONNECT = re.compile(r"VimgdbConnect\('unix:(.*)'\)")
+SOURCE = re.compile(r":(?:silent! )?source (\S+)<Enter>")
+PLACED = re.compile(r"VimgdbPlaced\(")
+
+
+class FakeVimServer:
+
+    def __init__(self,directory,servername="VIMGDB"):
+        self.directory = directory
+        self.servername = servername
+        self.path = os.path.join(directory,"fakevim.sock")
+        self.lock = threading.Lock()
+        self.Reset()
+        self.server = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(16)
+        self.channel = None
+        self.placed = None      # answer to VimgdbPlaced(), see Placed()
+        self.requests = 0       # requests sent to vimgdb, see Request()
+        thread = threading.Thread(target=self.Serve)
+        thread.daemon = True
+        thread.start()
+
+    def Reset(self):
+        with self.lock:
+            self.batches = []       # (time received, [commands])
+            self.subprocesses = 0
+            self.bytes = 0
+
+    def Record(self,commands,size):
+        with self.lock:
+            self.batches.append((time.time(),commands))
+            self.bytes += size
+
+    def Executable(self):
+        """Write and return a 'vim' executable talking to this server."""
+        executable = os.path.join(self.directory,"vim")
+        with open(executable,"w") as script:
+            script.write("#!/bin/sh\nexec {0} {1} {2} \"$@\"\n".format(
+                sys.executable,os.path.abspath(__file__),self.path))
+        os.chmod(executable,stat.S_IRWXU)
+        return executable
+
+    def Serve(self):
+        while True:
+            connection,_ = self.server.accept()
+            with self.lock:
+                self.subprocesses += 1
+            request = json.loads(connection.makefile().readline())
+            connection.sendall((self.Handle(request) + "\n").encode("utf-8"))
+            connection.close()
+
+    def Handle(self,request):
+        if request[0] == "--serverlist":
+            return self.servername
+        elif request[0] == "--remote-send":
+            match = SOURCE.search(request[1])
+            if match:
+                with open(match.group(1)) as spool:
+                    data = spool.read()
+                self.Record(data.split("\n"),len(request[1]) + len(data))
+            else:
+                self.Record([request[1]],len(request[1]))
+            return ""
+        elif request[0] == "--remote-expr":
+            match = CONNECT.match(request[1])
+            if match:
+                self.Connect(match.group(1))
+                return "1"
+            return self.Eval(request[1])
+        return ""
+
+    def Placed(self,current,signs):
+        """Make VimgdbPlaced() report 'current' file and signs {file: {id: (line,name)}}."""
+        self.placed = json.dumps({ "current": current, "signs": { filename: [ [sign_id,line,name]
+            for sign_id,(line,name) in placed.items() ] for filename,placed in signs.items() } })
+
+    def Eval(self,expression):
+        if PLACED.match(expression) and self.placed != None:
+            return self.placed
+        return ""
+
+    def Connect(self,path):
+        channel = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        channel.connect(path)
+        self.channel = channel
+        thread = threading.Thread(target=self.Channel,args=(channel,))
+        thread.daemon = True
+        thread.start()
+
+    def Channel(self,channel):
+        """Read json messages like vim does in channel mode."""
+        reader = channel.makefile("rb")
+        for line in reader:
+            message = json.loads(line.decode("utf-8"))
+            if message[0] == "call":
+                self.Record(message[2][0],len(line))
+            elif message[0] == "expr":
+                channel.sendall((json.dumps([message[2],self.Eval(message[1])]) + "\n").encode("utf-8"))
+
+    def Request(self,message):
+        """Send request to vimgdb, like ch_sendexpr()."""
+        self.requests += 1
+        self.channel.sendall((json.dumps([self.requests,message]) + "\n").encode("utf-8"))
+
+    def Wait(self,batches,timeout=5.0):
+        """Wait until at least 'batches' batches were received."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if len(self.batches) >= batches:
+                    return True
+            time.sleep(0.0005)
+        return False
+
+
+def Client(path,args):
+    """Forward a vim clientserver call to the fake server (runs as 'vim')."""
+    request = None
+    for index,arg in enumerate(args):
+        if arg == "--serverlist":
+            request = [arg]
+        elif arg in ("--remote-send","--remote-expr"):
+            request = [arg,args[index+1]]
+    if request == None:
+        return 1
+
+    connection = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    connection.connect(path)
+    connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+    print(connection.makefile().readline().rstrip("\n"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(Client(sys.argv[1],sys.argv[2:]))
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""Benchmark vimgdb against a fake gdb module and a fake vim server.
+
+Reports, per scenario and transport, the update latency percentiles (time
+spent in gdb's thread, and until vim received the commands), command bytes
+per update and vim subprocesses per update. Exits with status 1 when a
+metric regressed with respect to the baseline file.
+
+    python bench/run.py [--scale small|medium|large] [--save-baseline]"""
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.dirname(BENCH_DIR))
+sys.path.insert(0,BENCH_DIR)
+
+import fakegdb
+from fakevim import FakeVimServer
+from fakenvim import FakeNeovimServer
+
+SCALES = {
+    "small":  { "files": 20,  "breakpoints": 100,   "stops": 200  },
+    "medium": { "files": 200, "breakpoints": 5000,  "stops": 1000 },
+    "large":  { "files": 500, "breakpoints": 50000, "stops": 2000 },
+}
+
+# allowed relative increase before a metric counts as regressed
+TOLERANCE = { "ms": 1.0, "bytes": 0.05, "subprocesses": 0.05 }
+
+# allowed absolute increase of latencies, to ignore noise on tiny numbers
+LATENCY_SLACK_MS = 5.0
+
+
+def Percentile(values,percentile):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1,int(len(values) * percentile / 100.0))]
+
+
+class Session:
+    """Fresh vimgdb instance, registered in a fake gdb, talking to a fake vim."""
+
+    def __init__(self,server,transport,async_updates,files,legacy=False):
+        for name in list(sys.modules):
+            if name == "vimgdb" or name.startswith("vimgdb."):
+                del sys.modules[name]
+
+        self.program = fakegdb.Program(files=files,legacy=legacy)
+        fakegdb.Install(self.program)
+        self.transport = transport
+        self.async_updates = async_updates
+
+        from vimgdb.settings import settings
+        if transport == "nvim":
+            settings.editor = "nvim"
+        else:
+            settings.editor = "vim"
+            settings.transport = transport
+        settings.async_updates = async_updates
+
+        from vimgdb import gdbcommands
+        from vimgdb.stats import stats
+        self.gdbcommands = gdbcommands
+        self.stats = stats
+        self.vimgdb = gdbcommands.vimgdb
+        self.vimgdb.vim.executable = server.Executable()
+        gdbcommands.Register()
+
+        self.server = server
+        self.Reset()
+
+    def Reset(self):
+        """Start counting what vim receives from here."""
+        self.server.Reset()
+        self.sent = self.stats.count["batches"]
+
+    def Flush(self):
+        """Run gdb's event loop and wait until all commands reached vim."""
+        self.program.RunEventLoop()
+        if self.vimgdb.vim.worker != None:
+            self.vimgdb.vim.worker.Drain()
+        self.program.RunEventLoop()
+        if self.vimgdb.vim.worker != None:
+            self.vimgdb.vim.worker.Drain()
+        # the fake server reads the channel in its own thread; a batch that
+        # never arrives would be recorded as an update of 0 bytes
+        if not self.server.Wait(self.stats.count["batches"] - self.sent):
+            raise RuntimeError("vim did not receive all batches")
+
+    def Invoke(self,command,arg=""):
+        """Run a vimgdb command, discarding what it prints."""
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull,"w")
+        try:
+            self.program.commands[command].invoke(arg,False)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    def Close(self):
+        self.vimgdb.vim.Close()
+
+
+def CreateBreakpoints(program,count,seed=0):
+    generator = random.Random(seed)
+    for number in range(count):
+        filename = program.files[generator.randrange(len(program.files))]
+        fakegdb.Breakpoint("{0}:{1}".format(filename,generator.randrange(1,program.lines)))
+
+
+def StopScenario(session,scale):
+    """Step through code: mostly next lines, sometimes another (hot) file."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+
+    generator = random.Random(1)
+    hot = list(range(min(10,len(program.files))))
+    index,line = 0,1
+    gdb_times,vim_times = [],[]
+
+    session.Reset()
+    for stop in range(scale["stops"]):
+        if generator.random() < 0.2:
+            index = generator.choice(hot)
+            line = generator.randrange(1,program.lines)
+        else:
+            line = line % program.lines + 1
+
+        received = len(session.server.batches)
+        start = time.time()
+        program.Stop([(index,line),(hot[0],10),(hot[-1],20)])
+        program.RunEventLoop()
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        with session.server.lock:
+            last = session.server.batches[-1][0] if len(session.server.batches) > received else time.time()
+        vim_times.append(last - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def BreakpointScenario(session,scale):
+    """Create many breakpoints in one go, e.g. from a script."""
+    program = session.program
+    program.Stop([(0,1)])
+    session.Flush()
+
+    session.Reset()
+    start = time.time()
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.RunEventLoop()
+    gdb_time = time.time() - start
+    session.Flush()
+    return Metrics(session,1,[gdb_time],[time.time() - start])
+
+
+def ObjfileScenario(session,scale):
+    """Load 400 shared libraries, then return to the prompt."""
+    program = session.program
+    program.running = False
+    session.Reset()
+    start = time.time()
+    for index in range(400):
+        program.Fire("new_objfile",fakegdb.Objfile("/lib/lib{0}.so".format(index)))
+        program.RunEventLoop()
+    program.Fire("before_prompt")
+    program.RunEventLoop()
+    gdb_time = time.time() - start
+    session.Flush()
+    return Metrics(session,1,[gdb_time],[time.time() - start])
+
+
+def TraceScenario(session,scale):
+    """Record a stepping session without updating vim, then replay it."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+
+    session.Reset()
+    session.Invoke("vimgdb trace start")
+    gdb_times = []
+    for stop in range(scale["stops"]):
+        start = time.time()
+        program.Stop([(stop % 10,stop % program.lines + 1),(0,10)])
+        program.RunEventLoop()
+        gdb_times.append(time.time() - start)
+    session.Invoke("vimgdb trace stop")
+    session.Flush()
+
+    vim_times = []
+    for stop in range(scale["stops"]):
+        received = len(session.server.batches)
+        start = time.time()
+        session.Invoke("vimgdb trace prev")
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def FrameScenario(session,scale):
+    """Move up and down a 5000 frame deep stack, with the stack panel open."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([ (level % len(program.files),level % program.lines + 1) for level in range(5000) ])
+    session.Flush()
+    session.Invoke("vimgdb stack")
+    session.Flush()
+
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for move in range(scale["stops"]):
+        received = len(session.server.batches)
+        start = time.time()
+        program.selected = move if move < scale["stops"] // 2 else scale["stops"] - move
+        session.Invoke("vimgdb frame")
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def LocalsScenario(session,scale):
+    """Step through a function with the locals panel open and an array expanded."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1),(0,10)])
+    session.Flush()
+    session.Invoke("vimgdb locals")
+    session.Invoke("vimgdb watch","total")
+    session.vimgdb.ToggleLocal(7)
+    session.Flush()
+
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        received = len(session.server.batches)
+        start = time.time()
+        program.Stop([(0,stop % program.lines + 1),(0,10)])
+        program.RunEventLoop()
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def ThreadScenario(session,scale):
+    """Bursts of 20 thread stops in non-stop mode among 300 threads, with a thread switch after each."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    generator = random.Random(3)
+    files = min(5,len(program.files))
+    program.AddThreads({ thread: [(thread % files,generator.randrange(1,program.lines))]
+        for thread in range(2,301) })
+    program.Stop([(0,1)])
+    program.RunEventLoop()
+    session.Flush()
+
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for burst in range(scale["stops"]):
+        start = time.time()
+        for stop in range(20):
+            thread = generator.randrange(2,301)
+            program.Stop([(thread % files,generator.randrange(1,program.lines))],thread)
+        program.RunEventLoop()
+        elapsed = time.time() - start
+        # let the worker drain the burst first, so what the thread switch
+        # coalesces with does not depend on the timing of the worker
+        session.Flush()
+        switch = time.time()
+        program.thread = generator.randrange(1,301)
+        program.selected = 0
+        session.Invoke("vimgdb frame")
+        gdb_times.append(elapsed + time.time() - switch)
+        session.Flush()
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def ReloadScenario(session,scale):
+    """Reload while vim shows all signs but one breakpoint, and the same file."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    vim = session.vimgdb.vim
+    for reload in range(scale["stops"]):
+        signs = { filename: dict(placed) for filename,placed in vim.signs.items() }
+        lines = sorted(line for line,sign in signs[session.vimgdb.fullsource].items()
+            if sign[1] == "VimgdbBreakpointSign")
+        del signs[session.vimgdb.fullsource][lines[reload % len(lines)]]
+        session.server.Placed(session.vimgdb.fullsource,signs)
+
+        received = len(session.server.batches)
+        start = time.time()
+        session.Invoke("vimgdb reload")
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def DisassemblyScenario(session,scale):
+    """Step by instruction with the disassembly panel open, into another function every 100 steps."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1),(0,10)])
+    session.Flush()
+    session.Invoke("vimgdb disassembly")
+    session.Flush()
+
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        received = len(session.server.batches)
+        start = time.time()
+        program.Stop([(0,(stop // 100) * 1000 + stop % 100 + 1),(0,10)])
+        program.RunEventLoop()
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def MemoryScenario(session,scale):
+    """Step with the memory panel open on 4MB, scrolling it a page down every stop."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1),(0,10)])
+    session.Flush()
+    session.Invoke("vimgdb memory","0x10000 4194304")
+    session.Flush()
+
+    session.Reset()
+    lines = session.vimgdb.memory.Lines()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        start = time.time()
+        program.Stop([(0,stop % 100 + 1),(0,10)])
+        program.RunEventLoop()
+        session.vimgdb.ScrollMemory(stop * lines,stop * lines + 40)
+        gdb_times.append(time.time() - start)
+        # both updates may be sent in one batch
+        session.Flush()
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,2 * scale["stops"],gdb_times,vim_times)
+
+
+def GotoScenario(session,scale):
+    """Complete and go to functions in other files, with the symbol index built."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+    session.Invoke("vimgdb symbols")
+    session.Flush()
+
+    command = program.commands["vimgdb goto"]
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        received = len(session.server.batches)
+        start = time.time()
+        index = stop % len(program.files)
+        name = "function{0}".format(program.Pc(index,(stop // len(program.files)) * fakegdb.FUNCTION_SIZE + 1) // fakegdb.FUNCTION_SIZE)
+        command.complete(name[:-1],name[:-1])
+        session.Invoke("vimgdb goto",name)
+        program.RunEventLoop()
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        session.server.Wait(received + 1)
+        vim_times.append(time.time() - start)
+
+    # other scenarios run without stored indexes
+    from vimgdb.symbols import CacheDirectory
+    shutil.rmtree(CacheDirectory())
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def SessionScenario(session,scale):
+    """Restore the saved breakpoints of a program in a new gdb session."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+
+    # quit gdb: hook-quit saves the session before vimgdb is disabled
+    session.gdbcommands.settings.session = True
+    session.gdbcommands.QuitEvent()
+    session.Invoke("vimgdb disable")
+
+    # the same program in a new gdb session
+    server = session.server
+    session.Close()
+    session = Session(server,session.transport,session.async_updates,len(program.files),program.legacy)
+    session.program.running = False
+    session.Reset()
+    start = time.time()
+    session.Invoke("vimgdb session restore")
+    session.program.RunEventLoop()
+    gdb_time = time.time() - start
+    session.Flush()
+    metrics = Metrics(session,1,[gdb_time],[time.time() - start])
+    state = session.gdbcommands.session.Load()
+    if not state["files"] or state["current"] == None:
+        raise RuntimeError("session saved on quit has no files")
+    session.Close()
+
+    from vimgdb.symbols import CacheDirectory
+    shutil.rmtree(CacheDirectory("sessions"))
+    return metrics
+
+
+def ControlScenario(session,scale):
+    """Toggle breakpoints on lines of the shown file and evaluate expressions
+    from vim keymaps, as requests received from vim."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+
+    fullsource = session.vimgdb.fullsource
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        for message in (["break",fullsource,stop // 2 % 50 + 2],["evaluate",str(stop),0]):
+            start = time.time()
+            session.vimgdb.vim.Received(message)
+            program.RunEventLoop()
+            gdb_times.append(time.time() - start)
+            session.Flush()
+            vim_times.append(time.time() - start)
+
+    return Metrics(session,2 * scale["stops"],gdb_times,vim_times)
+
+
+def CountScenario(session,scale):
+    """Hit counting breakpoints on lines of the shown file 200 times per
+    update, and show the counts as the throttle timer does."""
+    program = session.program
+    CreateBreakpoints(program,scale["breakpoints"])
+    program.Stop([(0,1)])
+    session.Flush()
+    for line in range(10,60,10):
+        session.Invoke("vimgdb count","{0}:{1}".format(program.files[0],line))
+    counting = program.breakpoints[-5:]
+    session.Flush()
+
+    dispatcher = session.gdbcommands.dispatcher
+    session.Reset()
+    gdb_times,vim_times = [],[]
+    for stop in range(scale["stops"]):
+        start = time.time()
+        for hit in range(200):
+            breakpoint = counting[(stop + hit) % len(counting)]
+            program.Hit(breakpoint,[(0,breakpoint._locations[0].source[1]),(1,5)])
+        dispatcher.FlushCounts()
+        gdb_times.append(time.time() - start)
+        session.Flush()
+        vim_times.append(time.time() - start)
+
+    return Metrics(session,scale["stops"],gdb_times,vim_times)
+
+
+def ProfileScenario(session,scale):
+    """Resolve and show a profile of 50 samples per stop, skewed to hot lines."""
+    from vimgdb.profiler import Profile
+    program = session.program
+    program.Stop([(0,1)])
+    session.Flush()
+
+    generator = random.Random(2)
+    profile = Profile()
+    for sample in range(50 * scale["stops"]):
+        index = min(int(generator.expovariate(0.5)),len(program.files) - 1)
+        line = min(int(generator.expovariate(0.01)) + 1,program.lines)
+        profile.Add(program.Pc(index,line))
+
+    session.Reset()
+    start = time.time()
+    profile.Aggregate(session.vimgdb.gdb)
+    session.vimgdb.ShowProfile(profile)
+    gdb_time = time.time() - start
+    session.Flush()
+    return Metrics(session,1,[gdb_time],[time.time() - start])
+
+
+def Metrics(session,updates,gdb_times,vim_times):
+    server = session.server
+    return {
+        "gdb p50 ms": Percentile(gdb_times,50) * 1000,
+        "gdb p95 ms": Percentile(gdb_times,95) * 1000,
+        "gdb p99 ms": Percentile(gdb_times,99) * 1000,
+        "vim p50 ms": Percentile(vim_times,50) * 1000,
+        "vim p95 ms": Percentile(vim_times,95) * 1000,
+        "bytes/update": float(server.bytes) / updates,
+        "subprocesses/update": float(server.subprocesses) / updates,
+    }
+
+
+SCENARIOS = [
+    ("stop",StopScenario),
+    ("breakpoints",BreakpointScenario),
+    ("objfiles",ObjfileScenario),
+    ("trace",TraceScenario),
+    ("frames",FrameScenario),
+    ("profile",ProfileScenario),
+    ("locals",LocalsScenario),
+    ("threads",ThreadScenario),
+    ("reload",ReloadScenario),
+    ("disassembly",DisassemblyScenario),
+    ("memory",MemoryScenario),
+    ("goto",GotoScenario),
+    ("session",SessionScenario),
+    ("control",ControlScenario),
+    ("count",CountScenario),
+]
+
+
+def StartupScenario(runs=10):
+    """Return time to import vimgdb in a fresh python, the best of a few runs."""
+    import subprocess
+    script = "import time; start = time.time(); import vimgdb.vimgdb; print(time.time() - start)"
+    environment = dict(os.environ,PYTHONPATH=os.path.dirname(BENCH_DIR))
+    times = [ float(subprocess.check_output([sys.executable,"-c",script],env=environment))
+        for _ in range(runs) ]
+    return { "import ms": min(times) * 1000 }
+
+
+def Regressions(results,baseline):
+    regressions = []
+    for key,value in sorted(results.items()):
+        if key not in baseline:
+            continue
+        unit = key.rsplit(" ",1)[-1].split("/")[0]
+        tolerance = TOLERANCE.get(unit,TOLERANCE["ms"])
+        limit = baseline[key] * (1 + tolerance)
+        # ignore noise on tiny latencies
+        if unit == "ms":
+            limit = max(limit,baseline[key] + LATENCY_SLACK_MS)
+        if value > limit + 1e-9:
+            regressions.append("{0}: {1:.3f} > {2:.3f} (baseline {3:.3f})".format(
+                key,value,limit,baseline[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale",choices=sorted(SCALES),default="small")
+    parser.add_argument("--files",type=int)
+    parser.add_argument("--breakpoints",type=int)
+    parser.add_argument("--stops",type=int)
+    parser.add_argument("--transport",action="append",choices=["channel","clientserver","nvim"])
+    parser.add_argument("--sync",action="store_true",help="disable asynchronous updates")
+    parser.add_argument("--legacy",action="store_true",help="simulate gdb without breakpoint locations")
+    parser.add_argument("--scenario",action="append",choices=[ name for name,_ in SCENARIOS ] + ["startup"])
+    parser.add_argument("--baseline",default=os.path.join(BENCH_DIR,"baseline.json"))
+    parser.add_argument("--save-baseline",action="store_true")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args,key) != None:
+            scale[key] = getattr(args,key)
+
+    directory = tempfile.mkdtemp(prefix="vimgdb-bench-")
+    os.environ["HOME"] = directory
+    os.environ["XDG_RUNTIME_DIR"] = directory
+    from vimgdb.nviminterface import SocketPath
+    servers = {
+        "vim": FakeVimServer(directory),
+        "nvim": FakeNeovimServer(SocketPath("VIMGDB")),
+    }
+
+    results = dict()
+    if not args.scenario or "startup" in args.scenario:
+        for metric,value in StartupScenario().items():
+            results["{0}/startup/python {1}".format(args.scale,metric)] = value
+    try:
+        for transport in args.transport or ["channel","clientserver","nvim"]:
+            server = servers["nvim" if transport == "nvim" else "vim"]
+            for name,scenario in SCENARIOS:
+                if args.scenario and name not in args.scenario:
+                    continue
+                session = Session(server,transport,not args.sync,scale["files"],args.legacy)
+                metrics = scenario(session,scale)
+                session.Close()
+                for metric,value in metrics.items():
+                    results["{0}/{1}/{2} {3}".format(args.scale,name,transport,metric)] = value
+    finally:
+        shutil.rmtree(directory,ignore_errors=True)
+
+    width = max(len(key) for key in results)
+    for key in sorted(results):
+        print("{0:<{1}}  {2:12.3f}".format(key,width,results[key]))
+
+    baseline = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline,"w") as stream:
+            json.dump(baseline,stream,indent=2,sort_keys=True)
+            stream.write("\n")
+        return 0
+
+    regressions = Regressions(results,baseline)
+    for regression in regressions:
+        print("REGRESSION {0}".format(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,7 @@ setup(
     license='MIT',
     url='https://github.com/gisodal/vimgdb',
     packages=['vimgdb'],
-    package_data={'vimgdb': ['config/vimrc','config/gdbinit']},
+    package_data={'vimgdb': ['config/vimrc','config/gdbinit','config/vimgdb.lua']},
     scripts = ['bin/vimgdb','bin/vimgdb-server'],
     classifiers=[
         'Development Status :: 4 - Beta',
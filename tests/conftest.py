@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run the tests against the source tree, without installing vimgdb
+sys.path.insert(0,ROOT)
+sys.path.insert(1,os.path.join(ROOT,"bench"))
+
+
+@pytest.fixture
+def program():
+    """Program simulated by the gdb module of the bench (bench/fakegdb.py)."""
+    import fakegdb
+    program = fakegdb.Program(files=4,lines=100)
+    fakegdb.Install(program)
+    return program
@@ -0,0 +1,52 @@
+from vimgdb.breakpoints import BreakpointIndex, ParseInfoBreak
+
+INFO_BREAK = """Num     Type           Disp Enb Address            What
+1       breakpoint     keep y   0x0000000000401136 in main at test.cc:8
+\tbreakpoint already hit 2 times
+2       breakpoint     keep n   0x0000000000401150 in f(int) at ./src/f.cc:12
+3       breakpoint     keep y   <MULTIPLE>
+3.1                         y   0x0000000000401160 in g<int>(int) at g.h:5
+3.2                         n   0x0000000000401170 in g<long>(long) at g.h:5
+4       breakpoint     keep y   0x0000000000401180 in h at h.cc:3 inf 1, 2
+5       breakpoint     keep y   <PENDING>  lib.c:10
+6       hw watchpoint  keep y                      counter
+"""
+
+
+def test_parse_info_break():
+    assert ParseInfoBreak(INFO_BREAK) == [
+        (1,"test.cc",8,True),
+        (2,"./src/f.cc",12,False),
+        (3,"g.h",5,True),
+        (3,"g.h",5,False),
+        (4,"h.cc",3,True),
+    ]
+
+
+def test_parse_info_break_empty():
+    assert ParseInfoBreak("No breakpoints or watchpoints.\n") == []
+
+
+def Index(*locations):
+    """Return index of (number,file,line) without asking gdb."""
+    index = BreakpointIndex()
+    index.built = True
+    for number,filename,line in locations:
+        index.Insert(number,[(filename,line,True)])
+    return index
+
+
+def test_numbers_by_full_path():
+    index = Index((1,"/src/a.c",3),(2,"/src/a.c",3),(3,"/src/a.c",4))
+    assert index.Numbers("/src/a.c",3) == set([1,2])
+    assert index.Numbers("/src/b.c",3) == set()
+
+
+def test_numbers_by_file_name_of_info_break():
+    index = Index((1,"./a.c",3),(2,"dir/b.c",4),(3,".hidden/c.c",5))
+    assert index.Numbers("/src/a.c",3) == set([1])
+    assert index.Numbers("/src/dir/b.c",4) == set([2])
+    assert index.Numbers("/src/.hidden/c.c",5) == set([3])
+    # only a leading './' is dropped, not every '.' and '/'
+    assert index.Numbers("/src/hidden/c.c",5) == set()
+    assert index.Numbers("/src/xa.c",3) == set()
@@ -0,0 +1,82 @@
+from vimgdb.counters import HitCounters
+
+
+class Gdb:
+    """Gdb interface resolving pc 0xF0LL to line LL of file F, pc 0 to no source."""
+
+    def GetPcLocation(self,pc):
+        if pc == 0:
+            return None,None,None,None
+        fullsource = "/src/f{0}.c".format(pc >> 8)
+        return None,fullsource,fullsource[5:],pc & 0xff
+
+
+class Breakpoint:
+    def __init__(self,number,hit_count=0):
+        self.number = number
+        self.hit_count = hit_count
+
+
+def test_hits_per_breakpoint_and_line():
+    counters = HitCounters(Gdb())
+    counters.Hit(1,0x103)
+    counters.Hit(1,0x103)
+    counters.Hit(1,0x204)
+    counters.Hit(2,0x103)
+    assert counters.Lines("/src/f1.c") == {3: 3}
+    assert counters.Lines("/src/f2.c") == {4: 1}
+    assert counters.Lines("/src/f3.c") == {}
+    assert counters.Rows() == [
+        (1,3,[("/src/f1.c",3,2),("/src/f2.c",4,1)]),
+        (2,1,[("/src/f1.c",3,1)])]
+    assert counters.changed == {"/src/f1.c","/src/f2.c"}
+
+
+def test_hit_without_source_counts_breakpoint_only():
+    counters = HitCounters(Gdb())
+    counters.Hit(1,0)
+    assert counters.Rows() == [(1,1,[])]
+    assert counters.changed == set()
+
+
+def test_remove_forgets_lines_of_breakpoint():
+    counters = HitCounters(Gdb())
+    counters.Hit(1,0x103)
+    counters.Hit(2,0x103)
+    counters.Hit(2,0x205)
+    counters.changed = set()
+
+    counters.Remove(2)
+    assert counters.Lines("/src/f1.c") == {3: 1}
+    assert counters.Lines("/src/f2.c") == {}
+    assert counters.Rows() == [(1,1,[("/src/f1.c",3,1)])]
+    assert counters.changed == {"/src/f1.c","/src/f2.c"}
+
+    # removing an unknown breakpoint is fine
+    counters.Remove(7)
+
+
+def test_clear_marks_shown_files_changed():
+    counters = HitCounters(Gdb())
+    counters.Hit(1,0x103)
+    counters.changed = set()
+    counters.Clear()
+    assert counters.Rows() == []
+    assert counters.Lines("/src/f1.c") == {}
+    # vim still shows the counts of f1.c
+    assert counters.changed == {"/src/f1.c"}
+
+
+def test_counted_compares_hit_counts():
+    counters = HitCounters(Gdb())
+    breakpoint = Breakpoint(1)
+    # the first modify event only records the count
+    assert not counters.Counted(breakpoint)
+    breakpoint.hit_count = 1
+    assert counters.Counted(breakpoint)
+    # a modify event of another attribute
+    assert not counters.Counted(breakpoint)
+
+    counters.Remove(1)
+    breakpoint.hit_count = 2
+    assert not counters.Counted(breakpoint)
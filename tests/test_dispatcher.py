@@ -0,0 +1,140 @@
+import pytest
+
+from vimgdb.settings import settings
+
+
+class Vim:
+    def __init__(self,ret=0):
+        self.ret = ret
+        self.sent = []
+        self.worker = None
+
+    def Send(self,commands):
+        self.sent.append(commands)
+        if self.ret == None:
+            raise IOError("vim is gone")
+        return self.ret
+
+
+class Vimgdb:
+    def __init__(self,vim):
+        self.vim = vim
+        self.resync = False
+        self.updates = []
+
+    def Update(self,**request):
+        self.updates.append(request)
+        return 0
+
+
+def Dispatcher(vim=None):
+    from vimgdb.dispatcher import UpdateDispatcher
+    vimgdb = Vimgdb(vim or Vim())
+    return vimgdb,UpdateDispatcher(vimgdb,lambda update,**request: update(**request))
+
+
+@pytest.fixture(autouse=True)
+def async_updates(program,monkeypatch):
+    monkeypatch.setattr(settings,"async_updates",True)
+
+
+def test_merge_first_request_gets_defaults():
+    from vimgdb.dispatcher import Merge, DEFAULTS
+    assert Merge(None,{}) == DEFAULTS
+    assert Merge(None,{"force":True})["force"]
+
+
+def test_merge_combines_flags():
+    from vimgdb.dispatcher import Merge
+    merged = Merge(Merge(None,{"force":True,"goto_line":False}),{"update_file":True,"goto_line":False})
+    assert merged["force"] and merged["update_file"]
+    assert not merged["goto_line"]
+
+
+def test_merge_newest_location_wins():
+    from vimgdb.dispatcher import Merge
+    merged = Merge(Merge(None,{"location":"a.c:1"}),{"location":"b.c:2"})
+    assert merged["location"] == "b.c:2"
+    assert not merged["update_breakpoint"]
+
+
+def test_merge_location_supersedes_breakpoint_update():
+    from vimgdb.dispatcher import Merge
+    merged = Merge(Merge(None,{"update_breakpoint":True}),{"location":"a.c:1"})
+    assert not merged["update_breakpoint"]
+    assert merged["location"] == "a.c:1"
+
+    # a breakpoint update keeps the pending location
+    merged = Merge(Merge(None,{"location":"a.c:1"}),{"update_breakpoint":True})
+    assert not merged["update_breakpoint"]
+    assert merged["location"] == "a.c:1"
+
+
+def test_burst_is_one_update(program):
+    vimgdb,dispatcher = Dispatcher()
+    for line in range(1,11):
+        dispatcher.Request(location="a.c:{0}".format(line))
+    assert len(program.posted) == 1
+    assert vimgdb.updates == []
+
+    program.RunEventLoop()
+    assert len(vimgdb.updates) == 1
+    assert vimgdb.updates[0]["location"] == "a.c:10"
+
+
+def test_held_requests_are_applied_on_release(program):
+    vimgdb,dispatcher = Dispatcher()
+    dispatcher.Hold()
+    dispatcher.Hold()
+    assert dispatcher.Held()
+    dispatcher.Request(location="a.c:1")
+    dispatcher.Request(force=True,location="a.c:2")
+    program.RunEventLoop()
+    assert vimgdb.updates == []
+
+    dispatcher.Release()
+    program.RunEventLoop()
+    assert vimgdb.updates == []
+
+    dispatcher.Release()
+    assert not dispatcher.Held()
+    program.RunEventLoop()
+    assert len(vimgdb.updates) == 1
+    assert vimgdb.updates[0]["location"] == "a.c:2"
+    assert vimgdb.updates[0]["force"]
+
+
+def test_release_without_requests_does_not_update(program):
+    vimgdb,dispatcher = Dispatcher()
+    dispatcher.Hold()
+    dispatcher.Release()
+    program.RunEventLoop()
+    assert program.posted == []
+    assert vimgdb.updates == []
+
+
+def test_worker_concatenates_queued_batches():
+    from vimgdb.dispatcher import SendWorker
+    vim = Vim()
+    worker = SendWorker(vim)
+    with worker.condition:
+        worker.Send(["a"])
+        worker.Send(["b","c"])
+    assert worker.Drain(5)
+    assert [ command for batch in vim.sent for command in batch ] == ["a","b","c"]
+    assert not worker.failed
+
+
+@pytest.mark.parametrize("ret",[1,None])
+def test_failed_send_resyncs_next_update(program,ret):
+    vimgdb,dispatcher = Dispatcher(Vim(ret))
+    dispatcher.worker.Send(["a"])
+    assert dispatcher.worker.Drain(5)
+    assert dispatcher.worker.failed
+    assert not vimgdb.resync
+
+    dispatcher.Request(location="a.c:1")
+    program.RunEventLoop()
+    assert vimgdb.resync
+    assert not dispatcher.worker.failed
+    assert len(vimgdb.updates) == 1
@@ -0,0 +1,40 @@
+import contextlib
+import sys
+import threading
+import types
+
+from vimgdb.gdbthread import StartThread
+
+
+def Run(monkeypatch,module):
+    if module == None:
+        monkeypatch.setitem(sys.modules,"gdb",None)
+    else:
+        monkeypatch.setitem(sys.modules,"gdb",module)
+    done = threading.Event()
+    thread = StartThread(threading.Thread(target=done.set))
+    assert done.wait(5)
+    return thread
+
+
+def test_start_without_gdb(monkeypatch):
+    assert Run(monkeypatch,None).daemon
+
+
+def test_start_with_gdb_without_block_signals(monkeypatch):
+    assert Run(monkeypatch,types.ModuleType("gdb")).daemon
+
+
+def test_start_with_signals_blocked(monkeypatch):
+    blocked = []
+
+    @contextlib.contextmanager
+    def block_signals():
+        blocked.append(True)
+        yield
+        blocked.append(False)
+
+    gdb = types.ModuleType("gdb")
+    gdb.block_signals = block_signals
+    assert Run(monkeypatch,gdb).daemon
+    assert blocked == [True,False]
@@ -0,0 +1,109 @@
+import pytest
+
+from vimgdb.memory import Memory
+from vimgdb.settings import settings
+
+ADDRESS = 0x1000
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    # 4 lines of 16 bytes per page
+    monkeypatch.setattr(settings,"memory_page",64)
+
+
+def Region(length,memory=None):
+    """Return Memory showing 'length' bytes of 'memory' from ADDRESS."""
+    memory = memory if memory != None else bytearray(index & 0xff for index in range(length))
+    region = Memory()
+    region.Open(ADDRESS,length)
+    region.reads = []
+
+    def Read(page):
+        region.reads.append(page)
+        start = page * settings.memory_page
+        return bytes(memory[start:start + settings.memory_page])
+    region.Read = Read
+    return region,memory
+
+
+def test_open_loads_pages_in_view_and_one_more():
+    region,memory = Region(256)
+    first,appended,changed,highlight = region.Update()
+    assert (first,changed,highlight) == (1,{},None)
+    assert region.reads == [0,1]
+    assert len(appended) == 8
+    assert appended[0] == u"0x0000000000001000:  00 01 02 03 04 05 06 07 08 09 0a 0b 0c 0d 0e 0f  ................"
+    assert appended[4].startswith(u"0x0000000000001040:  40 41 ")
+    assert appended[4].endswith(u"  @ABCDEFGHIJKLMNO")
+
+    # nothing to do until vim scrolls or gdb stops
+    assert region.Update() == (9,[],{},None)
+    assert region.reads == [0,1]
+
+
+def test_scrolling_appends_pages():
+    region,memory = Region(256)
+    region.Update()
+    region.View(8,11)
+    first,appended,changed,highlight = region.Update()
+    assert first == 9
+    assert len(appended) == 8
+    assert region.reads == [0,1,2,3]
+
+    # the last page is shorter
+    region,memory = Region(200)
+    region.View(0,20)
+    first,appended,changed,highlight = region.Update()
+    assert len(appended) == 13
+    assert appended[-1].startswith(u"0x00000000000010c0:  c0 c1 c2 c3 c4 c5 c6 c7  ")
+
+
+def test_stop_sends_changed_lines_in_view():
+    region,memory = Region(256)
+    region.Update()
+    region.Stopped(1)
+    memory[17] = 0xff
+    memory[64] = 0xff
+    first,appended,changed,highlight = region.Update()
+    assert appended == []
+    # page 1 is loaded, but not in view
+    assert list(changed) == [2]
+    assert u" ff " in changed[2]
+    assert highlight == [2]
+    assert region.reads == [0,1,0]
+
+    region.View(4,7)
+    first,appended,changed,highlight = region.Update()
+    assert list(changed) == [5]
+    assert highlight == [2,5]
+
+
+def test_unchanged_stop_clears_highlight():
+    region,memory = Region(64)
+    region.Update()
+    region.Stopped(1)
+    memory[0] = 1
+    assert region.Update()[3] == [1]
+
+    region.Stopped(2)
+    assert region.Update()[2:] == ({},[])
+    # no stop, no read
+    region.Stopped(2)
+    assert region.Update()[2:] == ({},None)
+
+
+def test_unreadable_page():
+    region = Memory()
+    region.Open(ADDRESS,32)
+    region.Read = lambda page: None
+    first,appended,changed,highlight = region.Update()
+    assert appended == [u"0x0000000000001000:  <unreadable>",u"0x0000000000001010:  <unreadable>"]
+
+
+def test_read_through_gdb(program):
+    region = Memory()
+    region.Open(ADDRESS,64)
+    assert len(region.Read(0)) == 64
+    region.Open(-64,64)
+    assert region.Read(0) == None
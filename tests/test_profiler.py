@@ -0,0 +1,72 @@
+from vimgdb.profiler import Profile, GRADES
+
+
+class Gdb:
+    """Gdb interface resolving pc N to line N % 100 of file a.c (b.c from
+    pc 100 on), and pcs from 1000 on to no source."""
+
+    def __init__(self):
+        self.lookups = []
+
+    def GetPcLocation(self,pc):
+        self.lookups.append(pc)
+        if pc >= 1000:
+            return None,None,None,None
+        source = "a.c" if pc < 100 else "b.c"
+        return None,"/src/" + source,source,pc % 100
+
+
+def Sampled(*pcs):
+    profile = Profile()
+    for pc in pcs:
+        profile.Add(pc)
+    return profile
+
+
+def test_aggregate_ranks_lines():
+    gdb = Gdb()
+    profile = Sampled(5,7,5,105,5,1000,7,1001,105,105,105)
+    assert profile.Aggregate(gdb) == [
+        (4,"/src/b.c","b.c",5),
+        (3,"/src/a.c","a.c",5),
+        (2,"/src/a.c","a.c",7)]
+    assert profile.unknown == 2
+    # every distinct pc is resolved once
+    assert sorted(gdb.lookups) == [5,7,105,1000,1001]
+
+
+def test_aggregate_ties_by_file_and_line():
+    profile = Sampled(107,9,3,103)
+    assert [ (fullsource,line) for count,fullsource,source,line in profile.Aggregate(Gdb()) ] == [
+        ("/src/a.c",3),("/src/a.c",9),("/src/b.c",3),("/src/b.c",7)]
+
+
+def test_aggregate_without_samples():
+    profile = Profile()
+    assert profile.Aggregate(Gdb()) == []
+    assert profile.Heat() == {}
+    assert profile.Percent(0) == 0.0
+
+
+def test_grade_log_scale():
+    profile = Sampled(*([1] * 10000 + [2] * 100 + [3] * 10 + [4]))
+    profile.Aggregate(Gdb())
+    assert profile.Grade(10000) == GRADES
+    assert profile.Grade(1) == 1
+    assert profile.Grade(10) == 2
+    assert profile.Grade(100) == 3
+    assert profile.Heat() == {"/src/a.c": {1:GRADES,2:3,3:2,4:1}}
+
+
+def test_grade_single_samples_are_hot():
+    profile = Sampled(1,2)
+    profile.Aggregate(Gdb())
+    assert profile.Grade(1) == GRADES
+
+
+def test_report():
+    profile = Sampled(5,5,5,1000)
+    profile.Aggregate(Gdb())
+    report = profile.Report().split("\n")
+    assert report[1] == "Without source: 1 samples (25.0%)"
+    assert report[-1].split() == ["1","3","75.0%","a.c:5"]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from vimgdb.rpc import ExtType, Pack, Unpacker
+
+VALUES = [
+    None, True, False,
+    0, 1, 127, 128, 255, 256, 65535, 65536, 2**32 - 1, 2**32, 2**64 - 1,
+    -1, -32, -33, -128, -129, -32768, -32769, -2**31, -2**31 - 1, -2**63,
+    0.5, -1e300,
+    u"", u"abc", u"x" * 31, u"x" * 32, u"x" * 255, u"x" * 256, u"x" * 65536, u"€ ünïcode",
+    b"", b"\x00\xff", b"x" * 256, b"x" * 65536,
+    [], [1,[2,[3]]], list(range(15)), list(range(16)), list(range(65536)),
+    {}, {u"a": 1, u"b": [True,None]}, dict((number,number) for number in range(16)),
+    ExtType(1,b"\x01"), ExtType(2,b"\x00" * 2), ExtType(3,b"\x00" * 3), ExtType(0,b"\x00" * 300),
+]
+
+
+@pytest.mark.parametrize("value",VALUES,ids=range(len(VALUES)))
+def test_round_trip(value):
+    unpacker = Unpacker()
+    unpacker.Feed(Pack(value))
+    assert list(unpacker) == [value]
+
+
+def test_tuple_packs_as_array():
+    unpacker = Unpacker()
+    unpacker.Feed(Pack((1,u"a")))
+    assert list(unpacker) == [[1,u"a"]]
+
+
+def test_fed_in_pieces():
+    messages = [[0,1,u"nvim_call_atomic",[[[u"nvim_command",[u"echo 1"]]]]],[1,1,None,[[],None]],[2,u"vimgdb",[u"break",u"/a.c",3]]]
+    data = b"".join(Pack(message) for message in messages)
+    unpacker = Unpacker()
+    received = []
+    for offset in range(0,len(data),3):
+        unpacker.Feed(data[offset:offset+3])
+        received.extend(unpacker)
+    assert received == messages
+
+
+def test_invalid_type():
+    unpacker = Unpacker()
+    unpacker.Feed(b"\xc1")
+    with pytest.raises(ValueError):
+        list(unpacker)
+
+
+def test_cannot_pack():
+    with pytest.raises(TypeError):
+        Pack(object())
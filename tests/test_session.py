@@ -0,0 +1,132 @@
+import sys
+import types
+
+import pytest
+
+from vimgdb.session import Session
+
+
+class Breakpoint:
+    """gdb.Breakpoint that records how it was created."""
+
+    def __init__(self,spec,type=1,wp_class=None,internal=False,temporary=False):
+        if spec.startswith("nosuch"):
+            raise gdb.error("Function \"{0}\" not defined.".format(spec))
+        self.type = type
+        self.location = spec if wp_class == None else None
+        self.expression = spec if wp_class != None else None
+        self.wp_class = wp_class
+        self.temporary = temporary
+        self.visible = not internal
+        self.enabled = True
+        self.silent = False
+        self.condition = None
+        self.ignore_count = 0
+        self.commands = None
+        gdb.created.append(self)
+
+    def is_valid(self):
+        return True
+
+    def __setattr__(self,name,value):
+        if name == "condition" and value == "invalid":
+            raise gdb.error("No symbol \"invalid\" in current context.")
+        object.__setattr__(self,name,value)
+
+
+class Counting(Breakpoint):
+    counting = True
+
+
+gdb = types.ModuleType("gdb")
+gdb.error = type("error",(RuntimeError,),{})
+gdb.Breakpoint = Breakpoint
+gdb.BP_BREAKPOINT,gdb.BP_WATCHPOINT,gdb.BP_READ_WATCHPOINT = 1,6,8
+gdb.WP_WRITE,gdb.WP_READ = 1,2
+
+
+@pytest.fixture(autouse=True)
+def fake_gdb(monkeypatch):
+    gdb.created = []
+    gdb.breakpoints = lambda: tuple(gdb.created)
+    monkeypatch.setitem(sys.modules,"gdb",gdb)
+
+
+def test_create_breakpoints_with_attributes():
+    created,errors = Session().Create([
+        {"type":"BP_BREAKPOINT","location":"a.c:3","condition":"x > 1","enabled":False},
+        {"type":"BP_BREAKPOINT","location":"main","temporary":True,"ignore_count":2},
+    ])
+    assert (created,errors) == (2,[])
+    first,second = gdb.created
+    assert (first.location,first.condition,first.enabled,first.temporary) == ("a.c:3","x > 1",False,False)
+    assert (second.location,second.temporary,second.ignore_count) == ("main",True,2)
+
+
+def test_create_watchpoints():
+    created,errors = Session().Create([
+        {"type":"BP_WATCHPOINT","expression":"x"},
+        {"type":"BP_READ_WATCHPOINT","expression":"y"},
+    ])
+    assert (created,errors) == (2,[])
+    assert [ (watchpoint.expression,watchpoint.type,watchpoint.wp_class) for watchpoint in gdb.created ] == [
+        ("x",gdb.BP_WATCHPOINT,gdb.WP_WRITE),
+        ("y",gdb.BP_WATCHPOINT,gdb.WP_READ)]
+
+
+def test_existing_breakpoints_are_not_created_again():
+    Breakpoint("a.c:3")
+    Breakpoint("x",type=gdb.BP_WATCHPOINT,wp_class=gdb.WP_WRITE)
+    created,errors = Session().Create([
+        {"type":"BP_BREAKPOINT","location":"a.c:3"},
+        {"type":"BP_WATCHPOINT","expression":"x"},
+        # a breakpoint on a function named like a watched expression
+        {"type":"BP_BREAKPOINT","location":"x"},
+    ])
+    assert (created,errors) == (1,[])
+    assert gdb.created[-1].location == "x"
+
+
+def test_counting_breakpoints():
+    records = [ {"type":"BP_BREAKPOINT","location":"a.c:3","counting":True},
+        {"type":"BP_BREAKPOINT","location":"a.c:4"} ]
+    assert Session().Create(records,counting=Counting) == (2,[])
+    assert [ type(breakpoint) for breakpoint in gdb.created ] == [Counting,Breakpoint]
+
+    gdb.created = []
+    assert Session().Create(records) == (2,[])
+    assert [ type(breakpoint) for breakpoint in gdb.created ] == [Breakpoint,Breakpoint]
+
+
+def test_errors_are_reported_per_breakpoint():
+    created,errors = Session().Create([
+        {"type":"BP_HARDWARE_BREAKPOINT","location":"a.c:1"},
+        {"type":"BP_BREAKPOINT","location":"nosuch"},
+        {"type":"BP_BREAKPOINT","location":"a.c:2","condition":"invalid"},
+        {"location":"a.c:5"},
+        {"type":"BP_BREAKPOINT","location":"a.c:3"},
+    ])
+    assert created == 2
+    assert errors == [
+        "a.c:1: unsupported type BP_HARDWARE_BREAKPOINT",
+        "nosuch: Function \"nosuch\" not defined.",
+        "a.c:2: cannot restore condition: No symbol \"invalid\" in current context.",
+        "a.c:5: unsupported type ",
+    ]
+    assert [ breakpoint.location for breakpoint in gdb.created ] == ["a.c:2","a.c:3"]
+
+
+def test_saved_breakpoints_are_created_again():
+    Breakpoint("a.c:3").condition = "x > 1"
+    Counting("a.c:4",temporary=True)
+    Breakpoint("x",type=gdb.BP_WATCHPOINT,wp_class=gdb.WP_WRITE).enabled = False
+    Breakpoint("internal",internal=True)
+    records = Session().Breakpoints()
+    assert records == [
+        {"type":"BP_BREAKPOINT","location":"a.c:3","condition":"x > 1"},
+        {"type":"BP_BREAKPOINT","location":"a.c:4","temporary":True,"counting":True},
+        {"type":"BP_WATCHPOINT","expression":"x","enabled":False}]
+
+    gdb.created = []
+    assert Session().Create(records,counting=Counting) == (3,[])
+    assert Session().Breakpoints() == records
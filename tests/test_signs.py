@@ -0,0 +1,82 @@
+from vimgdb.viminterface import Vim
+
+BREAKPOINT = "VimgdbBreakpointSign"
+LOCATION = "VimgdbLocationSign"
+
+
+def Recording():
+    """Return Vim recording its UpdateSigns() calls instead of adding commands."""
+    vim = Vim()
+    vim.calls = []
+    vim.UpdateSigns = lambda filename,place,unplace=(),clear=False,group=None: vim.calls.append(
+        (filename,sorted(place),sorted(unplace),clear))
+    return vim
+
+
+def test_new_file_is_cleared_and_placed():
+    vim = Recording()
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT)}})
+    assert vim.calls == [("a.c",[(3,3,BREAKPOINT)],[],True)]
+    assert vim.signs == {"a.c": {3: (3,BREAKPOINT)}}
+
+
+def test_only_differences_are_sent():
+    vim = Recording()
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT),999: (5,LOCATION)},"b.c": {4: (4,BREAKPOINT)}})
+    vim.calls = []
+
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT),7: (7,BREAKPOINT),999: (6,LOCATION)},"b.c": {4: (4,BREAKPOINT)}})
+    # a moved sign is removed and placed again
+    assert vim.calls == [("a.c",[(7,7,BREAKPOINT),(999,6,LOCATION)],[999],False)]
+
+    vim.calls = []
+    vim.SyncSigns({"a.c": {3: (3,"VimgdbDisabledBreakpointSign"),7: (7,BREAKPOINT),999: (6,LOCATION)},
+        "b.c": {4: (4,BREAKPOINT)}})
+    # a sign on the same line changes its type in place
+    assert vim.calls == [("a.c",[(3,3,"VimgdbDisabledBreakpointSign")],[],False)]
+
+
+def test_unchanged_signs_send_nothing():
+    vim = Recording()
+    signs = {"a.c": {3: (3,BREAKPOINT)}}
+    vim.SyncSigns(signs)
+    vim.calls = []
+    vim.SyncSigns(signs)
+    assert vim.calls == []
+
+
+def test_signs_of_dropped_files_are_removed():
+    vim = Recording()
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT),4: (4,BREAKPOINT)},"b.c": {}})
+    vim.calls = []
+    vim.SyncSigns({})
+    assert vim.calls == [("a.c",[],[3,4],False)]
+    assert vim.signs == {}
+
+
+def test_unknown_files_are_cleared():
+    vim = Recording()
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT)},"b.c": {4: (4,BREAKPOINT)}})
+    vim.ForgetSigns()
+    vim.calls = []
+
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT)}})
+    assert sorted(vim.calls) == [("a.c",[(3,3,BREAKPOINT)],[],True),("b.c",[],[],True)]
+
+    vim.calls = []
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT)}})
+    assert vim.calls == []
+
+
+def test_adopted_signs_are_not_placed_again():
+    vim = Recording()
+    vim.AdoptSigns({"a.c": {3: (3,BREAKPOINT),8: (8,BREAKPOINT)}})
+    vim.SyncSigns({"a.c": {3: (3,BREAKPOINT)}})
+    assert vim.calls == [("a.c",[],[8],False)]
+
+
+def test_update_signs_is_one_call_per_file():
+    vim = Vim()
+    vim.UpdateSigns("a.c",[(3,3,BREAKPOINT),(1000005,5,"VimgdbThreadSign")],[7],False)
+    assert vim.command == [u"call VimgdbSigns('{0}','a.c',[[3,3,'{1}'],[1000005,5,'VimgdbThreadSign',5]],[7],0)".format(
+        vim.group,BREAKPOINT)]
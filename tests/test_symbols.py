@@ -0,0 +1,54 @@
+import pytest
+
+from vimgdb.symbols import FunctionName, ObjfileIndex
+
+
+@pytest.mark.parametrize("declaration,name",[
+    ("int main(int, char **)","main"),
+    ("static void helper(void)","helper"),
+    ("int ns::Class<int, 2>::Method(char const*) const","ns::Class<int, 2>::Method"),
+    ("int (*f(int))(int)","f"),
+    ("std::vector<int, std::allocator<int> > make<int>(unsigned long)","make<int>"),
+    ("void f(operator_t)","f"),
+    ("void operator()(int)","operator()"),
+    ("bool operator<(const T&)","operator<"),
+    ("bool ns::A<int, 2>::operator<(ns::A<int, 2> const&) const","ns::A<int, 2>::operator<"),
+    ("std::ostream& operator<<(std::ostream&, A const&)","operator<<"),
+    ("X& X::operator=(X const&)","X::operator="),
+    ("void* operator new[](unsigned long)","operator new[]"),
+    ("A::operator bool() const","A::operator bool"),
+    ("A::operator char const*() const","A::operator char const*"),
+    ("int x::operator->*(int)","x::operator->*"),
+])
+def test_function_name(declaration,name):
+    assert FunctionName(declaration) == name
+
+
+def test_function_name_without_parameters():
+    assert FunctionName("int counter") == None
+
+
+def Index(*names):
+    return ObjfileIndex.Create({ name: ("/src/a.c",1) for name in names },["/src/a.c"])
+
+
+def test_fuzzy():
+    index = Index("main","ns::Class::Method","parse_args","print_usage")
+    assert index.Fuzzy("ar",10) == ["parse_args"]
+    assert index.Fuzzy("pa",10) == ["parse_args","print_usage"]
+    assert index.Fuzzy("nsCM",10) == ["ns::Class::Method"]
+    assert index.Fuzzy("pru",10) == ["print_usage"]
+    assert index.Fuzzy("ma",10) == ["main"]
+    assert index.Fuzzy("zz",10) == []
+
+
+def test_fuzzy_limit():
+    index = Index(*("function{0}".format(number) for number in range(100)))
+    assert len(index.Fuzzy("fn",10)) == 10
+
+
+def test_fuzzy_near_misses():
+    # names that match all but the last character, which made the regular
+    # expression used before backtrack polynomially
+    index = Index(*("a" * 200 + str(number) for number in range(200)))
+    assert index.Fuzzy("a" * 20 + "b",10) == []
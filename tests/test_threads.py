@@ -0,0 +1,23 @@
+import pytest
+
+from vimgdb.threads import ParseThreads
+from vimgdb.vimgdbexception import VimgdbError
+
+
+@pytest.mark.parametrize("arg,numbers",[
+    ("",set()),
+    ("4",{4}),
+    ("1 3 3",{1,3}),
+    ("1,3, 5",{1,3,5}),
+    ("10-13",{10,11,12,13}),
+    ("1 4-5 7",{1,4,5,7}),
+    ("5-5",{5}),
+])
+def test_parse_threads(arg,numbers):
+    assert ParseThreads(arg) == numbers
+
+
+@pytest.mark.parametrize("arg",["all","1 x","-3","2-x","1.2","3-4-5"])
+def test_parse_threads_invalid(arg):
+    with pytest.raises(VimgdbError):
+        ParseThreads(arg)
@@ -0,0 +1,56 @@
+import pytest
+
+from vimgdb.trace import Trace
+from vimgdb.vimgdbexception import VimgdbError
+
+
+def Record(trace,count):
+    for index in range(count):
+        if index % 5 == 0:
+            trace.Record(0x1000 + index,None,None,None,index % 3,1)
+        else:
+            trace.Record(0x1000 + index,u"/src/f{0}.c".format(index % 4),u"f{0}.c".format(index % 4),index,index % 3,1 + index % 2)
+
+
+def test_save_load(tmp_path):
+    trace = Trace(100)
+    Record(trace,40)
+    filename = str(tmp_path / "trace")
+    trace.Save(filename)
+
+    loaded = Trace()
+    loaded.Load(filename)
+    assert len(loaded) == 40
+    assert loaded.dropped == 0
+    assert [ loaded.Get(index) for index in range(40) ] == [ trace.Get(index) for index in range(40) ]
+
+
+def test_save_load_wrapped(tmp_path):
+    trace = Trace(16)
+    Record(trace,50)
+    assert len(trace) == 16 and trace.dropped == 34
+    filename = str(tmp_path / "trace")
+    trace.Save(filename)
+
+    loaded = Trace()
+    loaded.Load(filename)
+    assert len(loaded) == 16
+    assert loaded.dropped == 34
+    assert [ loaded.Get(index) for index in range(16) ] == [ trace.Get(index) for index in range(16) ]
+    assert loaded.Get(0)[0] == 0x1000 + 34
+
+    # recording goes on after the loaded stops
+    loaded.Record(0x2000,u"/src/g.c",u"g.c",1,0,1)
+    assert loaded.Get(len(loaded) - 1) == (0x2000,u"/src/g.c",u"g.c",1,0,1)
+
+
+def test_load_invalid(tmp_path):
+    filename = tmp_path / "trace"
+    filename.write_bytes(b"not a trace")
+    with pytest.raises(VimgdbError):
+        Trace().Load(str(filename))
+
+
+def test_load_missing(tmp_path):
+    with pytest.raises(VimgdbError):
+        Trace().Load(str(tmp_path / "missing"))
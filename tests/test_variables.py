@@ -0,0 +1,87 @@
+from vimgdb.variables import Row, Variables
+
+
+def Locals(**values):
+    rows = [ Row(None,0,"Locals:",None) ]
+    for name,text in sorted(values.items()):
+        rows.append(Row(("local",name),0,name,text))
+    return rows
+
+
+def Shown(**frames):
+    """Return Variables showing rows frames[frame] of each frame."""
+    variables = Variables()
+    variables.Build = lambda frame: frames[frame]()
+    return variables
+
+
+def test_first_update_sends_all_lines():
+    variables = Shown(main=lambda: Locals(a="1",b="2"))
+    assert variables.Update("main",1) == (1,["Locals:","  a = 1","  b = 2"],[])
+
+
+def test_next_stop_sends_changed_lines():
+    values = {"a":"1","b":"2"}
+    variables = Shown(main=lambda: Locals(**values))
+    variables.Update("main",1)
+
+    values["b"] = "3"
+    assert variables.Update("main",2) == (None,{3:"  b = 3"},[3])
+
+    # unchanged at the next stop: nothing to send, nothing highlighted
+    assert variables.Update("main",3) == (None,{},[])
+
+
+def test_changes_stay_highlighted_within_a_stop():
+    values = {"a":"1"}
+    variables = Shown(main=lambda: Locals(**values))
+    variables.Update("main",1)
+    values["a"] = "2"
+    assert variables.Update("main",2) == (None,{2:"  a = 2"},[2])
+
+    # rebuilt at the same stop, e.g. after expanding a value
+    assert variables.Update("main",2) == (None,{},[2])
+
+
+def test_added_rows_send_lines_from_first_difference():
+    values = {"a":"1","c":"3"}
+    variables = Shown(main=lambda: Locals(**values))
+    variables.Update("main",1)
+
+    values["b"] = "2"
+    assert variables.Update("main",2) == (3,["  b = 2","  c = 3"],[])
+
+    del values["b"],values["c"]
+    assert variables.Update("main",3) == (3,[],[])
+
+
+def test_other_frame_highlights_nothing():
+    variables = Shown(main=lambda: Locals(a="1"),f=lambda: Locals(a="2"))
+    variables.Update("main",1)
+    assert variables.Update("f",1) == (None,{2:"  a = 2"},[])
+
+
+def test_expandable_rows_show_markers():
+    row = Row(("local","s"),0,"s",u"{...}",True)
+    assert row.Line(set()) == u"+ s = {...}"
+    assert row.Line({("local","s")}) == u"- s = {...}"
+    assert Row(("local","s","x"),1,"x",u"a\nb").Line(set()) == u"    x = a b"
+
+
+def test_frame_of_the_program(program):
+    program.Stop([(1,5)])
+    first,lines,changed = Variables().Update(program.Frame(0),1)
+    assert first == 1
+    assert lines[:2] == ["Arguments:","  argc = 2"]
+    assert "Locals:" in lines
+    assert "  line = 5" in lines
+
+
+class FrameWithoutBlock:
+    def block(self):
+        raise RuntimeError("Cannot locate block for frame.")
+
+
+def test_frame_without_variables(program):
+    first,lines,changed = Variables().Update(FrameWithoutBlock(),1)
+    assert (first,lines) == (1,["No arguments, locals or watches"])
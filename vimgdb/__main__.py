@@ -7,10 +7,11 @@ try:
     if "--version" in sys.argv:
         print("Version {0}".format(vimgdb.Version()))
     else:
+        args = vimgdb.SelectServer(sys.argv[1:])
         if not vimgdb.Running():
-            vimgdb.StartVim(sys.argv[1:])
+            vimgdb.StartVim(args)
         else:
-            vimgdb.StartGdb(sys.argv[1:])
+            vimgdb.StartGdb(args)
 
 except Exception as error:
     print(traceback.format_exc())
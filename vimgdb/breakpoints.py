@@ -0,0 +1,156 @@
+from __future__ import print_function
+import os
+
+# breakpoint (location) row of 'info break', e.g.:
+#   1       breakpoint     keep y   0x0000000000401136 in main at test.cc:8
+#   2.1                         n   0x0000000000401150 in f<int>(int) at t.cc:5
+INFO_BREAK = (r'^([0-9]+)(?:\.[0-9]+)?\s.*?\s([yn])\s.*\sat\s(.+):([0-9]+)(?:\s+inf\s+[0-9, ]+)?$')
+
+
+def ParseInfoBreak(output):
+    """Parse 'info break' output into (number,file,line,enabled) tuples."""
+    import re
+    pattern = re.compile(INFO_BREAK)
+    locations = []
+    for row in output.split('\n'):
+        match = pattern.match(row.rstrip())
+        if match:
+            number,enabled,filename,line = match.groups()
+            locations.append((int(number),filename,int(line),enabled == 'y'))
+    return locations
+
+
+class BreakpointIndex:
+    """Breakpoint locations indexed by file, line and breakpoint number.
+
+    The index is built once from all breakpoints and then kept up to date with
+    Add() and Remove() from gdb's breakpoint events. Added breakpoints are
+    only indexed at the next lookup, so a burst of events (restoring a
+    session, pending breakpoints resolving in a loaded library) costs one
+    'info break'. Locations are keyed by full path when gdb provides
+    structured breakpoint locations (gdb >= 13), otherwise by the file name
+    as shown by 'info break'."""
+
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        """Forget all breakpoints. The index is rebuilt on next lookup."""
+        self.files = dict()      # file -> line -> number -> enabled
+        self.locations = dict()  # number -> [(file,line)]
+        self.added = set()       # numbers of breakpoints to index at the next lookup
+        self.built = False
+
+    def Build(self):
+        """Index all breakpoints known to gdb."""
+        import gdb
+        self.Clear()
+        self.built = True
+
+        breakpoints = gdb.breakpoints() or ()
+        if not breakpoints:
+            return
+
+        if hasattr(breakpoints[0],"locations"):
+            for breakpoint in breakpoints:
+                self.Insert(breakpoint.number,self.GetLocations(breakpoint))
+        else:
+            # parse all breakpoints with one 'info break'
+            enabled = { breakpoint.number: breakpoint.enabled for breakpoint in breakpoints }
+            locations = dict()
+            for number,filename,line,location_enabled in ParseInfoBreak(
+                    gdb.execute('info break',to_string=True)):
+                if number in enabled:
+                    locations.setdefault(number,[]).append(
+                            (filename,line,location_enabled and enabled[number]))
+            for number in locations:
+                self.Insert(number,locations[number])
+
+    def GetLocations(self,breakpoint):
+        """Return (file,line,enabled) of all locations of a breakpoint."""
+        if hasattr(breakpoint,"locations"):
+            locations = []
+            for location in breakpoint.locations:
+                if location.source == None:
+                    continue
+                filename = location.fullname or location.source[0]
+                locations.append((filename,location.source[1],
+                    location.enabled and breakpoint.enabled))
+            return locations
+        else:
+            import gdb
+            output = gdb.execute('info break {0}'.format(breakpoint.number),to_string=True)
+            return [ (filename,line,enabled and breakpoint.enabled)
+                    for number,filename,line,enabled in ParseInfoBreak(output)
+                    if number == breakpoint.number ]
+
+    def Insert(self,number,locations):
+        for filename,line,enabled in locations:
+            lines = self.files.setdefault(filename,dict())
+            numbers = lines.setdefault(line,dict())
+            numbers[number] = numbers.get(number,False) or enabled
+            self.locations.setdefault(number,[]).append((filename,line))
+
+    def Add(self,breakpoint):
+        """Index new or modified breakpoint, at the next lookup."""
+        if self.built:
+            self.added.add(breakpoint.number)
+
+    def Update(self):
+        """Index the breakpoints added since the last lookup."""
+        import gdb
+        breakpoints = { breakpoint.number: breakpoint for breakpoint in gdb.breakpoints() or () }
+        if len(self.added) > 1 and breakpoints and not hasattr(next(iter(breakpoints.values())),"locations"):
+            # parse all breakpoints with one 'info break'
+            self.Build()
+            return
+
+        added,self.added = self.added,set()
+        for number in added:
+            self.Remove(number)
+            breakpoint = breakpoints.get(number)
+            if breakpoint != None and breakpoint.is_valid():
+                self.Insert(number,self.GetLocations(breakpoint))
+
+    def Sync(self):
+        """Build the index, or index the added breakpoints, before a lookup."""
+        if not self.built:
+            self.Build()
+        elif self.added:
+            self.Update()
+
+    def Remove(self,number):
+        """Remove breakpoint from index."""
+        self.added.discard(number)
+        for filename,line in set(self.locations.pop(number,())):
+            lines = self.files[filename]
+            numbers = lines[line]
+            del numbers[number]
+            if not numbers:
+                del lines[line]
+                if not lines:
+                    del self.files[filename]
+
+    def Lines(self,*filenames):
+        """Return {line: enabled} of breakpoints in file(s), a line is enabled if any breakpoint on it is."""
+        self.Sync()
+
+        breaklines = dict()
+        for filename in set(filenames):
+            for line,numbers in self.files.get(filename,{}).items():
+                breaklines[line] = breaklines.get(line,False) or any(numbers.values())
+        return breaklines
+
+    def Numbers(self,fullsource,line):
+        """Return numbers of the breakpoints on line of a file. Files named
+        as by 'info break' match by the tail of the full path."""
+        self.Sync()
+
+        if fullsource in self.files:
+            return set(self.files[fullsource].get(line,()))
+        numbers = set()
+        for filename,lines in self.files.items():
+            # 'info break' may name a file './a.c', or '.hidden/a.c'
+            if line in lines and fullsource.endswith(u"/" + os.path.normpath(filename)):
+                numbers.update(lines[line])
+        return numbers
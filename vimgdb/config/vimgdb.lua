@@ -0,0 +1,115 @@
+-- vimgdb helpers for neovim, loaded over msgpack-rpc on connect (see nviminterface.py)
+local M = {}
+
+-- extmark options of sign types, taken from the signs defined in vimrc
+local styles = {}
+
+local function style(name)
+  if styles[name] == nil then
+    local defined = vim.fn.sign_getdefined(name)[1] or {}
+    styles[name] = {
+      sign_text = defined.text,
+      sign_hl_group = defined.texthl,
+      line_hl_group = defined.linehl,
+    }
+  end
+  return styles[name]
+end
+
+-- sign type of placed marks: namespace -> buffer -> id -> type, kept
+-- when this file is loaded again on reconnect
+local types = (_G.vimgdb or {}).types or {}
+M.types = types
+
+local function buffer(file)
+  local nr = vim.fn.bufadd(file)
+  vim.fn.bufload(nr)
+  return nr
+end
+
+-- update marks of namespace in file: optionally clear all, remove marks
+-- with the ids in 'unplace', then place or move marks {id, line, sign type, priority}
+function M.marks(namespace, file, place, unplace, clear)
+  local ns = vim.api.nvim_create_namespace(namespace)
+  local nr = buffer(file)
+  types[ns] = types[ns] or {}
+  if clear then
+    vim.api.nvim_buf_clear_namespace(nr, ns, 0, -1)
+    types[ns][nr] = nil
+  end
+  local placed = types[ns][nr] or {}
+  types[ns][nr] = placed
+  for _, id in ipairs(unplace) do
+    vim.api.nvim_buf_del_extmark(nr, ns, id)
+    placed[id] = nil
+  end
+  for _, mark in ipairs(place) do
+    local opts = vim.tbl_extend('force', style(mark[3]), {id = mark[1], priority = mark[4]})
+    -- lines beyond the end of the file are skipped, as :sign does
+    if pcall(vim.api.nvim_buf_set_extmark, nr, ns, mark[2] - 1, 0, opts) then
+      placed[mark[1]] = mark[3]
+    end
+  end
+end
+
+-- current file, and marks of namespace in files: {current = file, signs = {file = {{id, line, type}}}}
+function M.placed(namespace, files)
+  local ns = vim.api.nvim_create_namespace(namespace)
+  local signs = vim.empty_dict()
+  for _, file in ipairs(files) do
+    signs[file] = {}
+    local nr = vim.fn.bufnr(file)
+    if nr ~= -1 then
+      local placed = (types[ns] or {})[nr] or {}
+      for _, mark in ipairs(vim.api.nvim_buf_get_extmarks(nr, ns, 0, -1, {})) do
+        table.insert(signs[file], {mark[1], mark[2] + 1, placed[mark[1]] or ''})
+      end
+    end
+  end
+  return {current = vim.fn.expand('%:p'), signs = signs}
+end
+
+-- remove marks of namespace from all buffers
+function M.clear(namespace)
+  local ns = vim.api.nvim_create_namespace(namespace)
+  for _, nr in ipairs(vim.api.nvim_list_bufs()) do
+    vim.api.nvim_buf_clear_namespace(nr, ns, 0, -1)
+  end
+  types[ns] = nil
+end
+
+-- show hit counts {line, hits} of breakpoints in file after their lines, in
+-- the namespace of a session, optionally removing all counts first; 0 hits
+-- removes the count of a line
+function M.counts(namespace, file, counts, clear)
+  local ns = vim.api.nvim_create_namespace(namespace)
+  local nr = buffer(file)
+  if clear then
+    vim.api.nvim_buf_clear_namespace(nr, ns, 0, -1)
+  end
+  for _, count in ipairs(counts) do
+    local line, hits = count[1], count[2]
+    if hits > 0 then
+      local text = string.format('  %d %s', hits, hits == 1 and 'hit' or 'hits')
+      pcall(vim.api.nvim_buf_set_extmark, nr, ns, line - 1, 0,
+        {id = line, virt_text = {{text, 'VimgdbCount'}}, virt_text_pos = 'eol'})
+    else
+      vim.api.nvim_buf_del_extmark(nr, ns, line)
+    end
+  end
+end
+
+-- show lines in a floating window at the cursor, until the cursor moves
+function M.popup(lines)
+  local nr = vim.api.nvim_create_buf(false, true)
+  vim.api.nvim_buf_set_lines(nr, 0, -1, false, lines)
+  local width = 1
+  for _, line in ipairs(lines) do
+    width = math.max(width, vim.fn.strdisplaywidth(line))
+  end
+  local win = vim.api.nvim_open_win(nr, false, {relative = 'cursor', row = 1, col = 0,
+    width = width, height = #lines, style = 'minimal', border = 'single'})
+  vim.cmd(string.format('autocmd CursorMoved,InsertEnter,BufLeave * ++once lua pcall(vim.api.nvim_win_close, %d, true)', win))
+end
+
+_G.vimgdb = M
@@ -0,0 +1,68 @@
+from __future__ import print_function
+
+
+class HitCounters:
+    """Hit counts of breakpoints, per breakpoint and per source line of the
+    locations hit.
+
+    Counts are kept from stop events and from counting breakpoints (see
+    'vimgdb count'), which count in their stop() method and never stop the
+    program, so they are known without asking gdb. A hit costs a lookup of
+    its pc in the memoized Gdb.GetPcLocation."""
+
+    def __init__(self,gdb):
+        self.gdb = gdb
+        self.hit_counts = dict()    # number -> hit count seen in the last modify event
+        self.files = dict()
+        self.Clear()
+
+    def Clear(self):
+        """Forget all counts."""
+        self.changed = set(self.files)  # files whose counts changed since they were shown
+        self.breakpoints = dict()   # number -> hits
+        self.files = dict()         # full path -> line -> number -> hits
+        self.lines = dict()         # number -> {(full path,line)}
+
+    def Hit(self,number,pc):
+        """Count hit of breakpoint 'number' at pc."""
+        self.breakpoints[number] = self.breakpoints.get(number,0) + 1
+        symtab,fullsource,source,line = self.gdb.GetPcLocation(pc)
+        if fullsource == None or not line:
+            return
+        location = fullsource,line
+        numbers = self.files.setdefault(fullsource,dict()).setdefault(line,dict())
+        if number not in numbers:
+            self.lines.setdefault(number,set()).add(location)
+        numbers[number] = numbers.get(number,0) + 1
+        self.changed.add(fullsource)
+
+    def Remove(self,number):
+        """Forget counts of deleted breakpoint."""
+        self.breakpoints.pop(number,None)
+        self.hit_counts.pop(number,None)
+        for fullsource,line in self.lines.pop(number,()):
+            lines = self.files[fullsource]
+            del lines[line][number]
+            if not lines[line]:
+                del lines[line]
+            self.changed.add(fullsource)
+
+    def Counted(self,breakpoint):
+        """Return True if the hit count of breakpoint changed since the last
+        call, i.e. if a modify event of it is a hit."""
+        previous = self.hit_counts.get(breakpoint.number)
+        self.hit_counts[breakpoint.number] = breakpoint.hit_count
+        return previous != None and previous != breakpoint.hit_count
+
+    def Lines(self,fullsource):
+        """Return {line: hits} of a file."""
+        return { line: sum(numbers.values()) for line,numbers in self.files.get(fullsource,{}).items() }
+
+    def Rows(self):
+        """Return (number,hits,[(full path,line,hits)]) of breakpoints that were hit."""
+        rows = []
+        for number in sorted(self.breakpoints):
+            locations = sorted( (fullsource,line,self.files[fullsource][line][number])
+                for fullsource,line in self.lines.get(number,()) )
+            rows.append((number,self.breakpoints[number],locations))
+        return rows
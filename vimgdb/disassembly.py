@@ -0,0 +1,120 @@
+from __future__ import print_function
+import sys
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+
+class Listing:
+    """Disassembly of one function, interleaved with its source lines."""
+
+    def __init__(self,start,end,lines,rows):
+        self.start = start      # addresses [start,end)
+        self.end = end
+        self.lines = lines      # lines of the panel
+        self.rows = rows        # instruction address -> line number in the panel
+
+    def Contains(self,pc):
+        return self.start <= pc < self.end
+
+
+class Disassembly:
+    """Disassembly of the functions of stopped frames, for the disassembly panel.
+
+    A function is disassembled once, and kept until objfiles change (see
+    Gdb.Invalidate), so stepping by instruction inside a function only moves
+    the marker of the current instruction. Code outside of any known
+    function is disassembled in windows of settings.disassembly_window
+    instructions."""
+
+    def __init__(self,gdb):
+        self.gdb = gdb
+        self.generation = 0
+        self.Clear()
+
+    def Clear(self):
+        """Forget all listings."""
+        self.listings = dict()  # start address -> Listing
+        self.last = None
+        self.generation += 1
+        # linecache is imported at the first source line, nothing to clear before
+        linecache = sys.modules.get("linecache")
+        if linecache != None:
+            linecache.clearcache()
+
+    def Function(self,pc):
+        """Return name,start,end of the function containing pc, or None."""
+        import gdb
+        try:
+            block = gdb.block_for_pc(pc)
+        except (RuntimeError, gdb.error):
+            return None
+        while block != None and block.function == None:
+            block = block.superblock
+        if block == None:
+            return None
+        return block.function.print_name,block.start,block.end
+
+    def Lookup(self,pc,architecture):
+        """Return Listing containing pc, disassembling its function if it is not known."""
+        if self.last != None and self.last.Contains(pc):
+            return self.last
+
+        function = self.Function(pc)
+        if function != None and function[1] in self.listings:
+            listing = self.listings[function[1]]
+        else:
+            listing = None
+            if function == None:
+                for known in self.listings.values():
+                    if known.Contains(pc):
+                        listing = known
+                        break
+            if listing == None:
+                listing = self.Disassemble(pc,function,architecture)
+                self.listings[listing.start] = listing
+
+        self.last = listing
+        return listing
+
+    def Disassemble(self,pc,function,architecture):
+        """Return Listing of function (name,start,end), or of a window from
+        pc on if it is None."""
+        import gdb
+        try:
+            if function != None:
+                name,start,end = function
+                instructions = architecture.disassemble(start,end - 1)
+                header = u"{0}:".format(name)
+            else:
+                start = pc
+                instructions = architecture.disassemble(pc,count=settings.disassembly_window)
+                header = u"0x{0:016x}:".format(pc)
+        except (RuntimeError, gdb.error) as error:
+            raise VimgdbError("Cannot disassemble at 0x{0:x}: {1}".format(pc,str(error)))
+        if not instructions:
+            raise VimgdbError("Cannot disassemble at 0x{0:x}".format(pc))
+
+        lines = [header]
+        rows = dict()
+        previous = None
+        for instruction in instructions:
+            address = instruction["addr"]
+            symtab,fullsource,source,line = self.gdb.GetPcLocation(address)
+            if fullsource != None and (fullsource,line) != previous:
+                lines.append(u"{0}:{1}  {2}".format(source,line,self.SourceLine(fullsource,line)).rstrip())
+                previous = fullsource,line
+            rows[address] = len(lines) + 1
+            lines.append(u"    0x{0:016x} <+{1}>:  {2}".format(address,address - start,instruction["asm"]))
+
+        if function == None:
+            last = instructions[-1]
+            end = last["addr"] + last.get("length",1)
+        return Listing(start,end,lines,rows)
+
+    def SourceLine(self,fullsource,line):
+        import linecache
+        text = linecache.getline(fullsource,line).strip()
+        if not isinstance(text,type(u"")):
+            text = text.decode("utf-8","replace")
+        return text
@@ -0,0 +1,248 @@
+from __future__ import print_function
+import threading
+import time
+import gdb
+
+from .settings import settings
+from .vimgdbexception import VimgdbError
+from .stats import stats
+from .gdbthread import StartThread
+
+# default arguments of Vimgdb.Update
+DEFAULTS = {
+    "force": False,
+    "update_file": False,
+    "update_cle": True,
+    "update_breakpoint": False,
+    "goto_line": True,
+    "location": None,
+}
+
+
+def Merge(pending,request):
+    """Merge update request into pending update request.
+
+    Flags are combined, so nothing a request asked for is lost. A location
+    update supersedes breakpoint-only updates, and the newest location wins."""
+    request = dict(DEFAULTS, **request)
+    if pending == None:
+        return request
+
+    merged = dict(pending)
+    for key in ("force","update_file","update_cle","goto_line"):
+        merged[key] = pending[key] or request[key]
+
+    if not request["update_breakpoint"]:
+        merged["update_breakpoint"] = False
+        merged["location"] = request["location"]
+
+    return merged
+
+
+class SendWorker:
+    """Send command batches to vim from a background thread.
+
+    Batches queued while a send is in progress are concatenated and sent in
+    one go, so gdb never waits for vim. A failed send sets 'failed', which
+    makes the next update reconcile with what vim shows."""
+
+    def __init__(self,vim,on_idle=None):
+        self.vim = vim
+        self.on_idle = on_idle
+        self.queue = []
+        self.busy = False
+        self.failed = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def Start(self):
+        if self.thread == None:
+            self.thread = StartThread(threading.Thread(target=self.Run,name="vimgdb-send"))
+
+    def Send(self,commands):
+        """Queue batch of commands. Return 0, failures are reported later."""
+        with self.condition:
+            self.queue.extend(commands)
+            self.condition.notify_all()
+        self.Start()
+        return 0
+
+    def Busy(self):
+        """Return True if commands are queued or being sent."""
+        with self.condition:
+            return self.busy or len(self.queue) > 0
+
+    def Drain(self,timeout=None):
+        """Wait until all queued commands are sent. Return True if drained."""
+        deadline = None if timeout == None else time.time() + timeout
+        with self.condition:
+            while self.busy or self.queue:
+                remaining = None if deadline == None else deadline - time.time()
+                if remaining != None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def Run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                batch,self.queue = self.queue,[]
+                self.busy = True
+
+            try:
+                ret = self.vim.Send(batch)
+            except Exception as error:
+                if settings.debug:
+                    print("Vimgdb send failed: {0}".format(str(error)))
+                ret = 1
+
+            with self.condition:
+                self.busy = False
+                if ret != 0:
+                    self.failed = True
+                self.condition.notify_all()
+
+            if self.on_idle != None:
+                self.on_idle()
+
+
+class UpdateDispatcher:
+    """Coalesce update requests and apply them from gdb's event loop.
+
+    Requests are merged into one pending update, which is applied through
+    gdb.post_event once gdb gets back to its event loop. A burst of stop or
+    breakpoint events thus results in a single update of the newest state.
+    Commands are sent by a SendWorker; while it is busy no new updates are
+    built, the worker posts the pending update again once vim caught up."""
+
+    def __init__(self,vimgdb,handler):
+        self.vimgdb = vimgdb
+        self.handler = handler
+        self.pending = None
+        self.scheduled = False
+        self.objfiles_loaded = False
+        self.held = 0
+        self.counting = False   # hit counts are scheduled to be shown, see Counted()
+        self.counted = 0.0
+        self.lock = threading.Lock()
+        self.worker = SendWorker(vimgdb.vim,self.Idle)
+        vimgdb.vim.worker = self.worker
+
+    def Request(self,**request):
+        """Request an update with Vimgdb.Update arguments."""
+        stats.Count("requests")
+        if not settings.async_updates and not self.held:
+            return self.vimgdb.Update(**request)
+
+        with self.lock:
+            if self.pending != None:
+                stats.Count("coalesced")
+            self.pending = Merge(self.pending,request)
+            schedule = not self.scheduled and not self.held
+            self.scheduled = self.scheduled or schedule
+
+        if schedule:
+            gdb.post_event(self.Flush)
+        return 0
+
+    def Hold(self):
+        """Collect requests without updating vim, until (every) Release()."""
+        with self.lock:
+            self.held += 1
+
+    def Held(self):
+        """Return True while requests are collected without updating vim."""
+        return self.held > 0
+
+    def Release(self):
+        """Apply the requests collected while held, as one update."""
+        with self.lock:
+            self.held = max(0,self.held - 1)
+            schedule = self.pending != None and not self.scheduled and not self.held
+            self.scheduled = self.scheduled or schedule
+
+        if schedule:
+            if settings.async_updates:
+                gdb.post_event(self.Flush)
+            else:
+                self.Flush()
+
+    def ObjfilesLoaded(self):
+        """Defer reconciling vim after objfile loads until gdb stops or is idle.
+
+        Loading hundreds of shared libraries thus costs a single update."""
+        self.objfiles_loaded = True
+
+    def Stopped(self):
+        """Request update after a stop, which also reconciles loaded objfiles."""
+        self.objfiles_loaded = False
+        return self.Request()
+
+    def Prompt(self):
+        """Reconcile loaded objfiles once gdb is idle."""
+        if not self.objfiles_loaded:
+            return 0
+        self.objfiles_loaded = False
+
+        if self.vimgdb.gdb.IsRunning():
+            return self.Request()
+        elif self.vimgdb.fullsource == None:
+            # new program: show main, if it has debug information
+            try:
+                self.vimgdb.gdb.GetLocation("main")
+            except VimgdbError:
+                return 0
+            return self.Request(goto_line=True,force=True,location="main",update_cle=False)
+        else:
+            return self.Request(force=True,goto_line=False,update_breakpoint=True)
+
+    def Idle(self):
+        """Called by the worker once all commands are sent."""
+        with self.lock:
+            schedule = self.pending != None and not self.scheduled and not self.held
+            self.scheduled = self.scheduled or schedule
+
+        if schedule:
+            gdb.post_event(self.Flush)
+
+    def Flush(self):
+        """Apply pending update. (Runs in gdb's thread)."""
+        with self.lock:
+            self.scheduled = False
+            if self.worker.Busy() or self.held:
+                return
+            request,self.pending = self.pending,None
+
+        if request == None:
+            return
+
+        if self.worker.failed:
+            self.worker.failed = False
+            self.vimgdb.resync = True
+
+        self.handler(self.vimgdb.Update,**request)
+
+    def Counted(self):
+        """Show hit counts in vim after a hit of a counting breakpoint, at
+        most every settings.count_interval seconds. The program does not
+        stop for these breakpoints, so counts are shown from a timer while
+        it runs."""
+        with self.lock:
+            if self.counting:
+                return
+            self.counting = True
+        delay = max(0.0,self.counted + settings.count_interval - time.time())
+        StartThread(threading.Timer(delay,gdb.post_event,(self.FlushCounts,)))
+
+    def FlushCounts(self):
+        """Show hit counts that changed. (Runs in gdb's thread)."""
+        with self.lock:
+            self.counting = False
+        self.counted = time.time()
+        if not self.worker.Busy():
+            self.handler(self.vimgdb.ShowCounts)
+        else:
+            # a batch is being sent, try again later
+            self.Counted()
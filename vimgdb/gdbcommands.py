@@ -2,6 +2,13 @@ from __future__ import with_statement,print_function, unicode_literals
 from .vimgdb import Vimgdb
 from .settings import settings
 from .vimgdbexception import VimgdbError
+from .dispatcher import UpdateDispatcher
+from .trace import Trace
+from .session import Session
+from .profiler import Profile, Sampler
+from .threads import ParseThreads
+from .stats import stats
+from .startup import startup
 import gdb
 
 vimgdb = Vimgdb()
@@ -25,6 +32,11 @@ def HandleException(function, *args, **kwargs):
             print(traceback.format_exc())
         print("Vimgdb Exception: {0}".format(str(error)))
 
+dispatcher = UpdateDispatcher(vimgdb,HandleException)
+trace = Trace()
+profile = Profile()
+session = Session()
+
 
 class VimgdbCommand(gdb.Command):
     """Vimgdb interface."""
@@ -49,7 +61,32 @@ class VimgdbGotoCommand(gdb.Command):
         if arg == "":
             arg = None
 
-        HandleException(vimgdb.Update,force=True,location=arg)
+        HandleException(dispatcher.Request,force=True,location=arg)
+
+    def complete (self, text, word):
+        """Complete function and source file names from the symbol index."""
+        try:
+            matches = vimgdb.gdb.symbols.Complete(text)
+        except VimgdbError as error:
+            print("{0}".format(str(error)))
+            return []
+        # gdb replaces the last word only, so only names that start with
+        # text complete it; fuzzy matches are for ':VimgdbGoto' in vim
+        start = len(text) - len(word if word != None else text)
+        return [ match[start:] for match in matches if match.startswith(text) ]
+
+
+class VimgdbSymbolsCommand(gdb.Command):
+    """Index the functions and source files of all objfiles, for completion of
+    'vimgdb goto' in gdb and of ':VimgdbGoto' in vim. Indexes are stored by
+    build-id, and loaded instead of built in later sessions."""
+
+    def __init__ (self):
+        super (VimgdbSymbolsCommand, self).__init__(
+            "vimgdb symbols", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.ShowSymbols)
 
 
 class VimgdbDisableCommand(gdb.Command):
@@ -82,12 +119,12 @@ class VimgdbUpdateCommand(gdb.Command):
             "vimgdb update", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
 
     def invoke (self, arg, from_tty):
-        HandleException(vimgdb.Update)
+        HandleException(dispatcher.Request)
 
 
 class VimgdbReloadCommand(gdb.Command):
     """Resynchronize vim and gdb.
-    Reloads file, breakpoints and highlighting in vim session.
+    Asks vim which file and signs it shows, and corrects only what differs.
     This function can be used in case vim and gdb get desynchronized."""
 
     def __init__ (self):
@@ -95,25 +132,745 @@ class VimgdbReloadCommand(gdb.Command):
             "vimgdb reload", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
 
     def invoke (self, arg, from_tty):
-        vimgdb.Clear()
-        HandleException(vimgdb.Update)
+        vimgdb.resync = True
+        HandleException(dispatcher.Request)
+
+
+class VimgdbFrameCommand(gdb.Command):
+    """Show the selected frame in vim, or select frame <level> and show it.
+    Frames are looked up in a backtrace that is cached until the program
+    continues, which makes moving up and down a deep stack cheap."""
+
+    def __init__ (self):
+        super (VimgdbFrameCommand, self).__init__(
+            "vimgdb frame", gdb.COMMAND_STACK, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        arg = arg.strip()
+        if arg == "":
+            HandleException(ShowFrame)
+        elif arg.isdigit():
+            HandleException(SelectFrame,int(arg))
+        else:
+            print("Usage: vimgdb frame [level]")
+
+
+class VimgdbStackCommand(gdb.Command):
+    """Show the backtrace in a vim panel.
+    Frames are shown a page at a time, and the selected frame is marked.
+    Press enter on a frame in the panel to select it in gdb."""
+
+    def __init__ (self):
+        super (VimgdbStackCommand, self).__init__(
+            "vimgdb stack", gdb.COMMAND_STACK, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.ShowStack)
+
+
+class VimgdbStackMoreCommand(gdb.Command):
+    """Show the next page of frames in the stack panel."""
+
+    def __init__ (self):
+        super (VimgdbStackMoreCommand, self).__init__(
+            "vimgdb stack more", gdb.COMMAND_STACK, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.ShowStack,True)
+
+
+class VimgdbStackCloseCommand(gdb.Command):
+    """Close the stack panel."""
+
+    def __init__ (self):
+        super (VimgdbStackCloseCommand, self).__init__(
+            "vimgdb stack close", gdb.COMMAND_STACK, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.CloseStack)
+
+
+class VimgdbLocalsCommand(gdb.Command):
+    """Show arguments, locals and watch expressions of the selected frame in a vim panel.
+    Values that changed since the previous stop are highlighted. Press
+    enter on a value in the panel to expand or collapse it."""
+
+    def __init__ (self):
+        super (VimgdbLocalsCommand, self).__init__(
+            "vimgdb locals", gdb.COMMAND_DATA, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.ShowLocals)
+
+
+class VimgdbLocalsCloseCommand(gdb.Command):
+    """Close the locals panel."""
+
+    def __init__ (self):
+        super (VimgdbLocalsCloseCommand, self).__init__(
+            "vimgdb locals close", gdb.COMMAND_DATA, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.CloseLocals)
+
+
+class VimgdbDisassemblyCommand(gdb.Command):
+    """Show the function of the selected frame as instructions, interleaved
+    with its source lines, in a vim panel, and mark the current instruction.
+    A function is disassembled once, so 'stepi' inside it only moves the marker."""
+
+    def __init__ (self):
+        super (VimgdbDisassemblyCommand, self).__init__(
+            "vimgdb disassembly", gdb.COMMAND_DATA, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.ShowDisassembly)
+
+
+class VimgdbDisassemblyCloseCommand(gdb.Command):
+    """Close the disassembly panel."""
+
+    def __init__ (self):
+        super (VimgdbDisassemblyCloseCommand, self).__init__(
+            "vimgdb disassembly close", gdb.COMMAND_DATA, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.CloseDisassembly)
+
+
+class VimgdbMemoryCommand(gdb.Command):
+    """Show <length> bytes of memory from <address> as hexdump in a vim panel.
+    Memory is read a page at a time as the panel scrolls, and lines that
+    changed since the previous stop are highlighted.
+    example:
+        vimgdb memory buffer 1048576
+        vimgdb memory &ring->slots[0] sizeof(ring->slots)"""
+
+    def __init__ (self):
+        super (VimgdbMemoryCommand, self).__init__(
+            "vimgdb memory", gdb.COMMAND_DATA, gdb.COMPLETE_SYMBOL, True)
+
+    def invoke (self, arg, from_tty):
+        arguments = gdb.string_to_argv(arg)
+        if len(arguments) != 2:
+            print("Usage: vimgdb memory <address> <length>")
+            return
+        try:
+            address = int(gdb.parse_and_eval(arguments[0]))
+            length = int(gdb.parse_and_eval(arguments[1]))
+        except gdb.error as error:
+            print("{0}".format(str(error)))
+            return
+        HandleException(vimgdb.ShowMemory,address,length)
+
+
+class VimgdbMemoryCloseCommand(gdb.Command):
+    """Close the memory panel."""
+
+    def __init__ (self):
+        super (VimgdbMemoryCloseCommand, self).__init__(
+            "vimgdb memory close", gdb.COMMAND_DATA, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(vimgdb.CloseMemory)
+
+
+class VimgdbWatchCommand(gdb.Command):
+    """Show the value of an expression in the locals panel.
+    example:
+        vimgdb watch node->next
+        vimgdb watch delete 1"""
+
+    def __init__ (self):
+        super (VimgdbWatchCommand, self).__init__(
+            "vimgdb watch", gdb.COMMAND_DATA, gdb.COMPLETE_SYMBOL, True)
+
+    def invoke (self, arg, from_tty):
+        if arg.strip() == "":
+            for number,expression in enumerate(vimgdb.variables.watches):
+                print("{0}: {1}".format(number + 1,expression))
+            return
+        vimgdb.variables.Watch(arg.strip())
+        if vimgdb.gdb.IsRunning():
+            HandleException(vimgdb.ShowLocals,True)
+
+
+class VimgdbWatchDeleteCommand(gdb.Command):
+    """Remove watch expression <number> from the locals panel."""
+
+    def __init__ (self):
+        super (VimgdbWatchDeleteCommand, self).__init__(
+            "vimgdb watch delete", gdb.COMMAND_DATA, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        if not arg.strip().isdigit():
+            print("Usage: vimgdb watch delete <number>")
+            return
+        HandleException(vimgdb.variables.Unwatch,int(arg))
+        if vimgdb.locals_panel and vimgdb.gdb.IsRunning():
+            HandleException(vimgdb.ShowLocals,True)
+
+
+class VimgdbThreadsCommand(gdb.Command):
+    """Show where the threads with a marker in vim are.
+    Every stopped thread gets a marker at its current line in vim; the
+    selected thread is highlighted as current line of execution."""
+
+    def __init__ (self):
+        super (VimgdbThreadsCommand, self).__init__(
+            "vimgdb threads", gdb.COMMAND_STACK, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        print(vimgdb.gdb.threads.Describe())
+
+
+class VimgdbThreadsFilterCommand(gdb.Command):
+    """Show markers of the listed threads only, of all threads, or of none.
+    Threads without a marker are not read on stops, which keeps stepping
+    fast with many threads.
+    example:
+        vimgdb threads filter 1 4 10-20
+        vimgdb threads filter all
+        vimgdb threads filter none"""
+
+    def __init__ (self):
+        super (VimgdbThreadsFilterCommand, self).__init__(
+            "vimgdb threads filter", gdb.COMMAND_STACK, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        arg = arg.strip()
+        threads = vimgdb.gdb.threads
+        if arg == "":
+            print("Usage: vimgdb threads filter <threads>|all|none")
+            return
+        elif arg == "none":
+            threads.enabled = False
+            threads.SetFilter(None)
+        elif arg == "all":
+            threads.enabled = True
+            threads.SetFilter(None)
+        else:
+            try:
+                numbers = ParseThreads(arg)
+            except VimgdbError as error:
+                print("{0}".format(str(error)))
+                return
+            threads.enabled = True
+            threads.SetFilter(numbers)
+        HandleException(dispatcher.Request,goto_line=False)
+
+
+def ShowFrame():
+    """Show the selected frame. While updates are held (e.g. while a trace
+    is recorded), it is shown by the update on release, like a stop."""
+    if dispatcher.Held():
+        return dispatcher.Request()
+    return vimgdb.ShowFrame()
+
+
+def SelectFrame(level):
+    """Select and show frame 'level', or the next page of frames when
+    'level' is the '-- more --' line of the stack panel."""
+    if vimgdb.stack_panel and level == vimgdb.stack_rows:
+        return vimgdb.ShowStack(more=True)
+    if dispatcher.Held():
+        vimgdb.gdb.stack.Select(level)
+        ret = dispatcher.Request()
+    else:
+        ret = vimgdb.ShowFrame(level)
+    print(vimgdb.gdb.stack.Describe(level))
+    return ret
+
+
+# gdb commands that vim keymaps may execute, see 'execute' request
+VIM_COMMANDS = ("step","next","stepi","nexti","finish","continue","up","down")
+
+
+def ToggleBreakpoint(fullsource,line):
+    """Delete the breakpoints on line of a file, or create one there if
+    there are none. Vim is updated by the breakpoint events."""
+    numbers = vimgdb.gdb.breakpoints.Numbers(fullsource,line)
+    try:
+        if numbers:
+            for breakpoint in gdb.breakpoints() or ():
+                if breakpoint.number in numbers:
+                    breakpoint.delete()
+        else:
+            gdb.Breakpoint("{0}:{1}".format(fullsource,line))
+    except (RuntimeError, gdb.error) as error:
+        raise VimgdbError(str(error))
+    return 0
+
+
+def Execute(command,*arguments):
+    """Execute gdb command for vim, e.g. 'until <file>:<line>' to run to its cursor."""
+    if command == "until" and len(arguments) == 2:
+        command = "until {0}:{1}".format(*arguments)
+    elif command not in VIM_COMMANDS or arguments:
+        raise VimgdbError("Command not allowed from vim: {0}".format(command))
+    try:
+        gdb.execute(command)
+    except gdb.error as error:
+        raise VimgdbError(str(error))
+    return 0
+
+
+def Evaluate(expression,balloon=0):
+    """Show value of expression in vim, at its cursor or in its balloon."""
+    try:
+        text = "{0} = {1}".format(expression,gdb.parse_and_eval(expression))
+    except (RuntimeError, gdb.error) as error:
+        text = "{0}: {1}".format(expression,str(error))
+    return vimgdb.ShowValue(text,balloon)
+
+
+# requests vim sends with VimgdbRequest() and VimgdbControl(), see config/vimrc
+VIM_REQUESTS = {
+    "frame": SelectFrame,
+    "locals": vimgdb.ToggleLocal,
+    "memory": vimgdb.ScrollMemory,
+    "goto": lambda location: dispatcher.Request(force=True,location=location),
+    "break": ToggleBreakpoint,
+    "execute": Execute,
+    "evaluate": Evaluate,
+}
+
+
+def VimRequest(message):
+    """Handle request from vim. (Called from the channel's reader thread)."""
+    def Request():
+        if not isinstance(message,list) or len(message) == 0 or message[0] not in VIM_REQUESTS:
+            raise VimgdbError("Unknown request from vim: {0}".format(message))
+        return VIM_REQUESTS[message[0]](*message[1:])
+
+    gdb.post_event(lambda: HandleException(Request))
+
+
+class VimgdbStatsCommand(gdb.Command):
+    """Print vimgdb latency statistics.
+    Shows counters and latency percentiles of each phase of an update:
+    gdb queries, building commands, sign diffing and sending to vim."""
+
+    def __init__ (self):
+        super (VimgdbStatsCommand, self).__init__(
+            "vimgdb stats", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        print(stats.Report())
+
+
+class VimgdbStatsResetCommand(gdb.Command):
+    """Clear vimgdb latency statistics."""
+
+    def __init__ (self):
+        super (VimgdbStatsResetCommand, self).__init__(
+            "vimgdb stats reset", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        stats.Reset()
+
+
+class VimgdbStatsTraceCommand(gdb.Command):
+    """Write a json line per update and per send to a file.
+    example:
+        vimgdb stats trace /tmp/vimgdb.trace
+        vimgdb stats trace off"""
+
+    def __init__ (self):
+        super (VimgdbStatsTraceCommand, self).__init__(
+            "vimgdb stats trace", gdb.COMMAND_SUPPORT, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        arg = arg.strip()
+        if arg == "" or arg == "off":
+            stats.StopTrace()
+        else:
+            HandleException(stats.StartTrace,arg)
+
+
+class VimgdbTraceCommand(gdb.Command):
+    """Record stops and replay them in vim, without running the inferior.
+    Shows the state of the trace. While recording, vim is not updated.
+    example:
+        vimgdb trace start
+        (step through the program)
+        vimgdb trace stop
+        vimgdb trace prev
+        vimgdb trace next 10"""
+
+    def __init__ (self):
+        super (VimgdbTraceCommand, self).__init__(
+            "vimgdb trace", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        print(trace.Status())
+
+
+class VimgdbTraceStartCommand(gdb.Command):
+    """Start recording stops, optionally keeping only the last <size> stops.
+    example:
+        vimgdb trace start
+        vimgdb trace start 1000"""
+
+    def __init__ (self):
+        super (VimgdbTraceStartCommand, self).__init__(
+            "vimgdb trace start", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        size = TraceArgument(arg)
+        if size != None:
+            if not trace.recording:
+                dispatcher.Hold()
+            trace.Start(size)
+
+
+class VimgdbTraceStopCommand(gdb.Command):
+    """Stop recording stops, and update vim to the current state."""
+
+    def __init__ (self):
+        super (VimgdbTraceStopCommand, self).__init__(
+            "vimgdb trace stop", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        if trace.recording:
+            trace.Stop()
+            dispatcher.Release()
+        print(trace.Status())
+
+
+class VimgdbTraceNextCommand(gdb.Command):
+    """Show next [count] recorded stop in vim."""
+
+    def __init__ (self):
+        super (VimgdbTraceNextCommand, self).__init__(
+            "vimgdb trace next", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        steps = TraceArgument(arg)
+        if steps != None:
+            HandleException(ReplayStop,trace.Move,steps or 1)
+
+
+class VimgdbTracePrevCommand(gdb.Command):
+    """Show previous [count] recorded stop in vim."""
+
+    def __init__ (self):
+        super (VimgdbTracePrevCommand, self).__init__(
+            "vimgdb trace prev", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        steps = TraceArgument(arg)
+        if steps != None:
+            HandleException(ReplayStop,trace.Move,-(steps or 1))
+
+
+class VimgdbTraceGotoCommand(gdb.Command):
+    """Show recorded stop <number> in vim, counting from 1."""
+
+    def __init__ (self):
+        super (VimgdbTraceGotoCommand, self).__init__(
+            "vimgdb trace goto", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        number = TraceArgument(arg)
+        if number:
+            HandleException(ReplayStop,trace.Seek,number - 1)
+        else:
+            print("Usage: vimgdb trace goto <number>")
+
+
+class VimgdbTraceSaveCommand(gdb.Command):
+    """Save recorded stops to a file."""
+
+    def __init__ (self):
+        super (VimgdbTraceSaveCommand, self).__init__(
+            "vimgdb trace save", gdb.COMMAND_SUPPORT, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        if arg.strip() == "":
+            print("Usage: vimgdb trace save <file>")
+        else:
+            HandleException(trace.Save,arg.strip())
+
+
+class VimgdbTraceLoadCommand(gdb.Command):
+    """Load recorded stops from a file, for replay."""
+
+    def __init__ (self):
+        super (VimgdbTraceLoadCommand, self).__init__(
+            "vimgdb trace load", gdb.COMMAND_SUPPORT, gdb.COMPLETE_FILENAME)
+
+    def invoke (self, arg, from_tty):
+        if arg.strip() == "":
+            print("Usage: vimgdb trace load <file>")
+        else:
+            if trace.recording:
+                trace.Stop()
+                dispatcher.Release()
+            HandleException(trace.Load,arg.strip())
+            print(trace.Status())
+
+
+def TraceArgument(arg):
+    """Return optional positive number argument of trace commands, 0 if absent."""
+    arg = arg.strip()
+    if arg == "":
+        return 0
+    elif arg.isdigit() and int(arg) > 0:
+        return int(arg)
+    print("Expected a positive number, got '{0}'".format(arg))
+    return None
+
+
+def ReplayStop(seek,*args):
+    """Move through the trace with seek, and show the stop in vim."""
+    stop = seek(*args)
+    print(trace.Describe(stop))
+    pc,fullsource,source,line,depth,thread = stop
+    if fullsource == None:
+        return 0
+    return vimgdb.Replay(fullsource,source,line)
+
+
+class VimgdbProfileCommand(gdb.Command):
+    """Sample where the running process spends its time.
+    Interrupts the process <hz> times per second (default 100) during
+    <seconds> (default 10), and samples the location of every thread.
+    Sampled lines are shown with heat signs in vim, and the hottest lines
+    are printed and put in vim's quickfix list.
+    example:
+        vimgdb profile 5 200"""
+
+    def __init__ (self):
+        super (VimgdbProfileCommand, self).__init__(
+            "vimgdb profile", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        args = arg.split()
+        try:
+            seconds = float(args[0]) if len(args) > 0 else 10.0
+            hz = float(args[1]) if len(args) > 1 else 100.0
+            if len(args) > 2 or seconds <= 0 or hz <= 0:
+                raise ValueError()
+        except ValueError:
+            print("Usage: vimgdb profile [seconds] [hz]")
+            return
+        HandleException(Profiling,seconds,hz)
+
+
+class VimgdbProfileClearCommand(gdb.Command):
+    """Remove heat signs of the last profile from vim."""
+
+    def __init__ (self):
+        super (VimgdbProfileClearCommand, self).__init__(
+            "vimgdb profile clear", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        profile.Clear()
+        HandleException(vimgdb.ClearProfile)
+
+
+def Profiling(seconds,hz):
+    """Sample the inferior, and show the profile."""
+    sampler = Sampler(profile)
+    dispatcher.Hold()
+    try:
+        sampler.Run(seconds,hz)
+    finally:
+        dispatcher.Release()
+    profile.Aggregate(vimgdb.gdb)
+    print(profile.Report())
+    ret = vimgdb.ShowProfile(profile)
+    reason = sampler.Reason()
+    if reason != None:
+        stack = vimgdb.gdb.stack
+        print("\nProfiling stopped by {0}:\n{1}".format(reason,stack.Describe(stack.Level())))
+    return ret
+
+
+class CountingBreakpoint(gdb.Breakpoint):
+    """Breakpoint that counts its hits and lets the program continue, see 'vimgdb count'."""
+
+    counting = True
+
+    def stop (self):
+        vimgdb.gdb.counters.Hit(self.number,gdb.selected_frame().pc())
+        dispatcher.Counted()
+        return False
+
+
+class VimgdbCountCommand(gdb.Command):
+    """Count how often a location is hit, without stopping there.
+    Creates a breakpoint that counts its hits and continues at once, and
+    shows its count in vim next to its line, refreshed while the program
+    runs. 'vimgdb hits' lists the counts.
+    example:
+        vimgdb count test.cc:8"""
+
+    def __init__ (self):
+        super (VimgdbCountCommand, self).__init__(
+            "vimgdb count", gdb.COMMAND_BREAKPOINTS, gdb.COMPLETE_LOCATION)
+
+    def invoke (self, arg, from_tty):
+        arg = arg.strip()
+        if arg == "":
+            print("Usage: vimgdb count <location>")
+            return
+        try:
+            breakpoint = CountingBreakpoint(arg)
+        except (RuntimeError, gdb.error) as error:
+            print("{0}".format(str(error)))
+            return
+        print("Counting breakpoint {0} at {1}".format(breakpoint.number,arg))
+
+
+class VimgdbHitsCommand(gdb.Command):
+    """List hit counts of breakpoints, and of each line they were hit on.
+    Hits of all breakpoints are counted as they stop, and hits of counting
+    breakpoints (see 'vimgdb count') without stopping."""
+
+    def __init__ (self):
+        super (VimgdbHitsCommand, self).__init__(
+            "vimgdb hits", gdb.COMMAND_BREAKPOINTS, gdb.COMPLETE_NONE, True)
+
+    def invoke (self, arg, from_tty):
+        rows = vimgdb.gdb.counters.Rows()
+        if not rows:
+            print("No breakpoints were hit")
+        for number,hits,locations in rows:
+            print("{0:<7} {1:>10} hits".format(number,hits))
+            for fullsource,line,count in locations:
+                print("        {0:>10} at {1}:{2}".format(count,fullsource,line))
+
+
+class VimgdbHitsResetCommand(gdb.Command):
+    """Reset hit counts of all breakpoints."""
+
+    def __init__ (self):
+        super (VimgdbHitsResetCommand, self).__init__(
+            "vimgdb hits reset", gdb.COMMAND_BREAKPOINTS, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        vimgdb.gdb.counters.Clear()
+        HandleException(vimgdb.ShowCounts)
+
+
+class VimgdbSessionCommand(gdb.Command):
+    """Save and restore breakpoints and the files shown in vim, per program.
+    Sessions are stored by build-id of the program. With settings.session
+    (off by default), the session is saved when gdb quits, and restored when
+    the program is loaded again."""
+
+    def __init__ (self):
+        super (VimgdbSessionCommand, self).__init__(
+            "vimgdb session", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE, True)
+
+
+class VimgdbSessionSaveCommand(gdb.Command):
+    """Save breakpoints, watchpoints and the files shown in vim of the program."""
+
+    def __init__ (self):
+        super (VimgdbSessionSaveCommand, self).__init__(
+            "vimgdb session save", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(SaveSession)
+
+
+class VimgdbSessionRestoreCommand(gdb.Command):
+    """Restore the saved breakpoints and watchpoints of the program, and the
+    files shown in vim, in one update. Existing breakpoints are kept."""
+
+    def __init__ (self):
+        super (VimgdbSessionRestoreCommand, self).__init__(
+            "vimgdb session restore", gdb.COMMAND_SUPPORT, gdb.COMPLETE_NONE)
+
+    def invoke (self, arg, from_tty):
+        HandleException(RestoreSession)
+
+
+def SaveSession(quiet=False):
+    """Save the session of the program."""
+    files,current = vimgdb.SessionState()
+    count = session.Save(files,current)
+    if not quiet:
+        print("Saved {0} breakpoints".format(count))
+    return 0
+
+
+def RestoreSession(quiet=False):
+    """Restore the session of the program: breakpoints are created while
+    updates are held, and then shown with the saved files in one update."""
+    state = session.Load()
+    if state == None:
+        if not quiet:
+            print("No saved session")
+        return 0
+
+    dispatcher.Hold()
+    try:
+        created,errors = session.Create(state.get("breakpoints",()),CountingBreakpoint)
+        vimgdb.RestoreFiles(state.get("files") or dict())
+        current = state.get("current")
+        if vimgdb.gdb.IsRunning():
+            dispatcher.Request(force=True,goto_line=False,update_breakpoint=True)
+        elif current != None:
+            dispatcher.Request(force=True,location="{0}:{1}".format(current[0],current[2]),update_cle=False)
+    finally:
+        dispatcher.Release()
+
+    for error in errors:
+        print("vimgdb: {0}".format(error))
+    if created or not quiet:
+        print("Restored {0} breakpoints".format(created))
+    return 0
 
 
 def StopEvent(stop_event):
     if settings.debug:
         print("[stop event start]")
 
-    HandleException(vimgdb.Update)
+    vimgdb.gdb.Invalidate()
+    thread = getattr(stop_event,"inferior_thread",None)
+    vimgdb.gdb.threads.Stopped(thread.num if thread != None else None)
+    breakpoints = getattr(stop_event,"breakpoints",None)
+    if breakpoints:
+        pc = gdb.selected_frame().pc()
+        for breakpoint in breakpoints:
+            vimgdb.gdb.counters.Hit(breakpoint.number,pc)
+    if trace.recording:
+        HandleException(trace.RecordStop,vimgdb.gdb)
+    HandleException(dispatcher.Stopped)
 
     if settings.debug:
         print("[stop event done]")
 
 
+def ContinueEvent(continue_event):
+    vimgdb.gdb.Invalidate()
+    thread = getattr(continue_event,"inferior_thread",None)
+    if thread != None:
+        vimgdb.gdb.threads.Running(thread.num)
+
+
+def ObjectClearEvent(clear_event):
+    vimgdb.gdb.Invalidate(objfiles=True)
+    vimgdb.gdb.breakpoints.Clear()
+    vimgdb.Clear()
+
+
+def PromptEvent():
+    startup.Done("prompt")
+    HandleException(dispatcher.Prompt)
+
+
 def BreakEvent(breakpoint):
     if settings.debug:
         print("[break event start]")
 
-    HandleException(vimgdb.Update,force=True,goto_line=False,update_breakpoint=True)
+    vimgdb.gdb.breakpoints.Add(breakpoint)
+    vimgdb.gdb.counters.Counted(breakpoint)
+    HandleException(dispatcher.Request,force=True,goto_line=False,update_breakpoint=True)
 
     if settings.debug:
         print("[break event done]")
@@ -123,7 +880,10 @@ def BreakModifyEvent(breakpoint):
     if settings.debug:
         print("[break modify event start]")
 
-    HandleException(vimgdb.Update,force=True,goto_line=False,update_breakpoint=True,modify_breakpoint=int(breakpoint.number))
+    # a hit only changes the hit count, the stop event updates vim
+    if not vimgdb.gdb.counters.Counted(breakpoint):
+        vimgdb.gdb.breakpoints.Add(breakpoint)
+        HandleException(dispatcher.Request,force=True,goto_line=False,update_breakpoint=True)
 
     if settings.debug:
         print("[break modify event done]")
@@ -133,7 +893,9 @@ def BreakDeleteEvent(breakpoint):
     if settings.debug:
         print("[break delete event start]")
 
-    HandleException(vimgdb.Update,force=True,goto_line=False,update_breakpoint=True,delete_breakpoint=int(breakpoint.number))
+    vimgdb.gdb.breakpoints.Remove(breakpoint.number)
+    vimgdb.gdb.counters.Remove(breakpoint.number)
+    HandleException(dispatcher.Request,force=True,goto_line=False,update_breakpoint=True)
 
     if settings.debug:
         print("[break delete event stop]")
@@ -143,44 +905,82 @@ def ObjectLoadEvent(obj):
     if settings.debug:
         print("[object load event start]")
 
-    try:
-        import re
-        update = True
-        # do not update upon symbol reload when having typed 'run'
-        history = gdb.execute('show command',to_string=True).split('\n')
-        if len(history) > 1:
-            regexp = re.compile('[ \t]*[0-9]+[ \t]+r(:?|u|un)')
-            if len(history) >= 2 and regexp.search(history[-2]):
-                update = False
-
-        vimgdb.Clear()
-        if update:
-            # do not reload upon 'run' command, breakmodify event will take care of this
-            try:
-                vimgdb.Update(goto_line=True,force=True,location="main",update_cle=False)
-            except: pass
+    vimgdb.gdb.Invalidate(objfiles=True)
+    dispatcher.ObjfilesLoaded()
 
-    except VimgdbError: pass
+    # restore the session of a program once it is loaded
+    objfile = getattr(obj,"new_objfile",None)
+    if settings.session and objfile != None and objfile.filename == gdb.current_progspace().filename:
+        gdb.post_event(lambda: HandleException(RestoreSession,quiet=True))
 
     if settings.debug:
         print("[object load event stop]")
 
 
+def QuitEvent():
+    """Save the session when gdb quits. Called by hook-quit in config/gdbinit
+    before 'vimgdb disable', which forgets the files shown in vim."""
+    if settings.session and gdb.current_progspace().filename:
+        HandleException(SaveSession,quiet=True)
+
+
 def Register():
     """Register all commands and events required by Vimgdb. (Call from GNU Gdb)."""
 
     # register commands
     VimgdbCommand()
     VimgdbGotoCommand()
+    VimgdbSymbolsCommand()
     VimgdbDisableCommand()
     VimgdbKillCommand()
     VimgdbUpdateCommand()
     VimgdbReloadCommand()
+    VimgdbFrameCommand()
+    VimgdbStackCommand()
+    VimgdbStackMoreCommand()
+    VimgdbStackCloseCommand()
+    VimgdbThreadsCommand()
+    VimgdbThreadsFilterCommand()
+    VimgdbLocalsCommand()
+    VimgdbLocalsCloseCommand()
+    VimgdbWatchCommand()
+    VimgdbWatchDeleteCommand()
+    VimgdbDisassemblyCommand()
+    VimgdbDisassemblyCloseCommand()
+    VimgdbMemoryCommand()
+    VimgdbMemoryCloseCommand()
+    VimgdbStatsCommand()
+    VimgdbStatsResetCommand()
+    VimgdbStatsTraceCommand()
+    VimgdbTraceCommand()
+    VimgdbTraceStartCommand()
+    VimgdbTraceStopCommand()
+    VimgdbTraceNextCommand()
+    VimgdbTracePrevCommand()
+    VimgdbTraceGotoCommand()
+    VimgdbTraceSaveCommand()
+    VimgdbTraceLoadCommand()
+    VimgdbProfileCommand()
+    VimgdbProfileClearCommand()
+    VimgdbCountCommand()
+    VimgdbHitsCommand()
+    VimgdbHitsResetCommand()
+    VimgdbSessionCommand()
+    VimgdbSessionSaveCommand()
+    VimgdbSessionRestoreCommand()
+
+    # register requests from vim
+    vimgdb.vim.listener = VimRequest
 
     # register events
     gdb.events.stop.connect(StopEvent)
+    gdb.events.cont.connect(ContinueEvent)
     gdb.events.breakpoint_created.connect(BreakEvent)
     gdb.events.breakpoint_modified.connect(BreakModifyEvent)
     gdb.events.breakpoint_deleted.connect(BreakDeleteEvent)
     gdb.events.new_objfile.connect(ObjectLoadEvent)
+    gdb.events.clear_objfiles.connect(ObjectClearEvent)
+    gdb.events.before_prompt.connect(PromptEvent)
+
+    startup.Mark("register")
 
@@ -1,27 +1,71 @@
 from __future__ import print_function, unicode_literals
-import subprocess
 import os
 
 from .vimgdbexception import VimgdbError
 from .viminterface import Vim
+from .breakpoints import BreakpointIndex
+from .counters import HitCounters
+from .stack import Stack
+from .threads import Threads
+from .disassembly import Disassembly
+from .symbols import SymbolIndex
 from .settings import settings
+from .startup import startup
+
+class Location:
+    """Location of the selected frame, captured once per stop."""
+
+    def __init__(self,frame,pc,symtab,fullsource,source,line):
+        self.frame = frame
+        self.pc = pc
+        self.symtab = symtab
+        self.fullsource = fullsource
+        self.source = source
+        self.line = line
+
+    def Get(self):
+        return self.fullsource,self.source,self.line
+
 
 class Gdb:
 
     def __init__(self):
         self.executable = "gdb"
+        self.breakpoints = BreakpointIndex()
+        self.counters = HitCounters(self)
+        self.stack = Stack(self)
+        self.threads = Threads(self)
+        self.disassembly = Disassembly(self)
+        self.symbols = SymbolIndex()
+        self.snapshot = None
+        self.Invalidate(objfiles=True)
+
+    def Invalidate(self,objfiles=False):
+        """Forget location snapshot, backtrace and decoded locations (on stop
+        and continue), and memoized pc lookups and disassembly (when objfiles
+        change). Symbol indexes of objfiles that remain are kept."""
+        self.snapshot = None
+        self.stack.Clear()
+        self.location_cache = dict()
+        if objfiles:
+            self.pc_cache = dict()
+            self.fullname_cache = dict()
+            self.disassembly.Clear()
+            self.symbols.Stale()
 
     def Start(self,args=[],check=True):
-        """Start GNU Gdb."""
+        """Start GNU Gdb, replacing the current process."""
         library_dir = os.path.abspath(os.path.dirname(__file__))
         gdbinit = os.path.join(library_dir, 'config/gdbinit')
 
         cmd = [self.executable,
             "-q","-iex","source {0}".format(gdbinit)] + args
-        try:
-            subprocess.call(cmd)
-        except KeyboardInterrupt:
-            subprocess.call("stty echo",shell=True)
+
+        # let gdb import this vimgdb package, see config/gdbinit
+        os.environ["VIMGDB_PATH"] = os.path.dirname(library_dir)
+        startup.Mark("checks")
+        startup.Export()
+        os.execvp(self.executable,cmd)
 
     def GetValue(self,variable):
         """Return value of GNU Gdb parameter "<variable name>".
@@ -51,107 +95,151 @@ class Gdb:
 
     def IsRunning(self):
         """Return true if currently executing code in gdb."""
-        import gdb
-        frame_fullsource,_,_ = self.GetFrameLocation()
-        if frame_fullsource == None:
-            return False
-
-        try:
-            fullsource,_,_ = self.GetLocation()
-            if frame_fullsource != fullsource:
-                return False
-            else:
-                return True
-        except:
-            return True
+        return self.Snapshot() != None
 
     def IsFunction(self,location):
         """Check if provided location is a function.
 
         >>> IsFunction("main") -> True
         """
+        import gdb
+        if self.symbols.Function(location) != None:
+            return True
         symbol = gdb.lookup_global_symbol(location)
         if symbol != None:
             return symbol.is_function
         else:
             return False;
 
-    def GetFrameLocation(self):
-        """Get location of current line of execution from active frame."""
+    def Fullname(self,symtab):
+        """Return (memoized) full path of symbol table."""
+        key = (symtab.objfile.filename,symtab.filename)
+        if key not in self.fullname_cache:
+            self.fullname_cache[key] = symtab.fullname()
+        return self.fullname_cache[key]
+
+    def GetPcLocation(self,pc):
+        """Return (memoized) symtab,fullsource,source,line of a pc."""
+        import gdb
+        if pc not in self.pc_cache:
+            symbol_table_and_line = gdb.find_pc_line(pc)
+            symbol_table = symbol_table_and_line.symtab
+            if symbol_table == None:
+                location = None,None,None,None
+            else:
+                location = (symbol_table,
+                        self.Fullname(symbol_table),
+                        symbol_table.filename,
+                        symbol_table_and_line.line)
+            self.pc_cache[pc] = location
+        return self.pc_cache[pc]
+
+    def Snapshot(self):
+        """Return Location of the selected frame, or None if it has no source.
+
+        The location is resolved once per stop and selected frame."""
         import gdb
         try:
             frame = gdb.selected_frame()
             pc = frame.pc()
-            symbol_table_and_line = gdb.find_pc_line(pc)
-            symbol_table = symbol_table_and_line.symtab
-            fullsource = symbol_table.fullname()
-            source = symbol_table.filename
-            line = symbol_table_and_line.line
-            return fullsource,source,line
-        except:
+        except gdb.error:
+            return None
+
+        snapshot = self.snapshot
+        if snapshot == None or snapshot.pc != pc or snapshot.frame != frame:
+            symtab,fullsource,source,line = self.GetPcLocation(pc)
+            if symtab == None:
+                snapshot = None
+            else:
+                snapshot = Location(frame,pc,symtab,fullsource,source,line)
+            self.snapshot = snapshot
+        return snapshot
+
+    def GetStop(self):
+        """Return pc,fullsource,source,line,frame depth and thread number of
+        the selected frame, or None if there is none. Without source,
+        fullsource, source and line are None."""
+        import gdb
+        try:
+            frame = gdb.selected_frame()
+            pc = frame.pc()
+        except gdb.error:
+            return None
+
+        snapshot = self.Snapshot()
+        if snapshot != None:
+            fullsource,source,line = snapshot.Get()
+        else:
+            fullsource,source,line = None,None,None
+
+        thread = gdb.selected_thread()
+        return (pc,fullsource,source,line,self.FrameDepth(frame),
+                thread.num if thread != None else 0)
+
+    def SelectedThread(self):
+        """Return number of the selected thread, or None."""
+        import gdb
+        thread = gdb.selected_thread()
+        return thread.num if thread != None else None
+
+    def FrameDepth(self,frame):
+        """Return number of frames newer than frame."""
+        if hasattr(frame,"level"):
+            return frame.level()
+        depth = 0
+        frame = frame.newer()
+        while frame != None:
+            depth += 1
+            frame = frame.newer()
+        return depth
+
+    def GetFrameLocation(self):
+        """Get location of current line of execution from active frame."""
+        snapshot = self.Snapshot()
+        if snapshot == None:
             return None,None,None
+        return snapshot.Get()
+
+    def DecodeLocation(self,location):
+        """Return (memoized) fullsource,source,line of location name."""
+        import gdb
+        if location not in self.location_cache:
+            try:
+                current_line = gdb.decode_line(location)
+            except gdb.error:
+                locationalt = "{0}:1".format(location)
+                current_line = gdb.decode_line(locationalt)
+
+            symbol_table_and_line = current_line[1][0]
+            symbol_table = symbol_table_and_line.symtab
+            self.location_cache[location] = (
+                    self.Fullname(symbol_table),
+                    symbol_table.filename,
+                    symbol_table_and_line.line)
+        return self.location_cache[location]
 
     def GetLocation(self,location=None):
         """Get location of current line of execution, or location of provided location name."""
         import gdb
         try:
             if location == None:
-                current_line = gdb.decode_line()
+                snapshot = self.Snapshot()
+                if snapshot != None:
+                    return snapshot.Get()
+
+                symbol_table_and_line = gdb.decode_line()[1][0]
+                symbol_table = symbol_table_and_line.symtab
+                return (self.Fullname(symbol_table),
+                        symbol_table.filename,
+                        symbol_table_and_line.line)
             else:
-                try:
-                    current_line = gdb.decode_line(location)
-                except:
-                    locationalt = "{0}:1".format(location)
-                    current_line = gdb.decode_line(locationalt)
-
-            symbol_table_and_line = current_line[1][0]
-            symbol_table = symbol_table_and_line.symtab
-            fullsource = symbol_table.fullname()
-            source = symbol_table.filename
-            line = symbol_table_and_line.line
-
-            return fullsource,source,line
+                return self.DecodeLocation(location)
         except:
             if location == None:
                 raise VimgdbError("Current location not detected")
             else:
                 raise VimgdbError("Location '{0}' not found".format(location))
 
-    def GetBreakpointLines(self,source):
-        """Return all lines that have breakpoints in provided source file."""
-        import re
-        import gdb
-        raw_break_info = gdb.execute('info break',to_string=True).split('\n')
-        match = '^([0-9]+).*{0}:([0-9]+)$'.format(source)
-        breakpoints = [ re.findall(match,line) for line in raw_break_info ]
-        breakpoints = [ breakpoint[0] for breakpoint in breakpoints if breakpoint ]
-        breakpoints = { int(x[0]): int(x[1]) for x in breakpoints }
-        return breakpoints
-
-    def GetBreakpoints(self,source,delete_breakpoint=None,update_breakpoint=None):
-        """Return all lines that have breakpoints in provided source file.
-
-        This function is equal to GetBreakpoints, but does not require 'info break'.
-        NOTE: Occasionally provides function breakpoints with an offset of 1."""
-        import gdb
-        breaklines = set()
-        enabled = dict()
-
-        breakpointlines = self.GetBreakpointLines(source)
-        if update_breakpoint != None and update_breakpoint in breakpointlines:
-            update_breakline = breakpointlines[update_breakpoint]
-        else:
-            update_breakline = None
-
-        for breakpoint in gdb.breakpoints():
-            key = breakpoint.number
-            if breakpoint.number is not delete_breakpoint and key in breakpointlines:
-                breakline = breakpointlines[key]
-                breaklines.add(breakline)
-                if breakline in enabled:
-                    enabled[breakline] = enabled[breakline] or breakpoint.enabled
-                else:
-                    enabled[breakline] = breakpoint.enabled
-
-        return breaklines,enabled,update_breakline
-
+    def GetBreakpoints(self,fullsource,source=None):
+        """Return {line: enabled} of all breakpoints in provided source file."""
+        return self.breakpoints.Lines(fullsource,source)
@@ -0,0 +1,18 @@
+def StartThread(thread):
+    """Start daemon thread with gdb's signals blocked.
+
+    Threads inherit the signal mask of the thread that creates them. Without
+    blocking, a SIGINT or SIGCHLD meant for gdb may be delivered to one of
+    vimgdb's threads instead. Gdb before 14 has no gdb.block_signals(); the
+    thread is then started as it is."""
+    thread.daemon = True
+    try:
+        import gdb
+        block_signals = gdb.block_signals
+    except (ImportError, AttributeError):
+        thread.start()
+        return thread
+
+    with block_signals():
+        thread.start()
+    return thread
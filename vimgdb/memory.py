@@ -0,0 +1,143 @@
+from __future__ import print_function
+import binascii
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+# bytes per line of the hexdump
+WIDTH = 16
+
+# byte -> itself if printable, '.' otherwise
+PRINTABLE = bytes(bytearray(byte if 32 <= byte < 127 else ord(".") for byte in range(256)))
+
+try:
+    binascii.hexlify(b"",b" ")
+
+    def Hex(data):
+        """Return bytes as space separated hex digits."""
+        return binascii.hexlify(data,b" ").decode("ascii")
+except TypeError:
+    def Hex(data):
+        """Return bytes as space separated hex digits."""
+        digits = binascii.hexlify(data).decode("ascii")
+        return u" ".join(digits[index:index + 2] for index in range(0,len(digits),2))
+
+
+class Memory:
+    """Hexdump of a region of inferior memory, for the memory panel.
+
+    The region is read in pages of settings.memory_page bytes, as vim
+    scrolls to them: a page is one read_memory() call, and is formatted
+    from its bytes with C-level conversions. After a stop, pages are only
+    read again when they are in view, and only the lines that changed are
+    sent (and highlighted)."""
+
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        self.address = None
+        self.length = 0
+        self.Forget()
+
+    def Forget(self):
+        """Forget what is shown in vim, to show the region again from its first page."""
+        self.pages = dict()     # page -> bytes read, None if unreadable
+        self.stale = set()      # pages read before the last stop
+        self.changed = dict()   # page -> line numbers that changed at the last stop
+        self.loaded = 0         # pages shown in vim, from the first page on
+        self.view = (0,0)       # first and last page in view
+        self.generation = None
+
+    def Open(self,address,length):
+        if length <= 0:
+            raise VimgdbError("Invalid length {0}".format(length))
+        self.Clear()
+        self.address = address
+        self.length = length
+
+    def Lines(self):
+        """Return number of lines per page."""
+        return settings.memory_page // WIDTH
+
+    def Pages(self):
+        return (self.length + settings.memory_page - 1) // settings.memory_page
+
+    def Stopped(self,generation):
+        """Mark all pages as stale after stop 'generation'."""
+        if generation != self.generation:
+            self.generation = generation
+            self.stale = set(self.pages)
+
+    def View(self,first,last):
+        """Set line numbers (from 0) in view in vim."""
+        lines = self.Lines()
+        self.view = (max(0,first) // lines,max(0,first,last) // lines)
+
+    def Read(self,page):
+        """Return bytes of page, or None if they cannot be read."""
+        import gdb
+        offset = page * settings.memory_page
+        size = min(settings.memory_page,self.length - offset)
+        try:
+            return memoryview(gdb.selected_inferior().read_memory(self.address + offset,size)).tobytes()
+        except (RuntimeError, gdb.error):
+            return None
+
+    def Format(self,page,data,offsets=None):
+        """Return {line number: text} of the lines of page starting at
+        'offsets' (default: all lines)."""
+        address = self.address + page * settings.memory_page
+        first = page * self.Lines() + 1
+        if data == None:
+            size = min(settings.memory_page,self.length - page * settings.memory_page)
+            return { first + offset // WIDTH: u"0x{0:016x}:  <unreadable>".format(address + offset)
+                for offset in (offsets if offsets != None else range(0,size,WIDTH)) }
+
+        text = data.translate(PRINTABLE).decode("ascii")
+        return { first + offset // WIDTH: u"0x{0:016x}:  {1:<{2}}  {3}".format(
+                address + offset,Hex(data[offset:offset + WIDTH]),WIDTH * 3 - 1,text[offset:offset + WIDTH])
+            for offset in (offsets if offsets != None else range(0,len(data),WIDTH)) }
+
+    def Changed(self,old,new):
+        """Return offsets of the lines that differ between two reads of a page."""
+        if old == new:
+            return []
+        if old == None or new == None or len(old) != len(new):
+            return list(range(0,len(new if new != None else old),WIDTH))
+        return [ offset for offset in range(0,len(new),WIDTH)
+            if old[offset:offset + WIDTH] != new[offset:offset + WIDTH] ]
+
+    def Update(self):
+        """Read pages that came into view or are stale and in view. Return
+        (first line,lines) to append, {line number: text} of changed
+        lines, and the line numbers to highlight, or None if they did not
+        change."""
+        first = self.loaded * self.Lines() + 1
+        appended = []
+        # one page more than in view, so that vim can scroll on
+        while self.loaded < min(self.view[1] + 2,self.Pages()):
+            data = self.Read(self.loaded)
+            self.pages[self.loaded] = data
+            lines = self.Format(self.loaded,data)
+            appended.extend(lines[number] for number in sorted(lines))
+            self.loaded += 1
+
+        changed = dict()
+        highlight = False
+        for page in range(self.view[0],min(self.view[1] + 1,self.loaded)):
+            if page not in self.stale:
+                continue
+            self.stale.discard(page)
+            data = self.Read(page)
+            offsets = self.Changed(self.pages[page],data)
+            self.pages[page] = data
+            lines = self.Format(page,data,offsets)
+            changed.update(lines)
+            if sorted(lines) != self.changed.get(page,[]):
+                self.changed[page] = sorted(lines)
+                highlight = True
+
+        if not highlight:
+            return first,appended,changed,None
+        return first,appended,changed,sorted(number for lines in self.changed.values() for number in lines)
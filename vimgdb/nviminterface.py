@@ -0,0 +1,292 @@
+from __future__ import print_function
+import threading
+import time
+import os
+
+from .vimgdbexception import VimgdbError
+from .viminterface import Vim, RuntimeDirectory, PRIORITIES
+from .settings import settings
+from .rpc import Pack, Unpacker
+from .gdbthread import StartThread
+
+# msgpack-rpc message types
+REQUEST = 0
+RESPONSE = 1
+NOTIFICATION = 2
+
+
+def SocketPath(servername):
+    """Return socket on which neovim server 'servername' listens."""
+    return os.path.join(RuntimeDirectory(),"{0}.nvim".format(servername))
+
+
+class RpcError(Exception):
+    pass
+
+
+class RpcTransport:
+    """Send command batches to 'nvim --listen <socket>' over msgpack-rpc.
+
+    A batch is a single nvim_call_atomic request, so neovim applies it at
+    once without parsing a command file. A reader thread receives responses,
+    and the requests that neovim sends with rpcnotify(); the latter are
+    passed on to Vim.Received()."""
+
+    name = "rpc"
+
+    # seconds to wait before trying to reconnect after a failed attempt
+    retry_interval = 2.0
+
+    def __init__(self,vim):
+        self.vim = vim
+        self.path = SocketPath(vim.servername)
+        self.connection = None
+        self.closed = False
+        self.responses = dict()
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.request = 0
+        self.channel = None
+        self.last_attempt = None
+
+    def Connect(self):
+        """Connect to neovim, and load config/vimgdb.lua. Return True if connected."""
+        import socket
+        if self.connection != None:
+            return True
+
+        now = time.time()
+        if self.last_attempt != None and now - self.last_attempt < self.retry_interval:
+            return False
+        self.last_attempt = now
+
+        try:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.vim.timeout)
+            connection.connect(self.path)
+            with self.condition:
+                self.connection = connection
+                self.closed = False
+                self.responses = dict()
+            StartThread(threading.Thread(target=self.Receive,args=(connection,),name="vimgdb-rpc"))
+
+            self.channel = self.Call("nvim_get_api_info")[0]
+            lua = os.path.join(os.path.dirname(os.path.abspath(__file__)),"config/vimgdb.lua")
+            with open(lua) as source:
+                self.Call("nvim_exec_lua",source.read(),[])
+            # keymaps control the gdb session that connected last
+            self.Call("nvim_set_var","vimgdb_address",self.Address())
+            self.last_attempt = None
+            return True
+        except (socket.error, OSError, RpcError):
+            self.Disconnect()
+            return False
+
+    def Disconnect(self):
+        import socket
+        if self.connection != None:
+            try:
+                self.connection.close()
+            except socket.error:
+                pass
+        self.connection = None
+        self.channel = None
+
+    def Close(self):
+        self.Disconnect()
+
+    def Address(self):
+        """Return rpc channel on which neovim can send requests, '' if not connected."""
+        return u"{0}".format(self.channel) if self.channel != None else u""
+
+    def Write(self,message):
+        data = Pack(message)
+        with self.write_lock:
+            self.connection.sendall(data)
+        return len(data)
+
+    def Receive(self,connection):
+        """Read messages from neovim until the connection closes. (Runs in its own thread)."""
+        import socket
+        unpacker = Unpacker()
+        while True:
+            try:
+                data = connection.recv(65536)
+            except socket.timeout:
+                continue
+            except (socket.error, OSError):
+                data = b""
+            if not data:
+                break
+
+            unpacker.Feed(data)
+            try:
+                for message in unpacker:
+                    self.Dispatch(connection,message)
+            except ValueError as error:
+                # the stream cannot be resynchronized: drop the connection,
+                # waiting calls fail at once and the next batch reconnects
+                if settings.debug:
+                    print("Neovim: invalid message: {0}".format(str(error)))
+                try:
+                    connection.close()
+                except socket.error:
+                    pass
+                break
+
+        with self.condition:
+            if connection is self.connection:
+                self.closed = True
+            self.condition.notify_all()
+
+    def Dispatch(self,connection,message):
+        """Pass response to a waiting Read(), or notification to Vim.Received()."""
+        if not isinstance(message,list) or len(message) < 3:
+            return
+        if message[0] == RESPONSE and len(message) == 4:
+            with self.condition:
+                self.responses[message[1]] = (message[2],message[3])
+                self.condition.notify_all()
+        elif message[0] == NOTIFICATION and message[1] == "vimgdb" and message[2]:
+            self.vim.Received(message[2][0])
+        elif message[0] == REQUEST and len(message) == 4:
+            # neovim waits for an answer to rpcrequest(), which vimgdb does not serve
+            data = Pack([RESPONSE,message[1],"vimgdb does not serve requests",None])
+            with self.write_lock:
+                connection.sendall(data)
+
+    def Read(self,request):
+        """Wait for the response to 'request', and return its result."""
+        import socket
+        deadline = time.time() + self.vim.timeout
+        with self.condition:
+            while request not in self.responses:
+                if self.closed:
+                    raise socket.error("Neovim closed the connection")
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise socket.timeout("Neovim did not respond")
+                self.condition.wait(remaining)
+            error,result = self.responses.pop(request)
+        if error != None:
+            raise RpcError(error[1] if isinstance(error,list) and len(error) > 1 else error)
+        return result
+
+    def Call(self,method,*args):
+        """Call neovim api function 'method', and return its result."""
+        with self.condition:
+            self.request += 1
+            request = self.request
+        self.Write([REQUEST,request,method,list(args)])
+        return self.Read(request)
+
+    def Send(self,calls):
+        """Apply list of [api function, arguments] calls in one request. Return 0 on success."""
+        import socket
+        if not self.Connect():
+            return 1
+        try:
+            results,error = self.Call("nvim_call_atomic",calls)
+        except socket.error:
+            self.Disconnect()
+            return 1
+        except RpcError as error:
+            if settings.debug:
+                print("Neovim: {0}".format(str(error)))
+            return 1
+
+        if error != None:
+            if settings.debug:
+                index,kind,message = error
+                print("Neovim: {0} failed: {1}".format(calls[index][0],message))
+            return 1
+        return 0
+
+    def Eval(self,expression):
+        """Evaluate vim expression and return its result as string."""
+        return u"{0}".format(self.Request("nvim_eval",expression)).strip()
+
+    def Request(self,method,*args):
+        """Call neovim api function 'method' and return its result, raise
+        VimgdbError if it fails."""
+        import socket
+        if not self.Connect():
+            raise VimgdbError("Neovim server '{0}' not reachable".format(self.vim.servername))
+        try:
+            return self.Call(method,*args)
+        except socket.error:
+            self.Disconnect()
+            raise VimgdbError("Neovim server '{0}' not reachable".format(self.vim.servername))
+        except RpcError as error:
+            raise VimgdbError("Neovim: {0}".format(str(error)))
+
+
+class Neovim(Vim):
+    """Neovim as editor, started with 'nvim --listen <socket>'.
+
+    Batches are sent as one nvim_call_atomic request. Breakpoints and the
+    current line are extmarks in a namespace of the session, placed per
+    file by config/vimgdb.lua from structured arguments; other commands
+    are passed on as ex commands."""
+
+    def __init__(self):
+        Vim.__init__(self)
+        self.executable = "nvim"
+
+    def Transport(self):
+        if self.transport == None:
+            self.transport = RpcTransport(self)
+        return self.transport
+
+    def SetTransport(self,name):
+        raise VimgdbError("Neovim is only reached over msgpack-rpc")
+
+    def ServerArguments(self):
+        return ["--listen",SocketPath(self.servername)]
+
+    def GetServerlist(self):
+        """Get list of running neovim servers in the vimgdb runtime directory."""
+        return [ filename[:-len(".nvim")] for filename in sorted(os.listdir(RuntimeDirectory()))
+                if filename.endswith(".nvim") ]
+
+    def IsRunning(self,discover=True):
+        if Vim.IsRunning(self,discover=False):
+            return True
+        return discover and os.path.exists(SocketPath(self.servername))
+
+    def AddCommand(self,command):
+        self.command.append(["nvim_command",[u"silent! " + command]])
+
+    def Size(self,commands):
+        """Return number of bytes of a sent batch."""
+        return len(Pack(commands))
+
+    def UpdateSigns(self,filename,place,unplace=(),clear=False,group=None):
+        self.command.append(["nvim_exec_lua",[u"vimgdb.marks(...)",[group or self.group,filename,
+            [ [sign_id,line,sign_type,PRIORITIES.get(sign_type)] for sign_id,line,sign_type in place ],
+            list(unplace),clear]]])
+
+    def Placed(self,files):
+        """Ask neovim for the current file and the marks of this session in
+        'files', in one request, see Vim.Placed()."""
+        if self.worker != None:
+            self.worker.Drain(self.timeout)
+        files = sorted(files)
+        placed = self.Transport().Request("nvim_exec_lua",u"return vimgdb.placed(...)",[self.group,files])
+        try:
+            signs = placed["signs"] or dict()   # an empty table arrives as list
+            return placed["current"],{ filename: { sign[0]: (sign[1],sign[2]) for sign in signs.get(filename,[]) }
+                for filename in files }
+        except (KeyError, TypeError, IndexError, AttributeError):
+            raise VimgdbError("Unexpected answer of neovim: '{0}'".format(str(placed)[:80]))
+
+    def DisableSignColumns(self):
+        self.command.append(["nvim_exec_lua",[u"vimgdb.clear(...)",[self.group]]])
+        self.command.append(["nvim_exec_lua",[u"vimgdb.clear(...)",[self.count_group]]])
+        self.ClearHeatSigns()
+        self.signs = dict()
+        self.unknown = set()
+        self.buffers = set()
+
+    def ClearHeatSigns(self):
+        self.command.append(["nvim_exec_lua",[u"vimgdb.clear(...)",[self.heat_group]]])
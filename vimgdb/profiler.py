@@ -0,0 +1,184 @@
+from __future__ import print_function
+import array
+import math
+import os
+import signal
+import threading
+import time
+
+from .vimgdbexception import VimgdbError
+from .gdbthread import StartThread
+
+# number of heat sign grades, VimgdbHeat1 .. VimgdbHeat5 in config/vimrc
+GRADES = 5
+
+
+class Profile:
+    """Sampled pcs of all threads, aggregated per source line.
+
+    Samples are appended to a flat array while the inferior runs, and only
+    resolved to lines afterwards: every distinct pc is looked up once (through
+    the memoized Gdb.GetPcLocation), so resolution scales with the size of the
+    hot code rather than with the number of samples."""
+
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        self.pcs = array.array("L")
+        self.interrupts = 0
+        self.threads = 0
+        self.seconds = 0.0
+        self.lines = []         # [(samples,fullsource,source,line)], hottest first
+        self.unknown = 0        # samples without source
+
+    def Add(self,pc):
+        self.pcs.append(pc)
+
+    def Aggregate(self,gdb):
+        """Resolve samples to lines with gdb interface 'gdb', and rank them."""
+        counts = dict()
+        for pc in self.pcs:
+            counts[pc] = counts.get(pc,0) + 1
+
+        lines = dict()
+        sources = dict()
+        self.unknown = 0
+        for pc,count in counts.items():
+            symtab,fullsource,source,line = gdb.GetPcLocation(pc)
+            if fullsource == None:
+                self.unknown += count
+                continue
+            key = (fullsource,line)
+            lines[key] = lines.get(key,0) + count
+            sources[fullsource] = source
+
+        self.lines = sorted(
+                ((count,fullsource,sources[fullsource],line) for (fullsource,line),count in lines.items()),
+                key=lambda entry: (-entry[0],entry[1],entry[3]))
+        return self.lines
+
+    def Grade(self,count):
+        """Return heat grade (1 .. GRADES) of a line, on a log scale of the hottest line."""
+        maximum = self.lines[0][0] if self.lines else 1
+        if maximum <= 1:
+            return GRADES
+        return 1 + int((GRADES - 1) * math.log(count) / math.log(maximum))
+
+    def Heat(self):
+        """Return {file: {line: grade}} of all sampled lines."""
+        heat = dict()
+        for count,fullsource,source,line in self.lines:
+            heat.setdefault(fullsource,dict())[line] = self.Grade(count)
+        return heat
+
+    def Percent(self,count):
+        return 100.0 * count / len(self.pcs) if len(self.pcs) else 0.0
+
+    def Report(self,limit=20):
+        """Return printable ranked list of the hottest lines."""
+        text = ["Samples: {0} of {1} threads in {2} interrupts, {3:.1f} s".format(
+            len(self.pcs),self.threads,self.interrupts,self.seconds)]
+        if self.unknown:
+            text.append("Without source: {0} samples ({1:.1f}%)".format(
+                self.unknown,self.Percent(self.unknown)))
+        if self.lines:
+            text.append("")
+            text.append("{0:>6}{1:>10}{2:>8}  {3}".format("rank","samples","%","location"))
+            for rank,(count,fullsource,source,line) in enumerate(self.lines[:limit]):
+                text.append("{0:>6}{1:>10}{2:>7.1f}%  {3}:{4}".format(
+                    rank + 1,count,self.Percent(count),source,line))
+        return "\n".join(text)
+
+
+class Sampler:
+    """Sample pcs of all threads by periodically interrupting the inferior.
+
+    A ticker thread sends SIGINT (which gdb does not pass on to the
+    program) to the inferior at the sampling rate, while gdb continues it.
+    Whenever the inferior stops, the pc of the innermost frame of every
+    thread is sampled. Any other stop, e.g. at a breakpoint, ends sampling
+    and is kept in 'stop'."""
+
+    def __init__(self,profile):
+        self.profile = profile
+        self.stop = None
+        self.done = threading.Event()
+
+    def Tick(self,pid,interval):
+        """Interrupt pid every interval, until done is set."""
+        while not self.done.wait(interval):
+            try:
+                os.kill(pid,signal.SIGINT)
+            except OSError:
+                return
+
+    def Stopped(self,stop_event):
+        """Keep a stop that is not an interrupt of the ticker."""
+        import gdb
+        if isinstance(stop_event,gdb.SignalEvent) and stop_event.stop_signal == "SIGINT":
+            return
+        if isinstance(stop_event,(gdb.BreakpointEvent,gdb.SignalEvent)):
+            self.stop = stop_event
+
+    def Reason(self):
+        """Return printable reason of the stop that ended sampling, or None."""
+        import gdb
+        if isinstance(self.stop,gdb.BreakpointEvent):
+            return "breakpoint {0}".format(", ".join(
+                str(breakpoint.number) for breakpoint in self.stop.breakpoints))
+        if self.stop != None:
+            return "signal {0}".format(self.stop.stop_signal)
+        return None
+
+    def Run(self,seconds,hz):
+        """Sample for 'seconds' at 'hz' interrupts per second. (Call from GNU Gdb)."""
+        import gdb
+        inferior = gdb.selected_inferior()
+        if inferior.pid == 0:
+            raise VimgdbError("No process to profile")
+
+        profile = self.profile
+        profile.Clear()
+        selected = gdb.selected_thread()
+        start = time.time()
+        deadline = start + seconds
+        self.stop = None
+        self.done.clear()
+        gdb.events.stop.connect(self.Stopped)
+        ticker = StartThread(threading.Thread(target=self.Tick,args=(inferior.pid,1.0 / hz),name="vimgdb-profile"))
+        try:
+            while time.time() < deadline and inferior.pid != 0:
+                gdb.execute("continue",to_string=True)
+                if inferior.pid == 0 or self.stop != None:
+                    break
+                self.Sample(inferior)
+        except KeyboardInterrupt:
+            pass
+        except gdb.error as error:
+            if profile.interrupts == 0:
+                raise VimgdbError("Profiling failed: {0}".format(str(error)))
+        finally:
+            self.done.set()
+            ticker.join()
+            gdb.events.stop.disconnect(self.Stopped)
+            profile.seconds = time.time() - start
+            # after a breakpoint, its thread stays selected
+            if self.stop == None and selected != None and selected.is_valid():
+                selected.switch()
+        return profile
+
+    def Sample(self,inferior):
+        """Sample the pc of every thread of the stopped inferior."""
+        import gdb
+        threads = inferior.threads()
+        for thread in threads:
+            if not thread.is_valid():
+                continue
+            thread.switch()
+            try:
+                self.profile.Add(gdb.newest_frame().pc())
+            except gdb.error:
+                pass
+        self.profile.interrupts += 1
+        self.profile.threads = max(self.profile.threads,len(threads))
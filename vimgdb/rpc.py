@@ -0,0 +1,194 @@
+from __future__ import print_function
+import struct
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class ExtType:
+    """Msgpack extension value, e.g., a neovim buffer or window handle."""
+
+    def __init__(self,code,data):
+        self.code = code
+        self.data = data
+
+    def __eq__(self,other):
+        return isinstance(other,ExtType) and (self.code,self.data) == (other.code,other.data)
+
+    def __repr__(self):
+        return "ExtType({0},{1!r})".format(self.code,self.data)
+
+
+def Pack(value):
+    """Return msgpack encoding of value (None, bool, int, float, text,
+    bytes, list, tuple, dict or ExtType)."""
+    output = []
+    PackInto(output,value)
+    return b"".join(output)
+
+
+def PackInto(output,value):
+    if value is None:
+        output.append(b"\xc0")
+    elif value is True:
+        output.append(b"\xc3")
+    elif value is False:
+        output.append(b"\xc2")
+    elif isinstance(value,int) or type(value).__name__ == "long":
+        if 0 <= value < 0x80:
+            output.append(struct.pack("B",value))
+        elif -32 <= value < 0:
+            output.append(struct.pack("b",value))
+        elif 0 <= value:
+            for code,fmt,limit in ((0xcc,">BB",0xff),(0xcd,">BH",0xffff),(0xce,">BI",0xffffffff),(0xcf,">BQ",None)):
+                if limit == None or value <= limit:
+                    output.append(struct.pack(fmt,code,value))
+                    break
+        else:
+            for code,fmt,limit in ((0xd0,">Bb",-0x80),(0xd1,">Bh",-0x8000),(0xd2,">Bi",-0x80000000),(0xd3,">Bq",None)):
+                if limit == None or value >= limit:
+                    output.append(struct.pack(fmt,code,value))
+                    break
+    elif isinstance(value,float):
+        output.append(struct.pack(">Bd",0xcb,value))
+    elif isinstance(value,text_type):
+        data = value.encode("utf-8")
+        PackHeader(output,len(data),0xa0,32,0xd9,0xda,0xdb)
+        output.append(data)
+    elif isinstance(value,bytes):
+        PackHeader(output,len(value),None,0,0xc4,0xc5,0xc6)
+        output.append(value)
+    elif isinstance(value,(list,tuple)):
+        PackHeader(output,len(value),0x90,16,None,0xdc,0xdd)
+        for item in value:
+            PackInto(output,item)
+    elif isinstance(value,dict):
+        PackHeader(output,len(value),0x80,16,None,0xde,0xdf)
+        for key,item in value.items():
+            PackInto(output,key)
+            PackInto(output,item)
+    elif isinstance(value,ExtType):
+        output.append(struct.pack(">BIb",0xc9,len(value.data),value.code))
+        output.append(value.data)
+    else:
+        raise TypeError("Cannot pack {0}".format(type(value).__name__))
+
+
+def PackHeader(output,length,fix,fix_limit,code8,code16,code32):
+    if fix != None and length < fix_limit:
+        output.append(struct.pack("B",fix | length))
+    elif code8 != None and length < 0x100:
+        output.append(struct.pack(">BB",code8,length))
+    elif length < 0x10000:
+        output.append(struct.pack(">BH",code16,length))
+    else:
+        output.append(struct.pack(">BI",code32,length))
+
+
+class Incomplete(Exception):
+    pass
+
+
+# fixed size types: code -> struct format
+SCALARS = {
+    0xca: ">f", 0xcb: ">d",
+    0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q",
+    0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q",
+}
+
+# variable size types: code -> (struct format of the length, kind)
+SIZED = {
+    0xd9: (">B","str"), 0xda: (">H","str"), 0xdb: (">I","str"),
+    0xc4: (">B","bin"), 0xc5: (">H","bin"), 0xc6: (">I","bin"),
+    0xdc: (">H","array"), 0xdd: (">I","array"),
+    0xde: (">H","map"), 0xdf: (">I","map"),
+    0xc7: (">B","ext"), 0xc8: (">H","ext"), 0xc9: (">I","ext"),
+}
+
+
+class Unpacker:
+    """Decode a stream of msgpack values, fed in pieces as they arrive."""
+
+    def __init__(self):
+        self.buffer = b""
+        self.offset = 0
+
+    def Feed(self,data):
+        self.buffer = self.buffer[self.offset:] + data
+        self.offset = 0
+
+    def __iter__(self):
+        while self.offset < len(self.buffer):
+            try:
+                value,offset = self.Decode(self.offset)
+            except Incomplete:
+                return
+            self.offset = offset
+            yield value
+
+    def Take(self,offset,length):
+        end = offset + length
+        if end > len(self.buffer):
+            raise Incomplete()
+        return self.buffer[offset:end],end
+
+    def Unpack(self,offset,fmt):
+        data,end = self.Take(offset,struct.calcsize(fmt))
+        return struct.unpack(fmt,data)[0],end
+
+    def Decode(self,offset):
+        code,offset = self.Unpack(offset,"B")
+        if code < 0x80:
+            return code,offset
+        elif code >= 0xe0:
+            return code - 0x100,offset
+        elif code < 0x90:
+            return self.Map(offset,code & 0x0f)
+        elif code < 0xa0:
+            return self.Array(offset,code & 0x0f)
+        elif code < 0xc0:
+            data,offset = self.Take(offset,code & 0x1f)
+            return data.decode("utf-8"),offset
+        elif code == 0xc0:
+            return None,offset
+        elif code == 0xc2:
+            return False,offset
+        elif code == 0xc3:
+            return True,offset
+        elif code in SCALARS:
+            return self.Unpack(offset,SCALARS[code])
+        elif 0xd4 <= code <= 0xd8:
+            ext,offset = self.Unpack(offset,"b")
+            data,offset = self.Take(offset,1 << (code - 0xd4))
+            return ExtType(ext,data),offset
+        elif code in SIZED:
+            fmt,kind = SIZED[code]
+            length,offset = self.Unpack(offset,fmt)
+            if kind == "array":
+                return self.Array(offset,length)
+            elif kind == "map":
+                return self.Map(offset,length)
+            elif kind == "ext":
+                ext,offset = self.Unpack(offset,"b")
+                data,offset = self.Take(offset,length)
+                return ExtType(ext,data),offset
+            data,offset = self.Take(offset,length)
+            return (data.decode("utf-8") if kind == "str" else data),offset
+        raise ValueError("Invalid msgpack type 0x{0:02x}".format(code))
+
+    def Array(self,offset,length):
+        values = []
+        for index in range(length):
+            value,offset = self.Decode(offset)
+            values.append(value)
+        return values,offset
+
+    def Map(self,offset,length):
+        values = dict()
+        for index in range(length):
+            key,offset = self.Decode(offset)
+            value,offset = self.Decode(offset)
+            values[key if not isinstance(key,list) else tuple(key)] = value
+        return values,offset
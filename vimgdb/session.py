@@ -0,0 +1,166 @@
+from __future__ import print_function
+import hashlib
+import json
+import os
+import zlib
+
+from .vimgdbexception import VimgdbError
+from .symbols import CacheDirectory
+
+MAGIC = b"VIMGDBB1"
+
+# breakpoint types that are saved: gdb constant -> watchpoint class, None for breakpoints
+TYPES = (
+    ("BP_BREAKPOINT",None),
+    ("BP_HARDWARE_BREAKPOINT",None),
+    ("BP_WATCHPOINT","WP_WRITE"),
+    ("BP_HARDWARE_WATCHPOINT","WP_WRITE"),
+    ("BP_READ_WATCHPOINT","WP_READ"),
+    ("BP_ACCESS_WATCHPOINT","WP_ACCESS"),
+)
+
+# attributes set after creating a breakpoint, saved if they differ from their default
+ATTRIBUTES = (
+    ("condition",None),
+    ("silent",False),
+    ("ignore_count",0),
+    ("commands",None),
+    ("enabled",True),
+)
+
+
+class Session:
+    """Breakpoints of a program, and the files vim showed, stored under the
+    build-id of the program (see CacheDirectory()).
+
+    Breakpoints are saved by their location spec or expression, so that
+    breakpoints in libraries that are not loaded yet are restored as
+    pending breakpoints, which gdb resolves when the library loads."""
+
+    def Key(self):
+        """Return build-id of the program, or a digest of its path if it has
+        none. Return None without program."""
+        import gdb
+        program = gdb.current_progspace().filename
+        if not program:
+            return None
+        for objfile in gdb.objfiles():
+            if objfile.filename == program and getattr(objfile,"build_id",None):
+                return objfile.build_id
+        return hashlib.sha1(os.path.abspath(program).encode("utf-8")).hexdigest()
+
+    def Path(self,key):
+        return os.path.join(CacheDirectory("sessions"),"{0}.session".format(key))
+
+    def Breakpoints(self):
+        """Return saved form of the user breakpoints and watchpoints."""
+        import gdb
+        types = dict()
+        for name,watchpoint in TYPES:
+            if hasattr(gdb,name):
+                types.setdefault(getattr(gdb,name),name)
+
+        records = []
+        for breakpoint in gdb.breakpoints() or ():
+            if not breakpoint.is_valid() or not breakpoint.visible or breakpoint.type not in types:
+                continue
+            record = { "type": types[breakpoint.type] }
+            if breakpoint.location != None:
+                record["location"] = breakpoint.location
+            else:
+                record["expression"] = breakpoint.expression
+            if breakpoint.temporary:
+                record["temporary"] = True
+            if getattr(breakpoint,"counting",False):
+                record["counting"] = True
+            for attribute,default in ATTRIBUTES:
+                value = getattr(breakpoint,attribute,default)
+                if value != default:
+                    record[attribute] = value
+            records.append(record)
+        return records
+
+    def Save(self,files,current):
+        """Save breakpoints, the files with signs in vim {full path: source},
+        and the location shown (full path,source,line). Return number of
+        breakpoints saved."""
+        key = self.Key()
+        if key == None:
+            raise VimgdbError("No program loaded")
+        breakpoints = self.Breakpoints()
+        data = json.dumps({ "breakpoints": breakpoints, "files": files, "current": current },
+            separators=(",",":")).encode("utf-8")
+
+        path = self.Path(key)
+        temporary = "{0}.{1}".format(path,os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(temporary,"wb") as stream:
+                stream.write(MAGIC)
+                stream.write(zlib.compress(data))
+            os.rename(temporary,path)
+        except (IOError, OSError) as error:
+            raise VimgdbError("Cannot save session '{0}': {1}".format(path,error.strerror))
+        return len(breakpoints)
+
+    def Load(self):
+        """Return saved session of the program, {'breakpoints','files',
+        'current'}, or None if there is none."""
+        key = self.Key()
+        if key == None:
+            return None
+        try:
+            with open(self.Path(key),"rb") as stream:
+                data = stream.read()
+        except (IOError, OSError):
+            return None
+        if not data.startswith(MAGIC):
+            raise VimgdbError("Invalid session file '{0}'".format(self.Path(key)))
+        try:
+            state = json.loads(zlib.decompress(data[len(MAGIC):]).decode("utf-8"))
+        except (zlib.error, ValueError):
+            raise VimgdbError("Invalid session file '{0}'".format(self.Path(key)))
+        return state
+
+    def Create(self,records,counting=None):
+        """Create breakpoints from saved records, except those that exist
+        already, and counting breakpoints as instances of class 'counting'
+        (default gdb.Breakpoint). Return number of breakpoints created, and
+        error messages of the ones that could not be (fully) restored."""
+        import gdb
+        classes = dict(TYPES)
+        watchpoints = set( getattr(gdb,name) for name,watchpoint in TYPES if watchpoint and hasattr(gdb,name) )
+        existing = set( (breakpoint.type in watchpoints,breakpoint.location or breakpoint.expression)
+            for breakpoint in gdb.breakpoints() or () if breakpoint.is_valid() )
+
+        created = 0
+        errors = []
+        for record in records:
+            name = record.get("type") or ""
+            spec = record.get("location",record.get("expression"))
+            if not hasattr(gdb,name):
+                errors.append("{0}: unsupported type {1}".format(spec,name))
+                continue
+            if (classes.get(name) != None,spec) in existing:
+                continue
+            try:
+                if classes.get(name) == None:
+                    create = counting if record.get("counting") and counting != None else gdb.Breakpoint
+                    breakpoint = create(spec,type=getattr(gdb,name),
+                        internal=False,temporary=record.get("temporary",False))
+                else:
+                    breakpoint = gdb.Breakpoint(spec,type=gdb.BP_WATCHPOINT,
+                        wp_class=getattr(gdb,classes[name]),internal=False)
+            except (RuntimeError, gdb.error) as error:
+                errors.append("{0}: {1}".format(spec,str(error)))
+                continue
+            created += 1
+
+            for attribute,default in ATTRIBUTES:
+                if attribute in record:
+                    try:
+                        setattr(breakpoint,attribute,record[attribute])
+                    except (AttributeError, RuntimeError, gdb.error) as error:
+                        errors.append("{0}: cannot restore {1}: {2}".format(spec,attribute,str(error)))
+        return created,errors
@@ -1,7 +1,50 @@
+import os
 
 class settings():
     debug = False
 
+    # editor: "vim" or "nvim" (selected with --nvim, passed on to gdb through VIMGDB_EDITOR)
+    editor = os.environ.get("VIMGDB_EDITOR","vim")
+
+    # transport used to send commands to vim: "channel" or "clientserver"
+    transport = "channel"
+
+    # coalesce events and send updates to vim from a background thread
+    async_updates = True
+
+    # collect latency statistics, see 'vimgdb stats'
+    stats = True
+
+    # number of stops kept by 'vimgdb trace'
+    trace_size = 100000
+
+    # number of frames unwound and shown at a time by 'vimgdb stack'
+    stack_page = 100
+
+    # number of children shown when expanding a value in 'vimgdb locals'
+    watch_children = 50
+
+    # number of instructions disassembled at a time outside of known functions, see 'vimgdb disassembly'
+    disassembly_window = 64
+
+    # bytes read from the inferior at a time by 'vimgdb memory' (a multiple of 16)
+    memory_page = 4096
+
+    # number of frames whose source files are loaded in vim after a stop
+    prefetch_frames = 8
+
+    # maximum number of completions of 'vimgdb goto'
+    complete_limit = 200
+
+    # save breakpoints when gdb quits, and restore them when the program is loaded, see 'vimgdb session'
+    session = False
+
+    # minimum number of seconds between showing hit counts of counting breakpoints in vim, see 'vimgdb count'
+    count_interval = 0.25
+
+    # maximum number of lines of a value shown in vim, when it evaluates the expression under its cursor
+    popup_lines = 20
+
     major = 1
     minor = 3
     micro = 3
@@ -0,0 +1,109 @@
+from __future__ import print_function
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+
+class Stack:
+    """Backtrace of the selected thread at the current stop, unwound lazily in pages.
+
+    Frames are unwound only as far as they are shown or selected, and kept
+    until the inferior runs again (see Gdb.Invalidate), so moving up and
+    down the stack is a lookup. Frames are identified by comparing gdb
+    frames, which compares their frame ids."""
+
+    def __init__(self,gdb):
+        self.gdb = gdb
+        self.generation = 0
+        self.thread = None
+        self.Clear()
+
+    def Clear(self):
+        """Forget the backtrace."""
+        self.frames = []        # gdb frames, innermost first
+        self.rows = []          # (pc,function,fullsource,source,line) per frame
+        self.complete = False
+        self.selected = 0
+        self.generation += 1
+
+    def Page(self,level):
+        """Return number of frames in the pages up to and including frame 'level'."""
+        return (level // settings.stack_page + 1) * settings.stack_page
+
+    def Unwind(self,count):
+        """Unwind until 'count' frames are known, or the stack ends."""
+        import gdb
+        try:
+            if not self.frames and not self.complete:
+                self.Append(gdb.newest_frame())
+            while len(self.frames) < count and not self.complete:
+                older = self.frames[-1].older()
+                if older == None:
+                    self.complete = True
+                else:
+                    self.Append(older)
+        except gdb.error:
+            self.complete = True
+        return len(self.frames)
+
+    def Append(self,frame):
+        sal = frame.find_sal()
+        symtab = sal.symtab
+        if symtab != None:
+            location = self.gdb.Fullname(symtab),symtab.filename,sal.line
+        else:
+            location = None,None,None
+        self.frames.append(frame)
+        self.rows.append((frame.pc(),frame.name() or "??") + location)
+
+    def Row(self,level):
+        """Return (pc,function,fullsource,source,line) of frame 'level'."""
+        if level < 0 or self.Unwind(level + 1) <= level:
+            raise VimgdbError("No frame at level {0}".format(level))
+        return self.rows[level]
+
+    def Thread(self):
+        """Forget the backtrace if another thread was selected."""
+        import gdb
+        thread = gdb.selected_thread()
+        number = thread.num if thread != None else None
+        if number != self.thread:
+            if self.frames:
+                self.Clear()
+            self.thread = number
+
+    def Level(self):
+        """Return level of the selected frame."""
+        import gdb
+        try:
+            frame = gdb.selected_frame()
+        except gdb.error:
+            raise VimgdbError("No stack")
+        self.Thread()
+
+        if hasattr(frame,"level"):
+            self.selected = frame.level()
+            return self.selected
+
+        # up and down move one frame, so look near the last selected frame
+        for distance in range(len(self.frames)):
+            for level in (self.selected - distance,self.selected + distance):
+                if 0 <= level < len(self.frames) and self.frames[level] == frame:
+                    self.selected = level
+                    return level
+        self.selected = self.gdb.FrameDepth(frame)
+        return self.selected
+
+    def Select(self,level):
+        """Select frame 'level' in gdb."""
+        self.Thread()
+        self.Row(level)
+        self.frames[level].select()
+        self.selected = level
+
+    def Describe(self,level):
+        """Return printable line of frame 'level', like a backtrace row."""
+        pc,function,fullsource,source,line = self.Row(level)
+        if fullsource == None:
+            return "#{0:<4} 0x{1:016x} in {2}".format(level,pc,function)
+        return "#{0:<4} {1} at {2}:{3}".format(level,function,source,line)
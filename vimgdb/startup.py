@@ -0,0 +1,48 @@
+from __future__ import print_function
+import os
+import time
+
+
+class StartupTimer:
+    """Time the phases of starting vimgdb, printed when VIMGDB_TIMING is set.
+
+    The start time is passed on to gdb through VIMGDB_START, so the report
+    of gdb covers everything up to its first prompt."""
+
+    def __init__(self):
+        self.enabled = "VIMGDB_TIMING" in os.environ
+        self.Start(float(os.environ.get("VIMGDB_START",time.time())))
+
+    def Start(self,start):
+        self.start = start
+        self.last = start
+        self.phases = []
+
+    def Mark(self,phase):
+        """End phase, which started at the previous mark."""
+        now = time.time()
+        self.phases.append((phase,now - self.last))
+        self.last = now
+
+    def Export(self):
+        """Pass start time on to processes started by vimgdb."""
+        os.environ["VIMGDB_START"] = repr(self.start)
+
+    def Report(self):
+        phases = [ "{0} {1:.1f} ms".format(phase,seconds * 1000) for phase,seconds in self.phases ]
+        phases.append("total {0:.1f} ms".format((self.last - self.start) * 1000))
+        return "vimgdb startup: " + ", ".join(phases)
+
+    def Print(self):
+        if self.enabled:
+            print(self.Report())
+
+    def Done(self,phase):
+        """Mark final phase and print report, once."""
+        if self.enabled:
+            self.Mark(phase)
+            self.Print()
+            self.enabled = False
+
+
+startup = StartupTimer()
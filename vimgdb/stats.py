@@ -0,0 +1,162 @@
+from __future__ import print_function
+import time
+
+from .settings import settings
+
+
+class Histogram:
+    """Fixed-size histogram of durations, in power-of-two microsecond buckets."""
+
+    size = 32
+
+    def __init__(self):
+        self.Reset()
+
+    def Reset(self):
+        self.buckets = [0] * self.size
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def Add(self,seconds):
+        bucket = min(int(seconds * 1e6).bit_length(),self.size - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def Percentile(self,percentile):
+        """Return upper bound (seconds) of the bucket holding the percentile."""
+        if self.count == 0:
+            return 0.0
+        rank = self.count * percentile / 100.0
+        seen = 0
+        for bucket,count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << bucket) / 1e6,self.maximum)
+        return self.maximum
+
+
+class NullTimer:
+    """Timer used when statistics are disabled."""
+
+    seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        return False
+
+
+class Timer:
+
+    def __init__(self,stats,phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self,*args):
+        self.seconds = time.time() - self.start
+        self.stats.Add(self.phase,self.seconds)
+        return False
+
+
+class Stats:
+    """Latency histograms per update phase and counters of vimgdb activity."""
+
+    phases = ("update","reconcile","gdb","build","diff","send")
+    counters = ("updates","requests","coalesced","batches","commands","bytes","failures")
+
+    def __init__(self):
+        self.null_timer = NullTimer()
+        self.trace = None
+        self.local = None       # timings per thread, while tracing
+        self.histograms = { phase: Histogram() for phase in self.phases }
+        self.Reset()
+
+    def Reset(self):
+        """Clear all histograms and counters."""
+        for histogram in self.histograms.values():
+            histogram.Reset()
+        self.count = dict.fromkeys(self.counters,0)
+
+    def Timer(self,phase):
+        """Return context manager timing a phase."""
+        if not settings.stats:
+            return self.null_timer
+        return Timer(self,phase)
+
+    def Add(self,phase,seconds):
+        self.histograms[phase].Add(seconds)
+        if self.trace != None:
+            self.Current()[phase] = round(seconds * 1000,3)
+
+    def Count(self,counter,value=1):
+        if settings.stats:
+            self.count[counter] += value
+
+    def Current(self):
+        """Return timings collected by the current thread since its last trace."""
+        if not hasattr(self.local,"current"):
+            self.local.current = dict()
+        return self.local.current
+
+    def Trace(self,event,timings=None,**values):
+        """Write the timings collected for an event (by default: all timings
+        of the current thread since its last trace) to the trace file."""
+        if self.trace == None:
+            return
+        if timings == None:
+            timings = self.Current()
+            self.local.current = dict()
+        import json
+        record = dict(values,event=event,time=round(time.time(),6),ms=timings)
+        self.trace.write(json.dumps(record,sort_keys=True) + "\n")
+
+    def StartTrace(self,filename):
+        """Write a json line per update and per send to file."""
+        import threading
+        self.StopTrace()
+        if self.local == None:
+            self.local = threading.local()
+        self.trace = open(filename,"a",1)
+
+    def StopTrace(self):
+        if self.trace != None:
+            self.trace.close()
+            self.trace = None
+
+    def Report(self):
+        """Return statistics as printable text."""
+        count = self.count
+        lines = [
+            "Updates: {0} ({1} requests, {2} coalesced)".format(
+                count["updates"],count["requests"],count["coalesced"]),
+            "Sent: {0} commands in {1} batches, {2} bytes, {3} failures".format(
+                count["commands"],count["batches"],count["bytes"],count["failures"]),
+            "",
+            "{0:<12}{1:>8}{2:>10}{3:>10}{4:>10}{5:>10}{6:>10}".format(
+                "phase (ms)","count","mean","p50","p95","p99","max"),
+        ]
+        for phase in self.phases:
+            histogram = self.histograms[phase]
+            mean = histogram.total / histogram.count if histogram.count else 0.0
+            lines.append("{0:<12}{1:>8}{2:>10.3f}{3:>10.3f}{4:>10.3f}{5:>10.3f}{6:>10.3f}".format(
+                phase,histogram.count,mean * 1000,
+                histogram.Percentile(50) * 1000,
+                histogram.Percentile(95) * 1000,
+                histogram.Percentile(99) * 1000,
+                histogram.maximum * 1000))
+        if not settings.stats:
+            lines.append("")
+            lines.append("Statistics are disabled (settings.stats).")
+        return "\n".join(lines)
+
+
+stats = Stats()
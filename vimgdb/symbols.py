@@ -0,0 +1,358 @@
+from __future__ import print_function
+import array
+import bisect
+import os
+import struct
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+# file header: magic, functions, source files, bytes of names, bytes of source files
+HEADER = struct.Struct("<8sIIII")
+MAGIC = b"VIMGDBS2"
+
+# 'info functions' rows: "File a.c:", "12:	int main(int, char **);"
+FILE_ROW = r"^File (.*):$"
+FUNCTION_ROW = r"^(?:(\d+):)?\s+(.*);$"
+
+
+def CacheDirectory(name="symbols"):
+    """Return directory in which symbol indexes (or other 'name' files) are stored by build-id."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"),".cache")
+    return os.path.join(cache,"vimgdb",name)
+
+
+def FunctionName(declaration):
+    """Return name of the function in a declaration as printed by 'info
+    functions', e.g. 'ns::Class<int, 2>::Method' of 'int ns::Class<int,
+    2>::Method(char const*) const', or None."""
+    operator = Operator(declaration)
+    if operator != None:
+        return operator
+
+    depth = 0
+    for end,character in enumerate(declaration):
+        if character == "<":
+            depth += 1
+        elif character == ">":
+            depth -= 1
+        elif character == "(" and depth == 0:
+            # the name precedes the parameter list, e.g. 'int (*f(int))(int)'
+            start = NameStart(declaration,end)
+            if start < end:
+                return declaration[start:end]
+    return None
+
+
+def Operator(declaration):
+    """Return name of the operator in a declaration, e.g. 'A::operator<' of
+    'bool A::operator<(A const&) const', or None if it declares none. The
+    operator's own characters (e.g. '<' or '()') are not template brackets
+    or the parameter list."""
+    keyword = u"operator"
+    start = declaration.find(keyword)
+    while start != -1:
+        end = start + len(keyword)
+        if (start == 0 or declaration[start - 1] in u" *&:") and not (
+                end < len(declaration) and (declaration[end].isalnum() or declaration[end] == u"_")):
+            break
+        start = declaration.find(keyword,end)
+    if start == -1:
+        return None
+
+    end = start + len(keyword)
+    if declaration.startswith(u"()",end):
+        end += 2
+    end = declaration.find(u"(",end)
+    if end == -1:
+        return None
+    return declaration[NameStart(declaration,start):end].rstrip()
+
+
+def NameStart(declaration,end):
+    """Return start of the (qualified) name that ends at 'end'."""
+    start = end
+    nested = 0
+    while start > 0:
+        previous = declaration[start - 1]
+        if previous == ">":
+            nested += 1
+        elif previous == "<":
+            nested -= 1
+        elif nested == 0 and previous in " *&(":
+            break
+        start -= 1
+    return start
+
+
+class ObjfileIndex:
+    """Functions and source files of one objfile, sorted by name."""
+
+    def __init__(self,names,files,file_ids,lines):
+        self.names = names          # function names, sorted
+        self.files = files          # full paths of source files, sorted
+        self.file_ids = file_ids    # per function: index in files, -1 if unknown
+        self.lines = lines          # per function: line of its definition, 0 if unknown
+        self.basenames = sorted(set(os.path.basename(filename) for filename in files))
+
+    @classmethod
+    def Create(cls,functions,files):
+        """Create index of {name: (full path,line)} and source files."""
+        files = sorted(set(files))
+        ids = { filename: index for index,filename in enumerate(files) }
+        names = sorted(functions)
+        file_ids = array.array("i",( ids.get(functions[name][0],-1) for name in names ))
+        lines = array.array("i",( functions[name][1] for name in names ))
+        return cls(names,files,file_ids,lines)
+
+    @classmethod
+    def Load(cls,path):
+        """Read index from file, or return None if it is missing or invalid."""
+        try:
+            with open(path,"rb") as stream:
+                data = stream.read()
+            magic,functions,count,names_size,files_size = HEADER.unpack_from(data,0)
+            if magic != MAGIC:
+                return None
+            offset = HEADER.size
+            names = data[offset:offset + names_size].decode("utf-8").split(u"\n") if functions else []
+            offset += names_size
+            files = data[offset:offset + files_size].decode("utf-8").split(u"\n") if count else []
+            offset += files_size
+            column = struct.Struct("<{0}i".format(functions))
+            file_ids = array.array("i",column.unpack_from(data,offset))
+            lines = array.array("i",column.unpack_from(data,offset + column.size))
+        except (IOError, OSError, struct.error, UnicodeDecodeError, ValueError):
+            return None
+        if len(names) != functions or len(files) != count or len(lines) != functions:
+            return None
+        return cls(names,files,file_ids,lines)
+
+    def Save(self,path):
+        """Write index to file, atomically."""
+        names = u"\n".join(self.names).encode("utf-8")
+        files = u"\n".join(self.files).encode("utf-8")
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        temporary = "{0}.{1}".format(path,os.getpid())
+        with open(temporary,"wb") as stream:
+            stream.write(HEADER.pack(MAGIC,len(self.names),len(self.files),len(names),len(files)))
+            stream.write(names)
+            stream.write(files)
+            column = struct.Struct("<{0}i".format(len(self.names)))
+            stream.write(column.pack(*self.file_ids))
+            stream.write(column.pack(*self.lines))
+        os.rename(temporary,path)
+
+        # names and source files for completion in vim
+        with open(temporary,"wb") as stream:
+            stream.write(u"\n".join(self.names + self.basenames).encode("utf-8"))
+        os.rename(temporary,os.path.splitext(path)[0] + ".names")
+
+    def Lookup(self,name):
+        """Return full path,line of function 'name', or None."""
+        index = bisect.bisect_left(self.names,name)
+        if index == len(self.names) or self.names[index] != name or self.file_ids[index] < 0:
+            return None
+        return self.files[self.file_ids[index]],self.lines[index]
+
+    def Prefix(self,text,limit):
+        """Return up to 'limit' names and source files starting with 'text'."""
+        matches = []
+        for names in (self.names,self.basenames):
+            index = bisect.bisect_left(names,text)
+            while index < len(names) and len(matches) < limit and names[index].startswith(text):
+                matches.append(names[index])
+                index += 1
+        return matches
+
+    def Fuzzy(self,text,limit):
+        """Return up to 'limit' names that contain the characters of 'text'
+        in order. Each name is scanned once, finding one character after
+        the other."""
+        matches = []
+        for name in self.names:
+            position = 0
+            for character in text:
+                position = name.find(character,position) + 1
+                if position == 0:
+                    break
+            else:
+                matches.append(name)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+class SymbolIndex:
+    """Index of functions and source files per objfile, for 'vimgdb goto'
+    and its completion.
+
+    An index is built from 'info sources' and 'info functions' output, once
+    for all objfiles that lack one, and stored on disk under the build-id of
+    its objfile (see CacheDirectory()), so that later sessions on the same
+    binaries load it instead. Objfiles without build-id are indexed per
+    session only."""
+
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        """Forget all indexes."""
+        self.indexes = dict()   # objfile filename -> (build-id,ObjfileIndex)
+        self.missing = dict()
+        self.stale = True
+
+    def Stale(self):
+        """Check objfiles again at the next use (when objfiles change)."""
+        self.stale = True
+
+    def Objfiles(self):
+        """Return {filename: build-id} of the valid objfiles."""
+        import gdb
+        return { objfile.filename: getattr(objfile,"build_id",None)
+            for objfile in gdb.objfiles() if objfile.is_valid() and objfile.filename }
+
+    def Path(self,build_id):
+        return os.path.join(CacheDirectory(),"{0}.symbols".format(build_id))
+
+    def Load(self,build=False):
+        """Load stored indexes of new objfiles, and with 'build', index the
+        objfiles that have none. Return number of objfiles without index."""
+        if self.stale:
+            objfiles = self.Objfiles()
+            for filename in list(self.indexes):
+                if objfiles.get(filename,False) != self.indexes[filename][0]:
+                    del self.indexes[filename]
+
+            self.missing = dict()   # objfile filename -> build-id, of objfiles without index
+            for filename,build_id in objfiles.items():
+                if filename in self.indexes:
+                    continue
+                index = ObjfileIndex.Load(self.Path(build_id)) if build_id else None
+                if index != None:
+                    self.indexes[filename] = (build_id,index)
+                else:
+                    self.missing[filename] = build_id
+            self.stale = False
+
+        if build and self.missing:
+            self.Build(self.missing)
+            self.missing = dict()
+        return len(self.missing)
+
+    def Build(self,objfiles):
+        """Index objfiles {filename: build-id}, and store their indexes."""
+        import gdb
+        try:
+            sources = self.ParseSources(gdb.execute("info sources",to_string=True),objfiles)
+            functions = self.ParseFunctions(gdb.execute("info functions",to_string=True),sources)
+        except gdb.error as error:
+            raise VimgdbError("Cannot index symbols: {0}".format(str(error)))
+
+        for filename,build_id in objfiles.items():
+            index = ObjfileIndex.Create(functions.get(filename,dict()),sources.get(filename,()))
+            if build_id:
+                try:
+                    index.Save(self.Path(build_id))
+                except (IOError, OSError) as error:
+                    if settings.debug:
+                        print("Cannot store symbol index: {0}".format(str(error)))
+            self.indexes[filename] = (build_id,index)
+
+    def Main(self,objfiles):
+        """Return objfile of the program, to which files of unknown objfiles are attributed."""
+        import gdb
+        program = gdb.current_progspace().filename
+        if program in objfiles:
+            return program
+        return sorted(objfiles)[0]
+
+    def ParseSources(self,output,objfiles):
+        """Return {objfile: [full paths]} of the objfiles in {filename:
+        build-id} from 'info sources' output, which lists sources per objfile
+        since gdb 11, and all sources at once before."""
+        sources = dict()
+        objfile = self.Main(objfiles)
+        for row in output.splitlines():
+            row = row.strip()
+            if row.endswith(":"):
+                objfile = row[:-1] if row[:-1] in objfiles else self.Main(objfiles)
+            elif row and not row.startswith("("):
+                sources.setdefault(objfile,[]).extend(
+                    source for source in row.split(", ") if source)
+        return sources
+
+    def ParseFunctions(self,output,sources):
+        """Return {objfile: {name: (full path,line)}} from 'info functions'
+        output. Functions without debug info are skipped, 'vimgdb goto'
+        cannot show them."""
+        objfiles = dict()   # full path -> objfile
+        tails = dict()      # file name -> full paths
+        for objfile,files in sources.items():
+            for filename in files:
+                objfiles[filename] = objfile
+                tails.setdefault(os.path.basename(filename),[]).append(filename)
+
+        import re
+        file_row = re.compile(FILE_ROW)
+        function_row = re.compile(FUNCTION_ROW)
+        functions = dict()
+        fullsource = None
+        for row in output.splitlines():
+            match = file_row.match(row)
+            if match:
+                fullsource = self.Resolve(match.group(1),tails)
+                continue
+            if row.startswith("Non-debugging symbols:"):
+                break
+            match = function_row.match(row)
+            if match == None or fullsource == None:
+                continue
+            name = FunctionName(match.group(2))
+            if name != None:
+                functions.setdefault(objfiles[fullsource],dict())[name] = (
+                    fullsource,int(match.group(1) or 0))
+        return functions
+
+    def Resolve(self,source,tails):
+        """Return full path of source file as shown by 'info functions', or None."""
+        suffix = os.path.normpath(source)
+        while suffix.startswith("../"):
+            suffix = suffix[3:]
+        suffix = "/" + suffix
+        for fullsource in tails.get(os.path.basename(source),()):
+            if fullsource == source or fullsource.endswith(suffix):
+                return fullsource
+        return None
+
+    def Function(self,name):
+        """Return full path,line of function 'name' from the loaded indexes,
+        or None. The line is 0 if unknown."""
+        self.Load()
+        for build_id,index in self.indexes.values():
+            found = index.Lookup(name)
+            if found != None:
+                return found
+        return None
+
+    def Complete(self,text,limit=None):
+        """Return sorted names and source files starting with 'text', or if
+        there are none, names that match 'text' fuzzily. Indexes objfiles
+        that have none."""
+        self.Load(build=True)
+        limit = limit or settings.complete_limit
+        matches = set()
+        for build_id,index in self.indexes.values():
+            matches.update(index.Prefix(text,limit))
+        if not matches and text:
+            for build_id,index in self.indexes.values():
+                matches.update(index.Fuzzy(text,limit))
+        return sorted(matches)[:limit]
+
+    def NameFiles(self):
+        """Return paths of the stored name lists of the loaded indexes, for completion in vim."""
+        self.Load()
+        return sorted( os.path.splitext(self.Path(build_id))[0] + ".names"
+            for build_id,index in self.indexes.values() if build_id )
@@ -0,0 +1,147 @@
+from __future__ import print_function
+
+from .vimgdbexception import VimgdbError
+
+
+def ParseThreads(arg):
+    """Return set of thread numbers in a list like "1 3 10-20"."""
+    numbers = set()
+    for word in arg.replace(","," ").split():
+        first,_,last = word.partition("-")
+        if not first.isdigit() or not (last == "" or last.isdigit()):
+            raise VimgdbError("Invalid thread number '{0}'".format(word))
+        numbers.update(range(int(first),int(last or first) + 1))
+    return numbers
+
+
+class Threads:
+    """Locations of the stopped threads of the inferior, for per-thread
+    markers in vim.
+
+    Stops mark the threads that stopped (in non-stop mode, each stop event
+    names one thread) and only those are read again, and only pcs that
+    moved are resolved to lines (through the memoized Gdb.GetPcLocation).
+    Selecting another thread reads nothing: the markers are kept until the
+    threads run."""
+
+    def __init__(self,gdb):
+        self.gdb = gdb
+        self.filter = None      # thread numbers with markers, None for all
+        self.enabled = True
+        self.Clear()
+
+    def Clear(self):
+        """Forget all locations."""
+        self.pcs = dict()       # thread number -> pc of its innermost frame
+        self.locations = dict() # thread number -> (fullsource,line)
+        self.stopped = set()    # threads that stopped since the last Update
+        self.all_stopped = True
+        self.index = None
+
+    def Stopped(self,thread=None):
+        """Mark thread number 'thread' (or all threads) as stopped."""
+        if thread == None:
+            self.all_stopped = True
+        else:
+            self.stopped.add(thread)
+
+    def Running(self,thread):
+        """Remove marker of thread number 'thread', which continued (in
+        non-stop mode). In all-stop mode markers stay until the next stop,
+        like the current line."""
+        if thread in self.pcs:
+            del self.pcs[thread]
+            self.locations.pop(thread,None)
+            self.stopped.discard(thread)
+            self.index = None
+
+    def SetFilter(self,numbers):
+        """Show markers of thread numbers 'numbers' only, or of all threads if None."""
+        self.filter = numbers
+        self.Clear()
+
+    def Shown(self,number):
+        return self.enabled and (self.filter == None or number in self.filter)
+
+    def Update(self):
+        """Read pcs of the threads that stopped since the last update, and
+        resolve those that moved. Return True if any marker moved."""
+        import gdb
+        if not self.enabled or not (self.all_stopped or self.stopped):
+            return False
+
+        try:
+            threads = gdb.selected_inferior().threads()
+            selected = gdb.selected_thread()
+            frame = gdb.selected_frame() if selected != None else None
+        except gdb.error:
+            return False
+
+        numbers = set()
+        moved = switched = False
+        try:
+            for thread in threads:
+                number = thread.num
+                numbers.add(number)
+                if not self.Shown(number) or not (self.all_stopped or number in self.stopped):
+                    continue
+                if not thread.is_valid() or (hasattr(thread,"is_stopped") and not thread.is_stopped()):
+                    continue
+                if selected == None or number != selected.num:
+                    thread.switch()
+                    switched = True
+                try:
+                    pc = gdb.newest_frame().pc()
+                except gdb.error:
+                    continue
+                if self.pcs.get(number) == pc:
+                    continue
+                symtab,fullsource,source,line = self.gdb.GetPcLocation(pc)
+                self.pcs[number] = pc
+                if fullsource == None:
+                    self.locations.pop(number,None)
+                else:
+                    self.locations[number] = (fullsource,line)
+                moved = True
+        finally:
+            # switching threads selects their innermost frame, restore the user's frame
+            if switched and selected != None and selected.is_valid():
+                selected.switch()
+                if frame != None and frame.is_valid():
+                    frame.select()
+
+        for number in list(self.pcs):
+            if number not in numbers:
+                self.Running(number)
+                moved = True
+
+        self.stopped = set()
+        self.all_stopped = False
+        if moved:
+            self.index = None
+        return moved
+
+    def Lines(self,fullsource,exclude=None):
+        """Return lines of file with a marker, leaving out thread number
+        'exclude' (the selected thread, marked as current line)."""
+        if self.index == None:
+            self.index = dict()
+            for number,(location_fullsource,line) in self.locations.items():
+                lines = self.index.setdefault(location_fullsource,dict())
+                lines.setdefault(line,set()).add(number)
+
+        lines = self.index.get(fullsource)
+        if not lines:
+            return []
+        return [ line for line,numbers in lines.items() if len(numbers) > 1 or exclude not in numbers ]
+
+    def Describe(self):
+        """Return printable list of thread markers."""
+        if not self.enabled:
+            return "Thread markers are off"
+        text = ["Thread markers: {0}".format("all threads" if self.filter == None
+            else " ".join(str(number) for number in sorted(self.filter)))]
+        for number in sorted(self.locations):
+            fullsource,line = self.locations[number]
+            text.append("  Thread {0} at {1}:{2}".format(number,fullsource,line))
+        return "\n".join(text)
@@ -0,0 +1,198 @@
+from __future__ import print_function
+import array
+import struct
+import zlib
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+# file header: magic, entries, capacity, dropped entries, interned files
+HEADER = struct.Struct("<8sIIII")
+MAGIC = b"VIMGDBT1"
+
+# columns of an entry: name, array type, packed type
+COLUMNS = (
+    ("pcs","L","Q"),
+    ("files","i","i"),
+    ("lines","l","i"),
+    ("depths","l","i"),
+    ("threads","l","i"),
+)
+
+
+class Trace:
+    """Ring buffer of recorded stops, for replay without the inferior.
+
+    Every stop is stored as (pc, file id, line, frame depth, thread) in one
+    array per column; file paths are interned, so an entry costs a few dozen
+    bytes whatever the path length. Once full, the oldest stops are dropped."""
+
+    def __init__(self,size=None):
+        self.recording = False
+        self.Clear(size)
+
+    def Clear(self,size=None):
+        """Forget all stops, and resize to 'size' entries."""
+        self.size = max(1,size or settings.trace_size)
+        for name,typecode,_ in COLUMNS:
+            setattr(self,name,array.array(typecode,[0]) * self.size)
+        self.head = 0           # index of next write
+        self.count = 0
+        self.dropped = 0
+        self.names = []         # file id -> (fullsource,source)
+        self.ids = dict()       # fullsource -> file id
+        self.position = None    # index of the replayed stop
+
+    def Intern(self,fullsource,source):
+        """Return id of file path, or -1 without source."""
+        if fullsource == None:
+            return -1
+        file_id = self.ids.get(fullsource)
+        if file_id == None:
+            file_id = len(self.names)
+            self.names.append((fullsource,source))
+            self.ids[fullsource] = file_id
+        return file_id
+
+    def Record(self,pc,fullsource,source,line,depth,thread):
+        """Append a stop, overwriting the oldest one when full."""
+        head = self.head
+        self.pcs[head] = pc
+        self.files[head] = self.Intern(fullsource,source)
+        self.lines[head] = line or 0
+        self.depths[head] = depth
+        self.threads[head] = thread
+        self.head = (head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        else:
+            self.dropped += 1
+
+    def RecordStop(self,gdb):
+        """Record the selected frame of gdb interface 'gdb'. (Call from GNU Gdb)."""
+        stop = gdb.GetStop()
+        if stop != None:
+            self.Record(*stop)
+        return 0
+
+    def __len__(self):
+        return self.count
+
+    def Index(self,index):
+        """Return position in the arrays of the index-th oldest stop."""
+        return (self.head - self.count + index) % self.size
+
+    def Get(self,index):
+        """Return pc,fullsource,source,line,depth,thread of the index-th oldest stop."""
+        if index < 0 or index >= self.count:
+            raise VimgdbError("No recorded stop {0}".format(index))
+        position = self.Index(index)
+        file_id = self.files[position]
+        fullsource,source = self.names[file_id] if file_id >= 0 else (None,None)
+        return (self.pcs[position],fullsource,source,self.lines[position],
+                self.depths[position],self.threads[position])
+
+    def Start(self,size=None):
+        """Start recording a new trace."""
+        self.Clear(size)
+        self.recording = True
+
+    def Stop(self):
+        self.recording = False
+        self.position = None
+
+    def Seek(self,index):
+        """Make the index-th stop the replayed stop, and return it."""
+        if self.recording:
+            raise VimgdbError("Trace is recording, stop it first with 'vimgdb trace stop'")
+        if self.count == 0:
+            raise VimgdbError("Trace is empty, record one with 'vimgdb trace start'")
+        self.position = max(0,min(index,self.count - 1))
+        return self.Get(self.position)
+
+    def Move(self,steps):
+        """Move the replayed stop by 'steps' stops and return it. Replay
+        starts at the oldest stop going forward, and the newest going back."""
+        if self.position == None:
+            index = steps - 1 if steps > 0 else self.count + steps
+        else:
+            index = self.position + steps
+        return self.Seek(index)
+
+    def Describe(self,stop):
+        """Return printable line of stop at replay position."""
+        pc,fullsource,source,line,depth,thread = stop
+        where = "{0}:{1}".format(source,line) if fullsource != None else "(no source)"
+        return "[{0}/{1}] {2} pc 0x{3:x}, frame {4}, thread {5}".format(
+            self.position + 1,self.count,where,pc,depth,thread)
+
+    def Status(self):
+        """Return printable state of the trace."""
+        state = "recording" if self.recording else "stopped"
+        text = "Trace {0}: {1} stops in {2} files".format(state,self.count,len(self.names))
+        if self.dropped:
+            text += ", {0} oldest stops dropped".format(self.dropped)
+        if self.position != None:
+            text += ", replaying stop {0}".format(self.position + 1)
+        return text
+
+    def Save(self,filename):
+        """Write trace to a compact binary file."""
+        names = []
+        for fullsource,source in self.names:
+            for name in (fullsource,source):
+                data = name.encode("utf-8")
+                names.append(struct.pack("<I",len(data)) + data)
+
+        columns = []
+        for name,_,packed in COLUMNS:
+            column = getattr(self,name)
+            values = [ column[self.Index(index)] for index in range(self.count) ]
+            columns.append(struct.pack("<{0}{1}".format(self.count,packed),*values))
+
+        try:
+            with open(filename,"wb") as stream:
+                stream.write(HEADER.pack(MAGIC,self.count,self.size,self.dropped,len(self.names)))
+                stream.write(b"".join(names))
+                stream.write(zlib.compress(b"".join(columns)))
+        except (IOError, OSError) as error:
+            raise VimgdbError("Cannot write trace '{0}': {1}".format(filename,error.strerror))
+
+    def Load(self,filename):
+        """Read trace written by Save()."""
+        try:
+            with open(filename,"rb") as stream:
+                data = stream.read()
+        except (IOError, OSError) as error:
+            raise VimgdbError("Cannot read trace '{0}': {1}".format(filename,error.strerror))
+
+        try:
+            magic,count,size,dropped,files = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError()
+            offset = HEADER.size
+            names = []
+            for index in range(2 * files):
+                length, = struct.unpack_from("<I",data,offset)
+                offset += 4
+                names.append(data[offset:offset+length].decode("utf-8"))
+                offset += length
+            entries = zlib.decompress(data[offset:])
+            columns = []
+            offset = 0
+            for name,typecode,packed in COLUMNS:
+                column = struct.Struct("<{0}{1}".format(count,packed))
+                columns.append((name,array.array(typecode,column.unpack_from(entries,offset))))
+                offset += column.size
+        except (ValueError, struct.error, zlib.error, UnicodeDecodeError):
+            raise VimgdbError("'{0}' is not a vimgdb trace".format(filename))
+
+        self.Clear(max(size,count))
+        self.recording = False
+        for fullsource,source in zip(names[0::2],names[1::2]):
+            self.Intern(fullsource,source)
+        for name,values in columns:
+            getattr(self,name)[0:count] = values
+        self.count = count
+        self.head = count % self.size
+        self.dropped = dropped
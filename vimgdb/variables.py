@@ -0,0 +1,206 @@
+from __future__ import print_function
+import itertools
+
+from .vimgdbexception import VimgdbError
+from .settings import settings
+
+
+class Row:
+    """Row of the locals panel: a variable, watch expression or child value."""
+
+    def __init__(self,key,depth,name,text,expandable=False):
+        self.key = key                  # path identifying the value across stops
+        self.depth = depth
+        self.name = name
+        self.text = text
+        self.expandable = expandable
+
+    def Line(self,expanded):
+        if self.text == None:
+            return u"{0}{1}".format("  " * self.depth,self.name)
+        if not self.expandable:
+            marker = " "
+        elif self.key in expanded:
+            marker = "-"
+        else:
+            marker = "+"
+        return u"{0}{1} {2} = {3}".format("  " * self.depth,marker,self.name,
+                u" ".join(self.text.split("\n")))
+
+
+def Format(value):
+    """Return (text,children) of value, where children is a function
+    returning an iterator of (name,value), or None if value has no children.
+
+    Only a summary is formatted: aggregates are shown as {...}, and pretty
+    printers only through to_string(), so large values cost no more than
+    small ones until they are expanded."""
+    import gdb
+    printer = gdb.default_visualizer(value)
+    if printer != None:
+        text = printer.to_string() if hasattr(printer,"to_string") else None
+        if isinstance(text,gdb.Value):
+            text,_ = Format(text)
+        elif hasattr(text,"value"):
+            text = u"\"{0}\"".format(text.value().string(length=text.length))
+        elif text == None:
+            text = u"{...}"
+        children = None
+        if hasattr(printer,"children"):
+            children = lambda: iter(printer.children())
+        return u"{0}".format(text),children
+
+    value_type = value.type.strip_typedefs()
+    if value_type.code in (gdb.TYPE_CODE_STRUCT,gdb.TYPE_CODE_UNION):
+        def Fields():
+            for field in value_type.fields():
+                if field.is_base_class:
+                    yield field.type.name or "<base>",value.cast(field.type)
+                elif field.name:
+                    yield field.name,value[field.name]
+        return u"{...}",Fields
+    elif value_type.code == gdb.TYPE_CODE_ARRAY:
+        low,high = value_type.range()
+        return u"[{0}]".format(high - low + 1),lambda: ( ("[{0}]".format(index),value[index])
+                for index in range(low,high + 1) )
+    return u"{0}".format(value),None
+
+
+class Variables:
+    """Locals, arguments and watch expressions of the selected frame, as
+    rows of the locals panel.
+
+    Rendered values are kept between stops, so only rows whose text changed
+    are sent to vim and highlighted. Aggregates are collapsed until they are
+    expanded, and expand to at most settings.watch_children children."""
+
+    def __init__(self):
+        self.watches = []
+        self.expanded = set()
+        self.limits = dict()            # key -> number of children shown
+        self.Clear()
+
+    def Clear(self):
+        """Forget what is shown in vim."""
+        self.rows = []
+        self.lines = []
+        self.frame = None
+        self.generation = None
+        self.previous = dict()          # key -> text at the previous stop
+
+    def Watch(self,expression):
+        if expression not in self.watches:
+            self.watches.append(expression)
+
+    def Unwatch(self,number):
+        if number < 1 or number > len(self.watches):
+            raise VimgdbError("No watch {0}".format(number))
+        del self.watches[number - 1]
+
+    def Toggle(self,index):
+        """Expand or collapse row 'index', or show more children. Return True
+        if the rows must be rebuilt."""
+        if index < 0 or index >= len(self.rows):
+            return False
+        row = self.rows[index]
+        if row.key == None:
+            return False
+        if row.key[-1] == "...":
+            parent = row.key[:-1]
+            self.limits[parent] = self.limits.get(parent,settings.watch_children) * 2
+        elif row.expandable:
+            if row.key in self.expanded:
+                self.expanded.discard(row.key)
+            else:
+                self.expanded.add(row.key)
+        else:
+            return False
+        return True
+
+    def Build(self,frame):
+        """Return rows of the arguments, locals and watches of gdb frame 'frame'."""
+        import gdb
+        arguments,variables = [],[]
+        seen = set()
+        try:
+            block = frame.block()
+        except RuntimeError:
+            block = None
+        while block != None:
+            for symbol in block:
+                if symbol.name in seen or not (symbol.is_argument or symbol.is_variable):
+                    continue
+                seen.add(symbol.name)
+                (arguments if symbol.is_argument else variables).append(symbol)
+            if block.function != None:
+                break
+            block = block.superblock
+
+        rows = []
+        for title,section,symbols in (("Arguments:","argument",arguments),("Locals:","local",variables)):
+            if symbols:
+                rows.append(Row(None,0,title,None))
+                for symbol in symbols:
+                    self.AddRows(rows,(section,symbol.name),0,symbol.name,
+                            lambda symbol=symbol: frame.read_var(symbol))
+
+        if self.watches:
+            rows.append(Row(None,0,"Watches:",None))
+            for number,expression in enumerate(self.watches):
+                self.AddRows(rows,("watch",expression),0,
+                        u"{0}: {1}".format(number + 1,expression),
+                        lambda expression=expression: gdb.parse_and_eval(expression))
+
+        if not rows:
+            rows.append(Row(None,0,"No arguments, locals or watches",None))
+        return rows
+
+    def AddRows(self,rows,key,depth,name,read):
+        """Add row of a value (read by calling 'read'), and its children if expanded."""
+        import gdb
+        try:
+            value = read()
+            text,children = Format(value)
+        except (gdb.error, gdb.MemoryError, RuntimeError) as error:
+            text,children = u"<{0}>".format(error),None
+        rows.append(Row(key,depth,name,text,children != None))
+
+        if children != None and key in self.expanded:
+            limit = self.limits.get(key,settings.watch_children)
+            try:
+                for index,(child,child_value) in enumerate(itertools.islice(children(),limit + 1)):
+                    if index == limit:
+                        rows.append(Row(key + ("...",),depth + 1,"  ...",None))
+                        break
+                    self.AddRows(rows,key + (child,),depth + 1,child,lambda value=child_value: value)
+            except (gdb.error, gdb.MemoryError, RuntimeError) as error:
+                rows.append(Row(key + ("<error>",),depth + 1,"<error>",u"{0}".format(error)))
+
+    def Update(self,frame,generation):
+        """Build rows of frame, and return (first,lines,changed): panel lines
+        from line 'first' on, or {line: text} of changed lines if first is
+        None, and the line numbers of values that changed since the
+        previous stop (stack generation) in the same frame."""
+        if frame != self.frame:
+            self.previous = dict()
+        elif generation != self.generation:
+            self.previous = { row.key: row.text for row in self.rows if row.key != None }
+
+        rows = self.Build(frame)
+        lines = [ row.Line(self.expanded) for row in rows ]
+        changed = [ index + 1 for index,row in enumerate(rows)
+                if row.key in self.previous and self.previous[row.key] != row.text ]
+
+        if len(lines) == len(self.lines):
+            update = None,{ index + 1: line for index,line in enumerate(lines) if line != self.lines[index] }
+        else:
+            first = 0
+            while first < min(len(lines),len(self.lines)) and lines[first] == self.lines[first]:
+                first += 1
+            update = first + 1,lines[first:]
+
+        self.rows = rows
+        self.lines = lines
+        self.frame = frame
+        self.generation = generation
+        return update + (changed,)
@@ -1,81 +1,279 @@
 from __future__ import print_function
+import os
+
 from .viminterface import Vim
 from .gdbinterface import Gdb
+from .variables import Variables
+from .memory import Memory
 from .vimgdbexception import VimgdbError
 from .settings import settings
 from .version import Version
+from .stats import stats
 
 class Vimgdb:
 
     def __init__(self):
-        self.vim = Vim()
+        self.vim = self.Editor(settings.editor)
         self.gdb = Gdb()
+        self.stack_panel = False
+        self.locals_panel = False
+        self.disassembly_panel = False
+        self.memory_panel = False
+        self.variables = Variables()
+        self.memory = Memory()
         self.Clear()
 
     def Version(self):
         """Return current vimgdb version."""
         return Version()
 
+    def Editor(self,name):
+        """Return interface to editor 'name', "vim" or "nvim"."""
+        if name == "vim":
+            return Vim()
+        elif name == "nvim":
+            from .nviminterface import Neovim
+            return Neovim()
+        raise VimgdbError("Unknown editor '{0}'".format(name))
+
+    def UseEditor(self,name):
+        """Switch to editor 'name', also for the gdb started by StartGdb."""
+        if name != settings.editor:
+            servername = self.vim.servername
+            self.vim = self.Editor(name)
+            self.vim.servername = servername
+            settings.editor = name
+        os.environ["VIMGDB_EDITOR"] = name
+
     def StartVim(self,args=[]):
         """Start vim as a server, if it is not already started."""
-        if not self.vim.IsRunning():
+        if not self.vim.IsRunning(discover=False):
             self.vim.Start(args)
         else:
             raise VimgdbError("Vim server already started.")
 
     def StartGdb(self,args=[]):
         """Start gdb."""
+        os.environ["VIMGDB_SERVERNAME"] = self.vim.servername
         self.gdb.Start(args)
 
-    def Running(self):
+    def SelectServer(self,args,new=False):
+        """Select vim server with '--servername <name>' (a neovim server with
+        '--nvim'), and return remaining arguments.
+
+        Without '--servername', a free name is picked for a new server, or the
+        only running vimgdb server is used."""
+        args = list(args)
+        if "--nvim" in args:
+            args.remove("--nvim")
+            self.UseEditor("nvim")
+
+        if "--servername" in args:
+            index = args.index("--servername")
+            if index + 1 >= len(args):
+                raise VimgdbError("Option '--servername' requires a name")
+            self.vim.servername = args[index+1]
+            del args[index:index+2]
+        elif "VIMGDB_SERVERNAME" in os.environ:
+            pass
+        elif new:
+            self.vim.servername = self.vim.FreeServername()
+        else:
+            servers = self.vim.GetVimgdbServers()
+            if len(servers) > 1:
+                raise VimgdbError("Multiple vim servers running ({0}), select one with '--servername <name>'.".format(
+                    ", ".join(servers)))
+            elif len(servers) == 1:
+                self.vim.servername = servers[0]
+
+        # connect to a neovim server without --nvim
+        if not new and settings.editor == "vim":
+            from .nviminterface import SocketPath
+            if os.path.exists(SocketPath(self.vim.servername)):
+                self.UseEditor("nvim")
+        return args
+
+    def Running(self,discover=True):
         """Check if vim server is running."""
-        return self.vim.IsRunning()
+        return self.vim.IsRunning(discover)
 
     def Disable(self):
         """Remove vimgdb interface layer from vim session. (Call from GNU Gdb)."""
         self.vim.NewCommand()
         self.vim.DisableSignColumns()
         ret = self.vim.RunCommand()
+        self.vim.Close()
         self.Clear()
         return ret
 
     def Kill(self):
         """Remove current line of execution highlighting. (Call from GNU Gdb)."""
+        self.cle = None
+        self.gdb.threads.Clear()
         self.vim.NewCommand()
-        self.vim.RemoveCle()
+        self.vim.SyncSigns(self.Signs())
         ret = self.vim.RunCommand()
         return ret
 
+    def ShowProfile(self,profile,limit=100):
+        """Show heat of sampled lines as signs, and the hottest lines in the
+        quickfix list, in one batch. (Call from GNU Gdb)."""
+        self.vim.NewCommand()
+        self.vim.SetQuickfix("vimgdb profile",[
+            (fullsource,line,"{0} samples ({1:.1f}%)".format(count,profile.Percent(count)))
+            for count,fullsource,source,line in profile.lines[:limit] ])
+        self.vim.PlaceHeatSigns(profile.Heat())
+        return self.vim.RunCommand()
+
+    def ClearProfile(self):
+        """Remove heat signs. (Call from GNU Gdb)."""
+        self.vim.NewCommand()
+        self.vim.ClearHeatSigns()
+        return self.vim.RunCommand()
+
+    def ShowSymbols(self):
+        """Index the symbols of all objfiles, and give vim their names for
+        completion. (Call from GNU Gdb)."""
+        symbols = self.gdb.symbols
+        symbols.Load(build=True)
+        print("Indexed {0} functions in {1} files of {2} objfiles".format(
+            sum(len(index.names) for build_id,index in symbols.indexes.values()),
+            sum(len(index.files) for build_id,index in symbols.indexes.values()),
+            len(symbols.indexes)))
+        self.vim.NewCommand()
+        self.Symbols()
+        return self.vim.RunCommand()
+
+    def ShowValue(self,text,balloon=False):
+        """Show value of an expression that vim asked for at its cursor. (Call from GNU Gdb)."""
+        lines = text.splitlines() or [u""]
+        if len(lines) > settings.popup_lines:
+            lines = lines[:settings.popup_lines] + [u"..."]
+        self.vim.NewCommand()
+        self.vim.Popup(lines,balloon)
+        return self.vim.RunCommand()
+
+    def SessionState(self):
+        """Return files with signs {full path: source}, and the location shown
+        (full path,source,line) or None, to save with a session."""
+        current = [self.fullsource,self.source,self.line] if self.fullsource != None else None
+        return dict(self.files),current
+
+    def RestoreFiles(self,files):
+        """Place signs in the files {full path: source} of a saved session too."""
+        self.files.update(files)
+
+    def Symbols(self):
+        """Add command giving vim the name lists of the symbol indexes, when they changed."""
+        files = self.gdb.symbols.NameFiles()
+        if files != (self.symbols_sent or []):
+            self.vim.Symbols(files)
+            self.symbols_sent = files
+
+    def Counts(self):
+        """Add commands showing the hit counts that changed, in the files opened in vim."""
+        counters = self.gdb.counters
+        clear = self.counts_sent == None
+        if clear:
+            self.counts_sent = dict()
+        for fullsource in self.files:
+            if fullsource not in counters.changed and fullsource in self.counts_sent:
+                continue
+            lines = counters.Lines(fullsource)
+            sent = self.counts_sent.get(fullsource,{})
+            changed = { line: hits for line,hits in lines.items() if sent.get(line) != hits }
+            changed.update( (line,0) for line in sent if line not in lines )
+            if changed:
+                self.vim.Counts(fullsource,changed,clear)
+            self.counts_sent[fullsource] = lines
+            counters.changed.discard(fullsource)
+
+    def ShowCounts(self):
+        """Show the hit counts that changed in vim. (Call from GNU Gdb)."""
+        self.vim.NewCommand()
+        self.Counts()
+        return self.vim.RunCommand()
+
     def Clear(self):
         """Clear. (Call from GNU Gdb)."""
         self.line = None
         self.source = None
         self.fullsource = None
-        self.breakpoints = set()
+        self.files = dict()
+        self.cle = None
+        self.vim.ForgetSigns()
 
-    def UpdateFile(self,fullsource,line=None):
-        self.vim.GotoFile(fullsource,line)
-        self.vim.InitSignColumn(fullsource)
+        # state of the stack panel in vim
+        self.stack_generation = None
+        self.stack_rows = 0
+        self.stack_level = None
 
-    def UpdateBreakpoints(self,
-            source,
-            update_all,
-            modify_breakpoint=None,
-            delete_breakpoint=None):
+        # state of the locals panel in vim
+        self.variables.Clear()
+        self.locals_shown = None
 
-        breakpoints,enabled,update_breakline = self.gdb.GetBreakpoints(
-                source,delete_breakpoint,modify_breakpoint)
+        # state of the disassembly panel in vim
+        self.disassembly_shown = None
+        self.disassembly_row = None
 
-        if update_all:
-            self.vim.UpdateBreakpoints(breakpoints,enabled)
-        else:
-            add_breakpoints = breakpoints - self.breakpoints
-            if update_breakline != None:
-                add_breakpoints.add(update_breakline)
-            remove_breakpoints = self.breakpoints - breakpoints
-            self.vim.UpdateBreakpoints(add_breakpoints,enabled,remove_breakpoints)
+        # state of the memory panel in vim
+        self.memory.Forget()
+
+        # ask vim what it shows before the next update, see Reconcile()
+        self.resync = False
 
-        return breakpoints
+        # stack generation whose caller sources were prefetched, see Prefetch()
+        self.prefetched = None
+
+        # name lists of symbol indexes known by vim, see Symbols()
+        self.symbols_sent = None
+
+        # hit counts shown in vim, see Counts()
+        self.counts_sent = None
+
+    def Reconcile(self):
+        """Adopt the signs that vim actually shows in the files vimgdb
+        opened, so that the next update only sends corrections, and redraw
+        the panels. Return True if vim shows another file than vimgdb
+        assumes. Falls back to Clear() if vim cannot be asked."""
+        self.resync = False
+        files = set(self.files) | set(self.vim.signs) | self.vim.unknown
+        try:
+            with stats.Timer("reconcile"):
+                current,placed = self.vim.Placed(files)
+        except Exception as error:
+            if settings.debug:
+                print("Vimgdb reconcile failed: {0}".format(str(error)))
+            self.Clear()
+            return True
+
+        self.vim.AdoptSigns(placed)
+        self.stack_generation = None
+        self.stack_rows = 0
+        self.stack_level = None
+        self.variables.Clear()
+        self.locals_shown = None
+        self.disassembly_shown = None
+        self.disassembly_row = None
+        self.memory.Forget()
+        self.symbols_sent = None
+        self.counts_sent = None
+        return current != self.fullsource
+
+    def Signs(self):
+        """Return signs of all files opened in vim: {file: {sign id: (line,sign type)}}."""
+        signs = dict()
+        threads = self.gdb.threads if self.cle != None else None
+        selected = self.gdb.SelectedThread() if threads != None else None
+        for fullsource,source in self.files.items():
+            if self.cle != None and self.cle[0] == fullsource:
+                cle_line = self.cle[1]
+            else:
+                cle_line = None
+            thread_lines = threads.Lines(fullsource,selected) if threads != None else ()
+            breakpoints = self.gdb.GetBreakpoints(fullsource,source)
+            signs[fullsource] = self.vim.FileSigns(breakpoints,cle_line,thread_lines)
+        return signs
 
     def Update(self,
             force=False,
@@ -83,75 +281,362 @@ class Vimgdb:
             update_cle=True,
             update_breakpoint=False,
             goto_line=True,
-            modify_breakpoint=None,
-            delete_breakpoint=None,
             location=None):
         """Update breakpoints and highlighting in vim. (Call from GNU Gdb)."""
+        with stats.Timer("update"):
+            if self.resync:
+                update_file = self.Reconcile() or update_file
+            ret = self.UpdatePhases(force,update_file,update_cle,update_breakpoint,goto_line,location)
+        stats.Trace("update",ret=ret)
+        return ret
 
-        # only update during execution
-        is_running = self.gdb.IsRunning()
-        if not (is_running or force):
-            return 0
+    def UpdatePhases(self,force,update_file,update_cle,update_breakpoint,goto_line,location):
+        with stats.Timer("gdb"):
+            # only update during execution
+            is_running = self.gdb.IsRunning()
+            if not is_running and (self.disassembly_panel or self.memory_panel) and location == None and not update_breakpoint:
+                # without line info, only the panels can show the selected frame
+                try:
+                    level = self.gdb.stack.Level()
+                except VimgdbError:
+                    level = None
+                if level != None:
+                    return self.ShowPanels(level)
+            if not (is_running or force):
+                return 0
 
-        # get current location in gdb or vim
-        if update_breakpoint:
-            if self.fullsource != None:
-                # use location opened in vim
-                fullsource = self.fullsource
-                source = self.source
-                line = self.line
+            # get current location in gdb or vim
+            if update_breakpoint:
+                if self.fullsource != None:
+                    # use location opened in vim
+                    fullsource = self.fullsource
+                    source = self.source
+                    line = self.line
+                else:
+                    return 0
             else:
-                return 0
+                fullsource,source,line = self.gdb.GetLocation(location)
+
+            # highlight current line of execution
+            if update_cle:
+                if is_running:
+                    cle_fullsource,cle_source,cle_line = self.gdb.GetLocation()
+                    self.cle = cle_fullsource,cle_line
+                    self.gdb.threads.Update()
+                else:
+                    self.cle = None
+
+            # get last known open file in vim
+            update_file = self.fullsource != fullsource or update_file
+            self.files[fullsource] = source
+            signs = self.Signs()
+
+            # frame to mark in the stack panel
+            level = None
+            if (self.stack_panel or self.locals_panel or self.disassembly_panel or self.memory_panel) and is_running:
+                level = self.gdb.stack.Level()
+
+        stats.Count("updates")
+        ret = self.Show(fullsource,source,line,signs,update_file,goto_line,level)
+        if is_running:
+            self.SchedulePrefetch()
+        return ret
+
+    def SchedulePrefetch(self):
+        """Prefetch the source files of the callers once gdb is idle, once per stop."""
+        import gdb
+        generation = self.gdb.stack.generation
+        if settings.prefetch_frames > 0 and generation != self.prefetched:
+            self.prefetched = generation
+            gdb.post_event(lambda: self.Prefetch(generation))
+
+    def Prefetch(self,generation):
+        """Load the source files of the callers of the selected frame in vim,
+        and place their signs, so that moving up the stack or returning to
+        them does not load them. Skipped if the stack changed since stop
+        'generation'. (Runs as gdb event)."""
+        stack = self.gdb.stack
+        stack.Thread()
+        if generation != stack.generation or not self.gdb.IsRunning():
+            return 0
+
+        files = dict()
+        for pc,function,fullsource,source,line in stack.rows[1:stack.Unwind(settings.prefetch_frames)]:
+            if fullsource != None and fullsource not in self.vim.buffers:
+                files[fullsource] = source
+        if not files:
+            return 0
+
+        self.files.update(files)
+        self.vim.NewCommand()
+        self.vim.Prefetch(sorted(files))
+        self.vim.SyncSigns(self.Signs())
+        return self.vim.RunCommand()
+
+    def Replay(self,fullsource,source,line):
+        """Show a recorded location as current line of execution, without
+        querying the inferior. (Call from GNU Gdb)."""
+        self.cle = fullsource,line
+        self.files[fullsource] = source
+        signs = self.Signs()
+        return self.Show(fullsource,source,line,signs,self.fullsource != fullsource,True)
+
+    def ShowFrame(self,level=None):
+        """Show the selected frame, or select and show frame 'level', from
+        the cached backtrace: a lookup and a sign move. (Call from GNU Gdb)."""
+        stack = self.gdb.stack
+        if level == None:
+            level = stack.Level()
         else:
-            fullsource,source,line = self.gdb.GetLocation(location)
+            stack.Select(level)
 
-        # get last known open file in vim
-        update_file = self.fullsource != fullsource or update_file
+        pc,function,fullsource,source,line = stack.Row(level)
+        if fullsource == None:
+            return self.ShowPanels(level)
 
+        self.cle = fullsource,line
+        self.files[fullsource] = source
+        signs = self.Signs()
+        return self.Show(fullsource,source,line,signs,self.fullsource != fullsource,True,level)
 
-        # create new series of vim commands
-        ret = 0
+    def ShowPanels(self,level):
+        """Show frame 'level', which has no source, in the panels only."""
+        self.cle = None
         self.vim.NewCommand()
+        self.vim.SyncSigns(self.Signs())
+        self.StackPanel(level)
+        self.LocalsPanel(level)
+        self.DisassemblyPanel(level)
+        self.MemoryPanel()
+        return self.vim.RunCommand()
 
-        # update file open in vim [and go to line]
-        if update_file:
-            if goto_line:
-                self.UpdateFile(fullsource,line)
-            else:
-                self.UpdateFile(fullsource)
+    def ShowStack(self,more=False):
+        """Open the stack panel, or show the next page of frames in it. (Call from GNU Gdb)."""
+        stack = self.gdb.stack
+        level = stack.Level()
+        if not self.stack_panel:
+            self.stack_panel = True
+            self.stack_generation = None
+        rows = stack.Page(self.stack_rows) if more and self.stack_generation == stack.generation else None
+        self.vim.NewCommand()
+        self.StackPanel(level,rows)
+        return self.vim.RunCommand()
+
+    def CloseStack(self):
+        """Close the stack panel. (Call from GNU Gdb)."""
+        self.stack_panel = False
+        self.stack_generation = None
+        self.vim.NewCommand()
+        self.vim.ClosePanel(self.StackPanelName())
+        return self.vim.RunCommand()
+
+    def StackPanelName(self):
+        return u"vimgdb-stack-{0}".format(self.vim.session)
+
+    def StackPanel(self,level,rows=None):
+        """Add commands bringing the stack panel (if open) up to date: show the
+        first page of a new backtrace, at least 'rows' frames and frame
+        'level', and mark frame 'level'. Only frames not yet shown are sent."""
+        if not self.stack_panel:
+            return
+        stack = self.gdb.stack
+        name = self.StackPanelName()
+        if self.stack_generation != stack.generation:
+            self.stack_generation = stack.generation
+            self.stack_rows = 0
+            self.stack_level = None
+
+        rows = max(rows or 0,stack.Page(level),settings.stack_page if self.stack_rows == 0 else 0)
+        if rows > self.stack_rows and (self.stack_rows < len(stack.frames) or not stack.complete):
+            stack.Unwind(rows)
+            shown = min(rows,len(stack.frames))
+            lines = [ stack.Describe(frame) for frame in range(self.stack_rows,shown) ]
+            if shown < len(stack.frames) or not stack.complete:
+                lines.append(u"-- more --")
+            self.vim.Panel(name,lines,self.stack_rows + 1,"frame")
+            self.stack_rows = shown
+            self.stack_level = None
+
+        if level != self.stack_level:
+            self.vim.PanelMark(name,level + 1)
+            self.stack_level = level
+
+    def ShowLocals(self,refresh=False):
+        """Open the locals panel, or refresh it. (Call from GNU Gdb)."""
+        level = self.gdb.stack.Level()
+        self.locals_panel = True
+        self.locals_shown = None
+        if not refresh:
+            self.variables.Clear()
+        self.vim.NewCommand()
+        self.LocalsPanel(level)
+        return self.vim.RunCommand()
+
+    def CloseLocals(self):
+        """Close the locals panel. (Call from GNU Gdb)."""
+        self.locals_panel = False
+        self.variables.Clear()
+        self.vim.NewCommand()
+        self.vim.ClosePanel(self.LocalsPanelName())
+        return self.vim.RunCommand()
+
+    def ToggleLocal(self,index):
+        """Expand or collapse row 'index' of the locals panel. (Call from GNU Gdb)."""
+        if self.variables.Toggle(index):
+            return self.ShowLocals(refresh=True)
+        return 0
+
+    def LocalsPanelName(self):
+        return u"vimgdb-locals-{0}".format(self.vim.session)
+
+    def LocalsPanel(self,level):
+        """Add commands bringing the locals panel (if open) up to date with
+        frame 'level': only changed rows are sent, and highlighted."""
+        if not self.locals_panel:
+            return
+        stack = self.gdb.stack
+        if self.locals_shown == (stack.generation,level):
+            return
+
+        stack.Row(level)
+        first,lines,changed = self.variables.Update(stack.frames[level],stack.generation)
+        name = self.LocalsPanelName()
+        if first != None:
+            self.vim.Panel(name,lines,first,"locals")
+        elif lines:
+            self.vim.PanelLines(name,lines)
+        self.vim.PanelHighlight(name,changed)
+        self.locals_shown = (stack.generation,level)
+
+    def ShowDisassembly(self):
+        """Open the disassembly panel. (Call from GNU Gdb)."""
+        level = self.gdb.stack.Level()
+        self.disassembly_panel = True
+        self.disassembly_shown = None
+        self.vim.NewCommand()
+        self.DisassemblyPanel(level)
+        return self.vim.RunCommand()
+
+    def CloseDisassembly(self):
+        """Close the disassembly panel. (Call from GNU Gdb)."""
+        self.disassembly_panel = False
+        self.disassembly_shown = None
+        self.vim.NewCommand()
+        self.vim.ClosePanel(self.DisassemblyPanelName())
+        return self.vim.RunCommand()
+
+    def DisassemblyPanelName(self):
+        return u"vimgdb-disassembly-{0}".format(self.vim.session)
+
+    def DisassemblyPanel(self,level):
+        """Add commands bringing the disassembly panel (if open) up to date
+        with frame 'level': the function is only sent when it is not shown
+        yet, otherwise only the marker of the instruction moves."""
+        if not self.disassembly_panel:
+            return
+        stack = self.gdb.stack
+        pc = stack.Row(level)[0]
+        disassembly = self.gdb.disassembly
+        listing = disassembly.Lookup(pc,stack.frames[level].architecture())
+
+        name = self.DisassemblyPanelName()
+        if self.disassembly_shown != (disassembly.generation,listing.start):
+            self.vim.Panel(name,listing.lines)
+            self.disassembly_shown = (disassembly.generation,listing.start)
+            self.disassembly_row = None
+
+        row = listing.rows.get(pc)
+        if row != None and row != self.disassembly_row:
+            self.vim.PanelMark(name,row)
+            self.disassembly_row = row
+
+    def ShowMemory(self,address,length):
+        """Open the memory panel on 'length' bytes from 'address'. (Call from GNU Gdb)."""
+        self.memory.Open(address,length)
+        self.memory.Stopped(self.gdb.stack.generation)
+        self.memory_panel = True
+        name = self.MemoryPanelName()
+        self.vim.NewCommand()
+        self.MemoryPanel()
+        self.vim.PanelHighlight(name,[])
+        self.vim.PanelScroll(name,"memory",self.memory.Lines())
+        return self.vim.RunCommand()
+
+    def ScrollMemory(self,first,last=None):
+        """Show lines 'first' to 'last' (from 0) of the memory panel, which
+        vim scrolled to. (Call from GNU Gdb)."""
+        if not self.memory_panel:
+            return 0
+        self.memory.View(first,last if last != None else first)
+        self.vim.NewCommand()
+        self.MemoryPanel()
+        return self.vim.RunCommand()
+
+    def CloseMemory(self):
+        """Close the memory panel. (Call from GNU Gdb)."""
+        self.memory_panel = False
+        self.memory.Clear()
+        self.vim.NewCommand()
+        self.vim.ClosePanel(self.MemoryPanelName())
+        return self.vim.RunCommand()
 
-            ret = self.vim.RunCommand()
+    def MemoryPanelName(self):
+        return u"vimgdb-memory-{0}".format(self.vim.session)
+
+    def MemoryPanel(self):
+        """Add commands bringing the memory panel (if open) up to date: pages
+        that came into view are appended, and after a stop, lines in view
+        that changed are replaced and highlighted."""
+        if not self.memory_panel:
+            return
+        self.memory.Stopped(self.gdb.stack.generation)
+        first,appended,changed,highlight = self.memory.Update()
+        name = self.MemoryPanelName()
+        if appended:
+            self.vim.Panel(name,appended,first,"memory")
+        if changed:
+            self.vim.PanelLines(name,changed)
+        if highlight != None:
+            self.vim.PanelHighlight(name,highlight)
+
+    def Show(self,fullsource,source,line,signs,update_file,goto_line,level=None):
+        """Open location in vim and place signs, and show frame 'level' in the
+        stack, locals and disassembly panels, and the memory panel."""
+        with stats.Timer("build"):
+            # create new series of vim commands
             self.vim.NewCommand()
-        elif goto_line:
-            self.vim.GotoLine(line)
-
-        # update breakpoints
-        breakpoints = self.UpdateBreakpoints(source,update_file,modify_breakpoint,delete_breakpoint)
-
-        # highlight current line of execution
-        if update_cle:
-            if is_running:
-                cle_fullsource,cle_source,cle_line = self.gdb.GetLocation()
-                if cle_fullsource == fullsource:
-                    self.vim.Cle(cle_line)
+
+            # update file open in vim [and go to line]
+            if update_file:
+                if goto_line:
+                    self.vim.GotoFile(fullsource,line)
                 else:
-                    self.vim.RemoveCle()
-            else:
-                self.vim.RemoveCle()
+                    self.vim.GotoFile(fullsource)
+            elif goto_line:
+                self.vim.GotoLine(line)
+
+            self.Symbols()
+            self.Counts()
+
+        with stats.Timer("diff"):
+            # place, move and remove signs in all open files
+            self.vim.SyncSigns(signs)
+
+        if level != None:
+            self.StackPanel(level)
+            self.LocalsPanel(level)
+            self.DisassemblyPanel(level)
+            self.MemoryPanel()
 
         # execute commands in vim
-        ret = self.vim.RunCommand() + ret
+        ret = self.vim.RunCommand()
 
         # store vim state
         if ret != 0:
-            self.Clear()
+            self.resync = True
         elif update_file:
             self.line = line
             self.source = source
             self.fullsource = fullsource
-            self.breakpoints = breakpoints
-        else:
-            self.breakpoints = breakpoints
 
         return ret
-
@@ -1,36 +1,373 @@
 from __future__ import print_function
-import subprocess
+import time
 import os
 
 from .vimgdbexception import VimgdbError
 from .settings import settings
+from .stats import stats
+from .startup import startup
+from .gdbthread import StartThread
+
+# priority of sign types placed with a non-default priority
+PRIORITIES = {
+    "VimgdbThreadSign": 5,
+    "VimgdbHeat1": 5,
+    "VimgdbHeat2": 5,
+    "VimgdbHeat3": 5,
+    "VimgdbHeat4": 5,
+    "VimgdbHeat5": 5,
+}
+
 
 def IsTextfile(filename):
-    """Check if a file is a text file."""
-    import mimetypes
-    import os
-    if os.path.isfile(filename):
-        mtype = mimetypes.guess_type(filename)
-        if mtype != None and "text" in str(mtype[0]):
+    """Check if a file is a text file (has no NUL bytes in its first block)."""
+    try:
+        with open(filename,'rb') as f:
+            return b'\0' not in f.read(1024)
+    except (IOError, OSError):
+        return False
+
+
+def VimString(text):
+    """Return text as a single quoted vim string literal."""
+    return u"'{0}'".format(text.replace(u"'",u"''"))
+
+
+def RuntimeDirectory():
+    """Return (and create) the directory holding vimgdb sockets and spool files."""
+    import tempfile
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    directory = os.path.join(directory, "vimgdb-{0}".format(os.getuid()))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    return directory
+
+
+class ClientServerTransport:
+    """Send command batches through vim's clientserver.
+
+    Every batch is written to a spool file and sourced by a fresh
+    'vim --remote-send' process. Slow, but works with any +clientserver vim."""
+
+    name = "clientserver"
+
+    def __init__(self,vim):
+        self.vim = vim
+
+    def Connect(self):
+        return True
+
+    def Close(self):
+        pass
+
+    def Address(self):
+        """Return address on which vim can send requests, '' if it cannot."""
+        return ""
+
+    def Send(self,commands):
+        """Send list of ex commands to vim. Return 0 on success."""
+        if self.vim.use_file:
+            cmdfile = os.path.join(RuntimeDirectory(),
+                    "{0}-{1}.vim".format(self.vim.servername,self.vim.session))
+
+            # write atomically, vim may still be sourcing the previous batch
+            f = open(cmdfile + ".tmp", 'w')
+            f.write("\n".join(commands))
+            f.close()
+            os.rename(cmdfile + ".tmp",cmdfile)
+            if settings.debug:
+                command = "<Esc>:source {0}<Enter>i<Esc>".format(cmdfile)
+            else:
+                command = "<Esc>:silent! source {0}<Enter>i<Esc>".format(cmdfile)
+        else:
+            function = [ 'silent execute "function! Vimgdb()' ]
+            function.extend([ cmd.replace('"','\\"') for cmd in commands + ["redraw!"]] )
+            function.extend(['endfunction"'])
+            function = '\\n'.join(function)
+            function = [function, 'call Vimgdb()']
+            function = " | ".join(function)
+            command = '<Esc>:{0}<Enter>'.format(function)
+
+        return self.vim.ExecCommand(command)
+
+    def Eval(self,expression):
+        """Evaluate vim expression and return its result as string."""
+        import subprocess
+        cmd = [ self.vim.executable,
+                "--servername",self.vim.servername,
+                "--remote-expr",expression ]
+
+        if settings.debug:
+            result = subprocess.check_output(cmd)
+        else:
+            with open(os.devnull, 'w') as DEVNULL:
+                result = subprocess.check_output(cmd,stderr=DEVNULL)
+
+        return result.decode('utf-8').strip()
+
+
+class ChannelTransport:
+    """Send command batches over one long-lived vim channel.
+
+    Gdb listens on a unix socket and asks vim (once, through clientserver) to
+    connect to it with VimgdbConnect(). Batches are then pipelined as json
+    messages that vim executes directly: no processes are spawned, no spool
+    file is written and no keys are fed to vim. A dropped connection is
+    re-established on the next batch; while vim cannot be reached over the
+    channel, the clientserver transport is used as fallback.
+
+    A reader thread receives responses to Eval(), and requests that vim sends
+    with ch_sendexpr(); the latter are passed on to Vim.Received()."""
+
+    name = "channel"
+
+    # seconds to wait before trying to reconnect after a failed attempt
+    retry_interval = 2.0
+
+    def __init__(self,vim):
+        import threading
+        self.vim = vim
+        self.fallback = ClientServerTransport(vim)
+        self.path = os.path.join(RuntimeDirectory(),
+                "{0}-{1}.sock".format(vim.servername,vim.session))
+        self.server = None
+        self.connection = None
+        self.closed = False
+        self.responses = dict()
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.request = 0
+        self.last_attempt = None
+        self.supported = True   # False once vim reported it has no usable channels
+
+    def Listen(self):
+        import socket
+        if self.server != None:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(1)
+        self.server.settimeout(self.vim.timeout)
+
+    def Connect(self):
+        """Let vim connect to the channel. Return True if connected."""
+        import socket
+        import subprocess
+        import threading
+        if self.connection != None:
             return True
+        if not self.supported:
+            return False
 
-    return False
+        now = time.time()
+        if self.last_attempt != None and now - self.last_attempt < self.retry_interval:
+            return False
+        self.last_attempt = now
+
+        try:
+            self.Listen()
+            result = self.fallback.Eval("VimgdbConnect('unix:{0}')".format(self.path)).strip()
+            if result == "-1":
+                # vim without +channel or unix sockets: stay on clientserver
+                self.supported = False
+                self.Close()
+                return False
+            elif result != "1":
+                return False
+            connection,_ = self.server.accept()
+            connection.settimeout(self.vim.timeout)
+            with self.condition:
+                self.connection = connection
+                self.closed = False
+                self.responses = dict()
+            StartThread(threading.Thread(target=self.Receive,args=(connection,),name="vimgdb-channel"))
+            self.last_attempt = None
+            return True
+        except (socket.error, subprocess.CalledProcessError, OSError):
+            self.Disconnect()
+            return False
+
+    def Disconnect(self):
+        import socket
+        if self.connection != None:
+            try:
+                self.connection.close()
+            except socket.error:
+                pass
+        self.connection = None
+
+    def Close(self):
+        self.Disconnect()
+        if self.server != None:
+            self.server.close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def Write(self,message):
+        import json
+        data = (json.dumps(message) + "\n").encode('utf-8')
+        # the send worker and gdb's thread (Eval) both write
+        with self.write_lock:
+            self.connection.sendall(data)
+
+    def Address(self):
+        return u"unix:{0}".format(self.path)
+
+    def Receive(self,connection):
+        """Read messages from vim until the connection closes. (Runs in its own thread)."""
+        import codecs
+        import json
+        import socket
+        decoder = json.JSONDecoder()
+        text = codecs.getincrementaldecoder('utf-8')()
+        buffer = ""
+        while True:
+            try:
+                data = connection.recv(65536)
+            except socket.timeout:
+                continue
+            except (socket.error, OSError):
+                data = b""
+            if not data:
+                break
+
+            buffer += text.decode(data)
+            while True:
+                buffer = buffer.lstrip()
+                try:
+                    message,end = decoder.raw_decode(buffer)
+                except ValueError:
+                    break
+                buffer = buffer[end:]
+                self.Dispatch(message)
+
+        with self.condition:
+            if connection is self.connection:
+                self.closed = True
+            self.condition.notify_all()
+
+    def Dispatch(self,message):
+        """Pass response to a waiting Read(), or request of vim to Vim.Received()."""
+        if not isinstance(message,list) or len(message) != 2 or not isinstance(message[0],int):
+            return
+        if message[0] < 0:
+            with self.condition:
+                self.responses[message[0]] = message[1]
+                self.condition.notify_all()
+        else:
+            self.vim.Received(message[1])
+
+    def Read(self,request):
+        """Wait for the response to 'request'."""
+        import socket
+        deadline = time.time() + self.vim.timeout
+        with self.condition:
+            while request not in self.responses:
+                if self.closed:
+                    raise socket.error("Vim closed the channel")
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise socket.timeout("Vim did not respond")
+                self.condition.wait(remaining)
+            return self.responses.pop(request)
+
+    def Send(self,commands):
+        """Send list of ex commands to vim. Return 0 on success."""
+        import socket
+        for attempt in range(2):
+            if not self.Connect():
+                break
+            try:
+                self.Write(["call","VimgdbExecute",[commands]])
+                return 0
+            except socket.error:
+                self.Disconnect()
+
+        return self.fallback.Send(commands)
+
+    def Eval(self,expression):
+        """Evaluate vim expression and return its result as string."""
+        import socket
+        for attempt in range(2):
+            if not self.Connect():
+                break
+            try:
+                self.request -= 1
+                self.Write(["expr",expression,self.request])
+                result = self.Read(self.request)
+                return u"{0}".format(result).strip()
+            except socket.error:
+                self.Disconnect()
+
+        return self.fallback.Eval(expression)
+
+
+TRANSPORTS = {
+    ClientServerTransport.name: ClientServerTransport,
+    ChannelTransport.name: ChannelTransport,
+}
 
 
 class Vim:
 
     def __init__(self):
-        self.servername = u"VIMGDB"
+        self.servername = os.environ.get("VIMGDB_SERVERNAME",u"VIMGDB")
+        self.session = u"{0}".format(os.getpid())
+        self.group = u"vimgdb{0}".format(self.session)
+        self.heat_group = u"vimgdbheat{0}".format(self.session)
+        self.count_group = u"vimgdbcounts{0}".format(self.session)
         self.executable = "vim"
         self.cle_id = 999999
+        self.dummy_id = 999990
+        self.thread_id = 1000000       # + line, one marker per line for all threads there
+        self.signs = dict()
+        self.unknown = set()
+        self.buffers = set()            # files loaded in vim by vimgdb
         self.use_file = True
+        self.timeout = 2.0
+        self.transport = None
+        self.worker = None
+        self.listener = None
         self.NewCommand()
 
+    def Transport(self):
+        """Return transport used to talk to the vim server (created on first use)."""
+        if self.transport == None:
+            if settings.transport not in TRANSPORTS:
+                raise VimgdbError("Unknown transport '{0}'".format(settings.transport))
+            self.transport = TRANSPORTS[settings.transport](self)
+        return self.transport
+
+    def SetTransport(self,name):
+        """Select transport by name, closing the current one."""
+        if name not in TRANSPORTS:
+            raise VimgdbError("Unknown transport '{0}'".format(name))
+        if self.transport != None:
+            self.transport.Close()
+            self.transport = None
+        settings.transport = name
+
+    def Received(self,message):
+        """Handle request sent by vim over the channel. (Called from the
+        channel's reader thread, see 'listener')."""
+        if self.listener != None:
+            self.listener(message)
+
+    def Close(self):
+        """Close connection to the vim server."""
+        if self.worker != None:
+            self.worker.Drain(self.timeout)
+        if self.transport != None:
+            self.transport.Close()
+
     def Start(self,args=[],check=True):
-        """Start vim as a server."""
+        """Start vim as a server, replacing the current process."""
         from os import path
 
-        if check and self.IsRunning():
+        if check and self.IsRunning(discover=False):
             raise VimgdbError("Vim server already running")
 
         library_dir = path.abspath(path.dirname(__file__))
@@ -44,21 +381,93 @@ class Vim:
                 print("Argument '{0}' is not a text file".format(arg))
                 from sys import exit; exit(1)
 
-        cmd = [self.executable,
-            "--servername","{0}".format(self.servername),
+        cmd = [self.executable] + self.ServerArguments() + [
             "-n",
             "-c","source {0}".format(vimrc)] + args
 
-        subprocess.call(cmd)
+        # vim registers itself for discovery, see PidFile()
+        os.environ["VIMGDB_RUNTIME"] = RuntimeDirectory()
+        startup.Mark("checks")
+        startup.Print()
+        os.execvp(self.executable,cmd)
+
+    def ServerArguments(self):
+        """Return arguments making the started editor a server."""
+        return ["--servername","{0}".format(self.servername)]
 
     def GetServerlist(self):
         """Get list of running vim servers."""
+        import subprocess
         output = subprocess.check_output([self.executable, '--serverlist'])
-        output.decode('utf-8')
-        return output
+        return output.decode('utf-8').split()
+
+    def PidFile(self,servername=None):
+        """Return file in which a vimgdb server stores its pid (see config/vimrc)."""
+        return os.path.join(RuntimeDirectory(),"{0}.pid".format(servername or self.servername))
+
+    def GetServerPid(self,servername=None):
+        """Return pid of running vimgdb server, or None. Removes stale pid files."""
+        import errno
+        pidfile = self.PidFile(servername)
+        try:
+            with open(pidfile) as f:
+                pid = int(f.read().strip())
+        except (IOError, OSError, ValueError):
+            return None
+
+        try:
+            os.kill(pid,0)
+        except OSError as error:
+            if error.errno != errno.EPERM:
+                try:
+                    os.unlink(pidfile)
+                except OSError:
+                    pass
+                return None
+        return pid
+
+    def GetPidServers(self):
+        """Get list of running vimgdb servers that registered a pid file."""
+        servers = []
+        for filename in sorted(os.listdir(RuntimeDirectory())):
+            if filename.endswith(".pid"):
+                servername = filename[:-len(".pid")]
+                if self.GetServerPid(servername) != None:
+                    servers.append(servername)
+        return servers
+
+    def GetVimgdbServers(self):
+        """Get list of running vimgdb servers (VIMGDB, VIMGDB1, ...)."""
+        import re
+        servers = self.GetPidServers()
+        if servers:
+            return servers
+        return [ server for server in self.GetServerlist()
+                if re.match(r'^VIMGDB[0-9]*$',server) ]
+
+    def FreeServername(self):
+        """Return a vimgdb server name that is not in use.
+
+        Only registered servers are considered, vim itself picks another name
+        if it turns out to be taken anyway."""
+        servers = self.GetPidServers()
+        index = 0
+        servername = u"VIMGDB"
+        while servername in servers:
+            index += 1
+            servername = u"VIMGDB{0}".format(index)
+        return servername
+
+    def IsRunning(self,discover=True):
+        """Return True if vim server is running.
+
+        Servers are found through their pid file. With 'discover', servers
+        that were not started by vimgdb-server are looked up with vim."""
+        if self.GetServerPid() != None:
+            return True
+        elif not discover:
+            return False
 
-    def IsRunning(self):
-        """Return True if vim server is running."""
         servers = self.GetServerlist()
         if self.servername in servers:
             return True
@@ -77,6 +486,7 @@ class Vim:
         return self.EvalCommand('echo expand("%:p")')
 
     def ExecCommand(self,command):
+        import subprocess
         cmd = [ self.executable,
                 "--servername",self.servername,
                 "--remote-send",command]
@@ -84,22 +494,31 @@ class Vim:
         if settings.debug:
             return subprocess.call(cmd)
         else:
-            DEVNULL = open(os.devnull, 'w')
-            return subprocess.call(cmd,stdout=DEVNULL,stderr=subprocess.STDOUT)
+            with open(os.devnull, 'w') as DEVNULL:
+                return subprocess.call(cmd,stdout=DEVNULL,stderr=subprocess.STDOUT)
 
     def EvalCommand(self,command):
-        cmd = [ self.executable,
-                "--servername",self.servername,
-                "--remote-expr",
-                "VimgdbCommand('{0}')".format(command) ]
-
-        if settings.debug:
-            result = subprocess.check_output(cmd)
-        else:
-            DEVNULL = open(os.devnull, 'w')
-            result = subprocess.check_output(cmd,stdout=DEVNULL,stderr=subprocess.STDOUT)
-
-        return result.decode('utf-8').strip()
+        return self.Eval("VimgdbCommand('{0}')".format(command))
+
+    def Eval(self,expression):
+        """Evaluate vim expression, after all queued commands are sent."""
+        if self.worker != None:
+            self.worker.Drain(self.timeout)
+        return self.Transport().Eval(expression)
+
+    def Placed(self,files):
+        """Ask vim for the current file and the signs of this session in
+        'files', in one query. Return (current file, {file: {sign id: (line,sign type)}})."""
+        import json
+        files = sorted(files)
+        result = self.Eval(u"VimgdbPlaced({0},[{1}])".format(
+            VimString(self.group),u",".join(VimString(filename) for filename in files)))
+        try:
+            placed = json.loads(result)
+            return placed["current"],{ filename: { sign[0]: (sign[1],sign[2]) for sign in placed["signs"].get(filename,[]) }
+                for filename in files }
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+            raise VimgdbError("Unexpected answer of vim: '{0}'".format(result[:80]))
 
     def RunCommand(self):
         """Send all commands in the vimgdb batch."""
@@ -107,109 +526,203 @@ class Vim:
 
             if settings.debug:
                 print("*** Commands sent **************************************\n   ",
-                    "\n    ".join(self.command),
+                    "\n    ".join(u"{0}".format(command) for command in self.command),
                     "\n********************************************************")
 
-            if self.use_file:
-                home = os.path.expanduser('~')
-                cmdfile = home+"/.vimgdb-command"
-
-                f = open(cmdfile, 'w')
-                f.write("\n".join(self.command))
-                f.close()
-                if settings.debug:
-                    command = "<Esc>:source {0}<Enter>i<Esc>".format(cmdfile)
-                else:
-                    command = "<Esc>:silent! source {0}<Enter>i<Esc>".format(cmdfile)
-            else:
-                self.Redraw()
-                function = [ 'silent execute "function! Vimgdb()' ]
-                function.extend([ cmd.replace('"','\\"') for cmd in self.command] )
-                function.extend(['endfunction"'])
-                function = '\\n'.join(function)
-                function = [function, 'call Vimgdb()']
-                function = " | ".join(function)
-                command = '<Esc>:{0}<Enter>'.format(function)
-
-            return self.ExecCommand(command)
+            if self.worker != None and settings.async_updates:
+                return self.worker.Send(self.command)
+            return self.Send(self.command)
         else:
             return 0
 
-    def RemoveSigns(self,sign_id):
-        """Remove all signs."""
-        self.AddCommand('execute "sign unplace {0}"'.format(sign_id))
-
-    def RemoveSign(self,sign_id):
-        """Remove particular sign."""
-        self.AddCommand('execute "sign unplace {0} file=" . expand("%:p")'.format(sign_id))
-
-    def AddSign(self,line,sign_type,sign_id=-1):
-        """Add a particular sign on a provide line."""
-        if sign_id < 0:
-            sign_id = line
-        self.AddCommand('execute "sign place {0} line={1} name={2} file=" . expand("%:p")'.format(sign_id,line,sign_type))
-
-    def EnableSignColumn(self):
-        """Add the sign column."""
-        self.AddSign(1,"VimgdbDummy",999990)
-
-    def DisableSignColumn(self,filename=None):
-        """Remove sign column in current file."""
-        if filename == None:
-            self.AddCommand('execute "sign unplace * file=" . expand("%:p")')
-        else:
-            self.AddCommand('execute "sign unplace * file={0}"'.format(filename))
+    def Send(self,commands):
+        """Send batch of commands through the transport. Return 0 on success."""
+        with stats.Timer("send") as timer:
+            ret = self.Transport().Send(commands)
+        stats.Count("batches")
+        stats.Count("commands",len(commands))
+        stats.Count("bytes",self.Size(commands))
+        if ret != 0:
+            stats.Count("failures")
+        stats.Trace("send",{"send": round(timer.seconds * 1000,3)},commands=len(commands),ret=ret)
+        return ret
+
+    def Size(self,commands):
+        """Return number of bytes of a sent batch."""
+        return sum(len(command) + 1 for command in commands)
+
+    def UpdateSigns(self,filename,place,unplace=(),clear=False,group=None):
+        """Remove signs with ids in 'unplace' (or all signs if 'clear') from
+        file, then place signs [(sign id,line,sign type)], in one call."""
+        self.AddCommand(u"call VimgdbSigns({0},{1},[{2}],[{3}],{4})".format(
+            VimString(group or self.group),VimString(filename),
+            u",".join(u"[{0},{1},'{2}'{3}]".format(sign_id,line,sign_type,
+                u",{0}".format(PRIORITIES[sign_type]) if sign_type in PRIORITIES else u"")
+                for sign_id,line,sign_type in place),
+            u",".join(u"{0}".format(sign_id) for sign_id in unplace),
+            1 if clear else 0))
 
     def DisableSignColumns(self):
         """Remove all sign columns."""
-        self.AddCommand('execute "sign unplace *"')
-
-    def InitSignColumn(self,fullsource=None):
-        """Create empty sign column."""
-        self.DisableSignColumn(fullsource)
-        self.EnableSignColumn()
-
-    def RemoveBreakpoints(self,breakpoints):
-        """Remove breakpoints."""
-        for breakline in breakpoints:
-            self.RemoveSign(breakline)
-
-    def AddBreakpoints(self,breakpoints,enabled):
-        """Add breakpoints."""
-        for breakline in breakpoints:
-            if enabled[breakline]:
-                self.AddSign(breakline,"VimgdbBreakpointSign")
+        self.AddCommand('sign unplace * group={0}'.format(self.group))
+        self.AddCommand('sign unplace * group={0}'.format(self.heat_group))
+        self.AddCommand(u"call VimgdbClearCounts({0})".format(VimString(self.count_group)))
+        self.signs = dict()
+        self.unknown = set()
+        self.buffers = set()
+
+    def ForgetSigns(self):
+        """Mark placed signs as unknown, e.g., after a failed batch.
+        Files with unknown signs are cleared on the next SyncSigns."""
+        self.unknown.update(self.signs)
+        self.signs = dict()
+
+    def AdoptSigns(self,placed):
+        """Take signs reported by vim, {file: {sign id: (line,sign type)}},
+        as placed signs, see Placed()."""
+        self.signs = placed
+        self.unknown = set()
+        self.buffers = set()
+
+    def FileSigns(self,breakpoints,cle_line=None,thread_lines=()):
+        """Return signs of a file, {sign id: (line,sign type)}, for breakpoints
+        ({line: enabled}), current line of execution and lines of other threads."""
+        signs = { self.dummy_id: (1,"VimgdbDummy") }
+        for line,enabled in breakpoints.items():
+            if enabled:
+                signs[line] = (line,"VimgdbBreakpointSign")
             else:
-                self.AddSign(breakline,"VimgdbDisabledBreakpointSign")
-
-    def UpdateBreakpoints(self,breakpoints,enabled,remove_breakpoints=set()):
-        """Add and remove breakpoints."""
-        self.AddBreakpoints(breakpoints,enabled)
-        self.RemoveBreakpoints(remove_breakpoints)
+                signs[line] = (line,"VimgdbDisabledBreakpointSign")
+        if cle_line != None:
+            signs[self.cle_id] = (cle_line,"VimgdbLocationSign")
+        for line in thread_lines:
+            signs[self.thread_id + line] = (line,"VimgdbThreadSign")
+        return signs
+
+    def SyncSigns(self,signs):
+        """Add commands that turn the placed signs into 'signs', a map of
+        {file: {sign id: (line,sign type)}}. Only differences are sent, as
+        one UpdateSigns() per file."""
+        for filename in self.unknown:
+            if filename not in signs:
+                self.UpdateSigns(filename,[],clear=True)
+
+        for filename,wanted in signs.items():
+            placed = self.signs.get(filename)
+            clear = placed == None
+            if clear:
+                placed = dict()
+            place = [ (sign_id,sign[0],sign[1]) for sign_id,sign in wanted.items() if placed.get(sign_id) != sign ]
+            # vim places a sign with an id that is placed on another line once more, instead of moving it
+            unplace = [ sign_id for sign_id,sign in placed.items()
+                if sign_id not in wanted or wanted[sign_id][0] != sign[0] ]
+            if clear or place or unplace:
+                self.UpdateSigns(filename,place,unplace,clear)
+
+        for filename,placed in self.signs.items():
+            if filename not in signs and placed:
+                self.UpdateSigns(filename,[],list(placed))
+
+        self.signs = { filename: dict(wanted) for filename,wanted in signs.items() }
+        self.unknown = set()
+
+    def PlaceHeatSigns(self,heat):
+        """Replace heat signs by 'heat', a map of {file: {line: grade}}.
+
+        Heat signs have their own group and a low priority, so breakpoint and
+        location signs stay visible."""
+        self.ClearHeatSigns()
+        for filename,lines in heat.items():
+            self.UpdateSigns(filename,[ (line,line,"VimgdbHeat{0}".format(grade))
+                for line,grade in sorted(lines.items()) ],group=self.heat_group)
+
+    def ClearHeatSigns(self):
+        self.AddCommand('sign unplace * group={0}'.format(self.heat_group))
+
+    def Symbols(self,files):
+        """Complete ':VimgdbGoto' from name lists 'files', and send it to this session."""
+        self.AddCommand(u"call VimgdbSymbols({0},[{1}])".format(
+            VimString(self.Transport().Address()),u",".join(VimString(filename) for filename in files)))
+
+    def Counts(self,filename,counts,clear=False):
+        """Show hit counts {line: hits} of breakpoints in file, optionally
+        removing all counts first. 0 hits removes the count of a line."""
+        self.AddCommand(u"call VimgdbCounts({0},{1},[{2}],{3})".format(VimString(self.count_group),VimString(filename),
+            u",".join(u"[{0},{1}]".format(line,hits) for line,hits in sorted(counts.items())),1 if clear else 0))
+
+    def Popup(self,lines,balloon=False):
+        """Show lines at the cursor, or in the balloon if vim asked for one."""
+        self.AddCommand(u"call VimgdbPopup([{0}],{1})".format(
+            u",".join(VimString(line) for line in lines),1 if balloon else 0))
+
+    def SetQuickfix(self,title,entries):
+        """Replace quickfix list by entries [(file,line,text)]."""
+        items = u",".join(u"{{'filename':{0},'lnum':{1},'text':{2}}}".format(
+            VimString(filename),line,VimString(text)) for filename,line,text in entries)
+        self.AddCommand(u"call setqflist([],'r',{{'title':{0},'items':[{1}]}})".format(
+            VimString(title),items))
+
+    def Panel(self,name,lines,first=1,request=None):
+        """Show lines in panel 'name' (a scratch buffer in a split window),
+        replacing its lines from line 'first' on. Pressing enter on line n
+        of the panel sends [request,n-1] to gdb."""
+        address = self.Transport().Address() if request != None else u""
+        self.AddCommand(u"call VimgdbPanel({0},[{1}],{2},{3},{4})".format(
+            VimString(name),u",".join(VimString(line) for line in lines),first,
+            VimString(address),VimString(request or u"")))
+
+    def PanelScroll(self,name,request,step):
+        """Send [request,first,last] with the line numbers (from 0) in view
+        to gdb, when panel 'name' scrolls to another block of 'step' lines."""
+        self.AddCommand(u"call VimgdbPanelScroll({0},{1},{2})".format(
+            VimString(name),VimString(request),step))
+
+    def PanelMark(self,name,line):
+        """Mark line of panel 'name' as current, and move its cursor there."""
+        self.AddCommand(u"call VimgdbPanelMark({0},{1},{2})".format(
+            VimString(name),VimString(self.group),line))
+
+    def PanelLines(self,name,lines):
+        """Replace lines of panel 'name', {line number: text}."""
+        self.AddCommand(u"call VimgdbPanelLines({0},{{{1}}})".format(
+            VimString(name),u",".join(u"'{0}':{1}".format(number,VimString(text))
+                for number,text in sorted(lines.items()))))
+
+    def PanelHighlight(self,name,lines):
+        """Highlight (only) the given line numbers of panel 'name'."""
+        self.AddCommand(u"call VimgdbPanelHighlight({0},{1},[{2}])".format(
+            VimString(name),VimString(self.group + u"changed"),
+            u",".join(u"{0}".format(line) for line in lines)))
+
+    def ClosePanel(self,name):
+        self.AddCommand(u"silent! bwipeout {0}".format(name))
 
     def Redraw(self):
         """Redraw vim screen."""
-        self.command.append("redraw!")
+        self.AddCommand("redraw!")
 
     def GotoLine(self,line):
         """Move cursor to particular line."""
         #self.AddCommand("call cursor({0},1)".format(line))
         self.AddCommand("{0}".format(line))
 
-    def RemoveCle(self):
-        """Remove current line of execution highlighting."""
-        self.RemoveSigns(self.cle_id)
-
-    def Cle(self,line):
-        """Highlight current line of execution."""
-        self.RemoveCle()
-        self.AddSign(line,"VimgdbLocationSign",self.cle_id)
-
     def GotoFile(self,filename,line=None):
-        """Open file."""
-        if line == None:
+        """Open file. A file that is loaded already is switched to by its
+        buffer number."""
+        if filename in self.buffers:
+            self.AddCommand(u"call VimgdbGoto({0},{1})".format(VimString(filename),line or 0))
+        elif line == None:
             self.AddCommand("edit {0}".format(filename))
         else:
             self.AddCommand("edit +{0} {1}".format(line,filename))
+        self.buffers.add(filename)
+
+    def Prefetch(self,files):
+        """Load files that are not loaded yet in buffers, when vim is idle."""
+        files = [ filename for filename in files if filename not in self.buffers ]
+        if files:
+            self.AddCommand(u"call VimgdbPrefetch([{0}])".format(
+                u",".join(VimString(filename) for filename in files)))
+            self.buffers.update(files)
 
 